@@ -1,5 +1,6 @@
 import sublime_plugin
 import sublime
+import threading
 
 try:
     from typing import Any, List, Dict, Callable, Optional, Tuple, Union, Mapping
@@ -20,12 +21,17 @@ except ImportError:
 
 from .core.registry import LspTextCommand
 from .core.protocol import Request, Point
-from .diagnostics import filter_by_point, view_diagnostics
+from .diagnostics import filter_by_point, view_diagnostics, view_diagnostics_listeners
 from .core.edit import parse_workspace_edit
 from .core.url import filename_to_uri
 from .core.views import region_to_range
 from .core.registry import sessions_for_view, client_from_session
 from .core.settings import settings
+from .core.cache import LRUCache
+from .core.viewport import visible_rows
+
+CODE_ACTIONS_CACHE_SIZE = 100
+CODE_ACTIONS_PREFETCH_DELAY_MS = 1000
 
 
 class CodeActionsAtLocation(object):
@@ -34,45 +40,91 @@ class CodeActionsAtLocation(object):
         self._commands_by_config = {}  # type: CodeActionsByConfigName
         self._requested_configs = []  # type: List[str]
         self._on_complete_handler = on_complete_handler
+        self._waiting_handlers = []  # type: List[Callable[[CodeActionsByConfigName], None]]
+        # responses are stored on the transport threads while handlers are added on the async thread.
+        self._lock = threading.Lock()
 
     def collect(self, config_name: str) -> 'Callable[[CodeActionsResponse], None]':
-        self._requested_configs.append(config_name)
+        with self._lock:
+            self._requested_configs.append(config_name)
         return lambda actions: self.store(config_name, actions)
 
     def store(self, config_name: str, actions: 'CodeActionsResponse') -> None:
-        self._commands_by_config[config_name] = actions or []
-        if len(self._requested_configs) == len(self._commands_by_config):
-            self._on_complete_handler(self._commands_by_config)
+        with self._lock:
+            self._commands_by_config[config_name] = actions or []
+            if not self.is_complete():
+                return
+            handlers = [self._on_complete_handler] + self._waiting_handlers
+            self._waiting_handlers = []
+        for handler in handlers:
+            handler(self._commands_by_config)
+
+    def is_complete(self) -> bool:
+        return len(self._requested_configs) == len(self._commands_by_config)
 
     def deliver(self, recipient_handler: 'Callable[[CodeActionsByConfigName], None]') -> None:
+        with self._lock:
+            if not self.is_complete():
+                self._waiting_handlers.append(recipient_handler)
+                return
         recipient_handler(self._commands_by_config)
 
 
 class CodeActionsManager(object):
-    """ Collects and caches code actions"""
+    """ Collects and caches code actions.
+
+    Requests are cached by file, change count and the diagnostics at the requested point, as the diagnostics decide
+    the range and context of the request. Moving within a diagnostic reuses the actions that were requested for it.
+    """
 
     def __init__(self) -> None:
-        self._requests = {}  # type: Dict[str, CodeActionsAtLocation]
+        self._requests = LRUCache(CODE_ACTIONS_CACHE_SIZE)
 
     def request(self, view: sublime.View, point: int, actions_handler: 'Callable[[CodeActionsByConfigName], None]',
                 diagnostics_by_config: 'Optional[Dict[str, List[Diagnostic]]]' = None) -> None:
-        current_location = self.get_location_key(view, point)
+        if diagnostics_by_config is None:
+            diagnostics_by_config = filter_by_point(view_diagnostics(view), Point(*view.rowcol(point)))
+        current_location = self.get_location_key(view, diagnostics_by_config)
         # debug("requesting actions for {}".format(current_location))
-        if current_location in self._requests:
-            self._requests[current_location].deliver(actions_handler)
+        actions_at_location = self._requests.get(current_location)  # type: Optional[CodeActionsAtLocation]
+        if actions_at_location:
+            actions_at_location.deliver(actions_handler)
         else:
-            self._requests.clear()
-            if diagnostics_by_config is None:
-                diagnostics_by_config = filter_by_point(view_diagnostics(view), Point(*view.rowcol(point)))
-            self._requests[current_location] = request_code_actions(view, point, actions_handler)
+            self._requests.set(current_location, request_code_actions_with_diagnostics(
+                view, diagnostics_by_config, point, actions_handler))
 
-    def get_location_key(self, view: sublime.View, point: int) -> str:
-        return "{}#{}:{}".format(view.file_name(), view.change_count(), point)
+    def get_location_key(self, view: sublime.View, diagnostics_by_config: 'Dict[str, List[Diagnostic]]') -> 'Tuple':
+        fingerprint = tuple(
+            (config_name, tuple((repr(d.range), d.severity, d.message) for d in diagnostics))
+            for config_name, diagnostics in sorted(diagnostics_by_config.items()))
+        relevant_range = None if fingerprint else repr(region_to_range(view, view.sel()[0]))
+        return view.file_name(), view.change_count(), relevant_range, fingerprint
 
 
 actions_manager = CodeActionsManager()
 
 
+def schedule_code_actions_prefetch(view: sublime.View) -> None:
+    """ Requests the code actions of the visible diagnostics of the view, once the view has been idle for a moment """
+    if settings.prefetch_code_actions:
+        change_count = view.change_count()
+        sublime.set_timeout_async(lambda: prefetch_code_actions(view, change_count), CODE_ACTIONS_PREFETCH_DELAY_MS)
+
+
+def prefetch_code_actions(view: sublime.View, change_count: int) -> None:
+    if not view.is_valid() or view.change_count() != change_count:
+        return
+    first_row, last_row = visible_rows(view)
+    for diagnostics in view_diagnostics(view).values():
+        for diagnostic in diagnostics:
+            start = diagnostic.range.start
+            if first_row <= start.row <= last_row:
+                actions_manager.request(view, view.text_point(start.row, start.col), lambda actions: None)
+
+
+view_diagnostics_listeners.append(schedule_code_actions_prefetch)
+
+
 def request_code_actions(view: sublime.View, point: int,
                          actions_handler: 'Callable[[CodeActionsByConfigName], None]') -> 'CodeActionsAtLocation':
     diagnostics_by_config = filter_by_point(view_diagnostics(view), Point(*view.rowcol(point)))
@@ -84,6 +136,7 @@ def request_code_actions_with_diagnostics(view: sublime.View, diagnostics_by_con
                                           ) -> 'CodeActionsAtLocation':
 
     actions_at_location = CodeActionsAtLocation(actions_handler)
+    requests = []  # type: List[Tuple[Session, dict]]
 
     for session in sessions_for_view(view, point):
 
@@ -105,9 +158,13 @@ def request_code_actions_with_diagnostics(view: sublime.View, diagnostics_by_con
                         }
                     }
                     if session.client:
-                        session.client.send_request(
-                            Request.codeAction(params),
-                            actions_at_location.collect(session.config.name))
+                        requests.append((session, params))
+
+    # all configs are collected before sending, so an early response doesn't complete the location.
+    handlers = [actions_at_location.collect(session.config.name) for session, _ in requests]
+    for (session, params), handler in zip(requests, handlers):
+        if session.client:
+            session.client.send_request(Request.codeAction(params), handler)
     return actions_at_location
 
 
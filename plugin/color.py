@@ -2,8 +2,8 @@ import sublime_plugin
 import sublime
 
 try:
-    from typing import Any, List, Dict, Callable, Optional
-    assert Any and List and Dict and Callable and Optional
+    from typing import Any, List, Dict, Callable, Optional, Tuple
+    assert Any and List and Dict and Callable and Optional and Tuple
 except ImportError:
     pass
 
@@ -11,19 +11,18 @@ from .core.protocol import Request
 from .core.url import filename_to_uri
 from .core.registry import session_for_view, sessions_for_view, client_from_session, configs_for_scope
 from .core.settings import settings, client_configs
-from .core.views import range_to_region
+from .core.viewport import ViewportPhantoms, viewport_phantoms
 from .core.protocol import Range
 from .core.configurations import is_supported_syntax
 from .core.documents import is_transient_view
 
 
-color_phantoms_by_view = dict()  # type: Dict[int, sublime.PhantomSet]
-
-
 class LspColorListener(sublime_plugin.ViewEventListener):
     def __init__(self, view: sublime.View) -> None:
         super().__init__(view)
         self._stored_point = -1
+        # The change count of the view the shown colors belong to.
+        self._color_version = -1
         self.initialized = False
         self.enabled = False
 
@@ -35,8 +34,8 @@ class LspColorListener(sublime_plugin.ViewEventListener):
         return is_supported and not disabled_by_user
 
     @property
-    def phantom_set(self) -> sublime.PhantomSet:
-        return color_phantoms_by_view.setdefault(self.view.id(), sublime.PhantomSet(self.view, "lsp_color"))
+    def phantom_set(self) -> ViewportPhantoms:
+        return viewport_phantoms(self.view, "lsp_color")
 
     def on_activated_async(self) -> None:
         if not self.initialized:
@@ -60,6 +59,8 @@ class LspColorListener(sublime_plugin.ViewEventListener):
 
     def on_modified_async(self) -> None:
         if self.enabled:
+            # keep the colors where Sublime moved them until the server sends new ones.
+            self.phantom_set.track_edits()
             self.schedule_request()
 
     def schedule_request(self) -> None:
@@ -80,6 +81,10 @@ class LspColorListener(sublime_plugin.ViewEventListener):
         if is_transient_view(self.view):
             return
 
+        version = self.view.change_count()
+        if version == self._color_version:
+            return
+
         client = client_from_session(session_for_view(self.view, 'colorProvider'))
         if client:
             file_path = self.view.file_name()
@@ -91,12 +96,16 @@ class LspColorListener(sublime_plugin.ViewEventListener):
                 }
                 client.send_request(
                     Request.documentColor(params),
-                    self.handle_response
+                    lambda response: self.handle_response(response, version)
                 )
 
-    def handle_response(self, response: 'Optional[List[dict]]') -> None:
+    def handle_response(self, response: 'Optional[List[dict]]', version: int) -> None:
+        if version != self.view.change_count():
+            # edited meanwhile, the ranges are outdated and a new request is scheduled.
+            return
+        self._color_version = version
         color_infos = response if response else []
-        phantoms = []
+        phantoms = []  # type: List[Tuple[Range, str, int]]
         for color_info in color_infos:
             color = color_info['color']
             red = color['red'] * 255
@@ -111,15 +120,10 @@ class LspColorListener(sublime_plugin.ViewEventListener):
                         background-color: rgba({}, {}, {}, {})'>
             </div>""".format(red, green, blue, alpha)
 
-            range = Range.from_lsp(color_info['range'])
-            region = range_to_region(range, self.view)
-
-            phantoms.append(sublime.Phantom(region, content, sublime.LAYOUT_INLINE))
+            phantoms.append((Range.from_lsp(color_info['range']), content, sublime.LAYOUT_INLINE))
 
         self.phantom_set.update(phantoms)
 
 
 def remove_color_boxes(view: sublime.View) -> None:
-    phantom_set = color_phantoms_by_view.get(view.id())
-    if phantom_set:
-        phantom_set.update([])
+    viewport_phantoms(view, "lsp_color").update([])
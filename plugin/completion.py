@@ -1,3 +1,4 @@
+import functools
 import sublime
 import sublime_plugin
 
@@ -10,11 +11,13 @@ except ImportError:
 from .core.protocol import Request
 from .core.settings import settings, client_configs
 from .core.logging import debug
-from .core.completion import parse_completion_response, format_completion
-from .core.registry import session_for_view, client_from_session, LSPViewEventListener
+from .core.completion import parse_completion_response, format_completion, CompletionCache, CompletionResolver
+from .core.completion import COMPLETION_RESOLVE_PREFETCH_ITEMS
+from .core.registry import session_for_view, sessions_for_view, client_from_session, LSPViewEventListener
 from .core.configurations import is_supported_syntax
 from .core.documents import get_document_position, position_is_word
 from .core.sessions import Session
+from .core.rpc import Client
 from .core.edit import parse_text_edit
 
 
@@ -58,7 +61,13 @@ class CompletionHandler(LSPViewEventListener):
         self.last_location = -1
         self.committing = False
         self.response_items = []  # type: List[dict]
-        self.response_incomplete = False
+        self.cache = CompletionCache()
+        self.resolvers = {}  # type: Dict[str, CompletionResolver]
+        self.response_version = -1
+        self.request_id = 0
+        self.pending_responses = 0
+        self.received_responses = 0
+        self.deadline_passed = False
 
     @classmethod
     def is_applicable(cls, view_settings: dict) -> bool:
@@ -114,17 +123,35 @@ class CompletionHandler(LSPViewEventListener):
         else:
             return False
 
-    def is_same_completion(self, prefix: str, locations: 'List[int]') -> bool:
-        if self.response_incomplete:
-            return False
-
-        if self.last_location < 0:
-            return False
-
-        # completion requests from the same location with the same prefix are cached.
-        current_start = locations[0] - len(prefix)
-        last_start = self.last_location - len(self.last_prefix)
-        return prefix.startswith(self.last_prefix) and current_start == last_start
+    def completion_start(self, location: int) -> int:
+        if position_is_word(self.view, location):
+            # if completion is requested in the middle of a word, where does it start?
+            return self.view.word(location).begin()
+        return location
+
+    def completion_key(self, location: int) -> 'Tuple[int, int, str]':
+        start = self.completion_start(location)
+        line_start = self.view.line(start).begin()
+        return self.view.buffer_id(), start, self.view.substr(sublime.Region(line_start, start))
+
+    def narrow_completions(self, start: int, location: int) -> None:
+        typed = self.view.substr(sublime.Region(start, location))
+        self.response_items, self.completions = self.cache.narrow(typed)
+        if self.resolve and settings.prefetch_completion_resolve:
+            items_by_origin = {}  # type: Dict[str, List[dict]]
+            for item in self.response_items[:COMPLETION_RESOLVE_PREFETCH_ITEMS]:
+                items_by_origin.setdefault(self.cache.origin(item) or "", []).append(item)
+            for origin, items in items_by_origin.items():
+                client = self.client_for(origin)
+                if client:
+                    resolver = self.resolvers.setdefault(origin, CompletionResolver())
+                    resolver.prefetch(client, items, self.response_version)
+
+    def client_for(self, origin: str) -> 'Optional[Client]':
+        for session in sessions_for_view(self.view, self.last_location):
+            if session.config.name == origin:
+                return session.client
+        return client_from_session(session_for_view(self.view, 'completionProvider', self.last_location))
 
     def find_completion_item(self, inserted: str) -> 'Optional[dict]':
         """
@@ -133,18 +160,8 @@ class CompletionHandler(LSPViewEventListener):
         Matches exactly or up to first snippet placeholder ($s)
 
         """
-        # TODO: candidate for extracting and thorough testing.
         if self.completions:
-            for index, item in enumerate(self.completions):
-                trigger, replacement = item
-
-                snippet_offset = replacement.find('$', 2)
-                if snippet_offset > -1:
-                    if inserted.startswith(replacement[:snippet_offset]):
-                        return self.response_items[index]
-                else:
-                    if replacement == inserted:
-                        return self.response_items[index]
+            return self.cache.index.find(inserted)
         return None
 
     def on_modified(self) -> None:
@@ -164,7 +181,7 @@ class CompletionHandler(LSPViewEventListener):
             self.on_completion_inserted()
         else:
             if self.view.is_auto_complete_visible():
-                if self.response_incomplete:
+                if self.cache.incomplete:
                     # debug('incomplete, triggering new completions')
                     self.view.run_command("hide_auto_complete")
                     sublime.set_timeout(self.run_auto_complete, 0)
@@ -210,7 +227,9 @@ class CompletionHandler(LSPViewEventListener):
             if additional_edits:
                 self.apply_additional_edits(additional_edits)
             elif self.resolve:
-                self.do_resolve(item)
+                resolver = self.resolvers.get(self.cache.origin(item) or "")
+                if not resolver or not resolver.resolved(item, self.response_version, self.handle_resolve_response):
+                    self.do_resolve(item)
 
         else:
             debug('could not find completion item for inserted "{}"'.format(inserted))
@@ -228,9 +247,12 @@ class CompletionHandler(LSPViewEventListener):
             if not self.view.match_selector(locations[0], self.auto_complete_selector):
                 return ([], flags)
 
-            reuse_completion = self.is_same_completion(prefix, locations)
+            key = self.completion_key(locations[0])
+            reuse_completion = self.cache.can_narrow(key)
             if self.state == CompletionState.IDLE:
-                if not reuse_completion:
+                if reuse_completion:
+                    self.narrow_completions(key[1], locations[0])
+                else:
                     self.last_prefix = prefix
                     self.last_location = locations[0]
                     self.do_request(prefix, locations)
@@ -255,25 +277,34 @@ class CompletionHandler(LSPViewEventListener):
         self.next_request = None
         view = self.view
 
-        # don't store client so we can handle restarts
-        client = client_from_session(session_for_view(view, 'completionProvider', locations[0]))
-        if not client:
+        # don't store clients so we can handle restarts
+        clients = []  # type: List[Tuple[str, Client]]
+        for session in sessions_for_view(view, locations[0]):
+            if session.has_capability('completionProvider') and session.client:
+                clients.append((session.config.name, session.client))
+        if not clients:
             return
 
         if settings.complete_all_chars or self.is_after_trigger_character(locations[0]):
             self.manager.documents.purge_changes(self.view)
             document_position = get_document_position(view, locations[0])
             if document_position:
-                client.send_request(
-                    Request.complete(document_position),
-                    self.handle_response,
-                    self.handle_error)
+                self.request_id += 1
+                self.pending_responses = len(clients)
+                self.received_responses = 0
+                self.deadline_passed = False
+                request_id = self.request_id
+                for origin, client in clients:
+                    client.send_request(
+                        Request.complete(document_position),
+                        functools.partial(self.handle_response, origin=origin, request_id=request_id),
+                        lambda error: self.handle_error(error, request_id))
                 self.state = CompletionState.REQUESTING
+                if len(clients) > 1:
+                    sublime.set_timeout_async(lambda: self.handle_deadline(request_id), settings.completion_deadline_ms)
 
     def do_resolve(self, item: dict) -> None:
-        view = self.view
-
-        client = client_from_session(session_for_view(view, 'completionProvider', self.last_location))
+        client = self.client_for(self.cache.origin(item) or "")
         if not client:
             return
 
@@ -291,52 +322,81 @@ class CompletionHandler(LSPViewEventListener):
         self.view.run_command("lsp_apply_document_edit", {'changes': edits})
         sublime.status_message('Applied additional edits for completion')
 
-    def handle_response(self, response: 'Optional[Union[Dict,List]]') -> None:
+    def handle_response(self, response: 'Optional[Union[Dict,List]]', origin: str, request_id: int) -> None:
+        if request_id != self.request_id:
+            debug('discarding completion results of an outdated request')
+            return
+        self.pending_responses -= 1
         if self.state == CompletionState.REQUESTING:
 
-            completion_start = self.last_location
-            if position_is_word(self.view, self.last_location):
-                # if completion is requested in the middle of a word, where does it start?
-                word = self.view.word(self.last_location)
-                completion_start = word.begin()
-
-            current_word_start = self.view.sel()[0].begin()
-            if position_is_word(self.view, current_word_start):
-                current_word_region = self.view.word(current_word_start)
-                current_word_start = current_word_region.begin()
+            completion_start = self.completion_start(self.last_location)
+            current_word_start = self.completion_start(self.view.sel()[0].begin())
 
             if current_word_start != completion_start:
                 debug('completion results for', completion_start, 'now at', current_word_start, 'discarding')
                 self.state = CompletionState.IDLE
                 return
 
-            _last_row, last_col = self.view.rowcol(completion_start)
-
-            response_items, response_incomplete = parse_completion_response(response)
-            self.response_items = response_items
-            self.response_incomplete = response_incomplete
-            self.completions = list(format_completion(item, last_col, settings) for item in self.response_items)
-
-            # if insert_best_completion was just ran, undo it before presenting new completions.
-            prev_char = self.view.substr(self.view.sel()[0].begin() - 1)
-            if prev_char.isspace():
-                if last_text_command == "insert_best_completion":
-                    self.view.run_command("undo")
-
-            self.state = CompletionState.APPLYING
-            self.view.run_command("hide_auto_complete")
-            self.run_auto_complete()
+            self.merge_response(response, origin, completion_start)
+            if self.pending_responses <= 0 or self.deadline_passed:
+                self.apply_completions(completion_start)
         elif self.state == CompletionState.CANCELLING:
             self.state = CompletionState.IDLE
             if self.next_request:
                 prefix, locations = self.next_request
                 self.do_request(prefix, locations)
+        elif self.received_responses and self.view.is_auto_complete_visible():
+            # a late response of another server, merged into the completions that are shown.
+            completion_start = self.completion_start(self.last_location)
+            if self.cache.key == self.completion_key(self.last_location):
+                self.merge_response(response, origin, completion_start)
+                self.apply_completions(completion_start)
         else:
             debug('Got unexpected response while in state {}'.format(self.state))
 
-    def handle_error(self, error: dict) -> None:
+    def merge_response(self, response: 'Optional[Union[Dict,List]]', origin: str, completion_start: int) -> None:
+        response_items, response_incomplete = parse_completion_response(response, sort=False)
+        if self.received_responses:
+            self.cache.add(response_items, response_incomplete, origin)
+        else:
+            _last_row, last_col = self.view.rowcol(completion_start)
+            self.response_version = self.view.change_count()
+            self.cache.store(self.completion_key(self.last_location), response_items,
+                             lambda item: format_completion(item, last_col, settings), response_incomplete, origin)
+        self.received_responses += 1
+
+    def apply_completions(self, completion_start: int) -> None:
+        self.narrow_completions(completion_start, self.view.sel()[0].begin())
+
+        # if insert_best_completion was just ran, undo it before presenting new completions.
+        prev_char = self.view.substr(self.view.sel()[0].begin() - 1)
+        if prev_char.isspace():
+            if last_text_command == "insert_best_completion":
+                self.view.run_command("undo")
+
+        self.state = CompletionState.APPLYING
+        self.view.run_command("hide_auto_complete")
+        self.run_auto_complete()
+
+    def handle_deadline(self, request_id: int) -> None:
+        if request_id != self.request_id or self.state != CompletionState.REQUESTING:
+            return
+        self.deadline_passed = True
+        if self.received_responses:
+            # show what has arrived, later responses are merged in while the popup is open.
+            self.apply_completions(self.completion_start(self.last_location))
+
+    def handle_error(self, error: dict, request_id: int) -> None:
         sublime.status_message('Completion error: ' + str(error.get('message')))
-        self.state = CompletionState.IDLE
+        if request_id != self.request_id:
+            return
+        self.pending_responses -= 1
+        if self.state == CompletionState.REQUESTING and self.pending_responses > 0:
+            return
+        if self.state == CompletionState.REQUESTING and self.received_responses:
+            self.apply_completions(self.completion_start(self.last_location))
+        elif self.state != CompletionState.IDLE:
+            self.state = CompletionState.IDLE
 
     def run_auto_complete(self) -> None:
         self.view.run_command(
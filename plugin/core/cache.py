@@ -0,0 +1,53 @@
+import threading
+from collections import OrderedDict
+
+try:
+    from typing import Any, Callable, Hashable, Optional
+    assert Any and Callable and Hashable and Optional
+except ImportError:
+    pass
+
+
+class LRUCache(object):
+    """ A thread-safe mapping that drops the least recently used entries beyond max_size """
+
+    def __init__(self, max_size: int) -> None:
+        self._max_size = max_size
+        self._entries = OrderedDict()  # type: OrderedDict[Hashable, Any]
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: 'Hashable') -> bool:
+        return key in self._entries
+
+    def get(self, key: 'Hashable', default: 'Any' = None) -> 'Any':
+        with self._lock:
+            if key not in self._entries:
+                return default
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def set(self, key: 'Hashable', value: 'Any') -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+
+    def discard(self, predicate: 'Callable[[Any], bool]') -> None:
+        """ Removes the entries whose key matches the predicate """
+        with self._lock:
+            for key in [key for key in self._entries if predicate(key)]:
+                del self._entries[key]
+
+    def discard_items(self, predicate: 'Callable[[Any, Any], bool]') -> None:
+        """ Removes the entries whose key and value match the predicate """
+        with self._lock:
+            for key in [key for key, value in self._entries.items() if predicate(key, value)]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
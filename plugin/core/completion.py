@@ -1,15 +1,27 @@
-from .protocol import CompletionItemKind, Range
+import heapq
+import json
+import threading
+from collections import OrderedDict
+from .protocol import CompletionItemKind, Range, Request
 from .types import Settings
 from .logging import debug
 try:
-    from typing import Tuple, Optional, Dict, List, Union
-    assert Tuple and Optional and Dict and List and Union and Settings
+    from typing import Tuple, Optional, Dict, List, Union, Callable, Any
+    assert Tuple and Optional and Dict and List and Union and Callable and Any and Settings
 except ImportError:
     pass
 
 
 completion_item_kind_names = {v: k for k, v in CompletionItemKind.__dict__.items()}
 
+# At most this many of the best matching items are formatted and shown.
+COMPLETION_TOP_ITEMS = 200
+
+# Items resolved ahead of time when prefetch_completion_resolve is enabled.
+COMPLETION_RESOLVE_PREFETCH_ITEMS = 10
+COMPLETION_RESOLVE_MAX_PENDING = 3
+COMPLETION_RESOLVE_CACHE_SIZE = 200
+
 
 def get_completion_hint(item: dict, settings: 'Settings') -> 'Optional[str]':
     # choose hint based on availability and user preference
@@ -77,7 +89,7 @@ def text_edit_text(item: dict, word_col: int) -> 'Optional[str]':
     return None
 
 
-def parse_completion_response(response: 'Optional[Union[Dict,List]]') -> 'Tuple[List[Dict], bool]':
+def parse_completion_response(response: 'Optional[Union[Dict,List]]', sort: bool = True) -> 'Tuple[List[Dict], bool]':
     items = []  # type: List[Dict]
     is_incomplete = False
     if isinstance(response, dict):
@@ -85,5 +97,245 @@ def parse_completion_response(response: 'Optional[Union[Dict,List]]') -> 'Tuple[
         is_incomplete = response.get("isIncomplete", False)
     elif isinstance(response, list):
         items = response
-    items = sorted(items, key=lambda item: item.get("sortText") or item["label"])
+    if sort:
+        items = sorted(items, key=completion_sort_text)
     return items, is_incomplete
+
+
+def fuzzy_score(query: str, text: str) -> 'Optional[int]':
+    """ Scores text for a case-insensitive subsequence match of query, or returns None if it doesn't match.
+
+    Matches at the start of text, at word boundaries and right after the previous match score higher,
+    skipped characters cost a point each.
+    """
+    if not query:
+        return 0
+    lowered = text.lower()
+    score = 10 if lowered.startswith(query.lower()) else 0
+    previous = -1
+    for char in query.lower():
+        position = lowered.find(char, previous + 1)
+        if position < 0:
+            return None
+        if position == previous + 1:
+            score += 3
+        if position == 0 or not text[position - 1].isalnum():
+            score += 2
+        elif text[position].isupper() and text[position - 1].islower():
+            score += 2
+        score -= position - previous - 1
+        previous = position
+    return score
+
+
+def completion_sort_text(item: dict) -> str:
+    return item.get("sortText") or item["label"]
+
+
+def completion_identity(item: dict) -> 'Tuple[str, str]':
+    text_edit = item.get("textEdit") or {}
+    return item["label"], text_edit.get("newText") or item.get("insertText") or ""
+
+
+def completion_filter_text(item: dict) -> str:
+    return (item.get("filterText") or item["label"]).lstrip(" •")
+
+
+class CompletionItemIndex(object):
+    """ Maps inserted text back to completion items, by exact replacement or up to the first snippet placeholder """
+
+    def __init__(self) -> None:
+        self.clear()
+
+    def clear(self) -> None:
+        self._exact = {}  # type: Dict[str, dict]
+        self._snippet_prefixes = {}  # type: Dict[str, dict]
+        self._prefix_lengths = []  # type: List[int]
+
+    def add(self, replacement: str, item: dict) -> None:
+        if replacement.startswith('\\$'):
+            replacement = replacement[1:]  # sublime inserts the escaped leading '$' as is.
+        snippet_offset = replacement.find('$', 2)
+        if snippet_offset > -1:
+            prefix = replacement[:snippet_offset]
+            if prefix not in self._snippet_prefixes:
+                self._snippet_prefixes[prefix] = item
+                if snippet_offset not in self._prefix_lengths:
+                    self._prefix_lengths.append(snippet_offset)
+                    self._prefix_lengths.sort(reverse=True)
+        else:
+            self._exact.setdefault(replacement, item)
+
+    def find(self, inserted: str) -> 'Optional[dict]':
+        item = self._exact.get(inserted)
+        if item is None:
+            # the longest snippet prefix is the most specific match.
+            for length in self._prefix_lengths:
+                item = self._snippet_prefixes.get(inserted[:length])
+                if item is not None:
+                    break
+        return item
+
+
+class CompletionCache(object):
+    """ The items of the last completion response of a view, narrowed down locally while the user keeps typing.
+
+    The key is (buffer id, completion start, line text before the start). Typing within the completed word keeps
+    the key, so the cached items are re-ranked instead of requested again, unless the response was incomplete.
+    Only the best COMPLETION_TOP_ITEMS items are selected, and items are formatted once they are selected. When the
+    typed text grows, only the items that matched the shorter text are scored again.
+
+    Responses of several servers can be merged with add. Duplicate items are dropped, and the servers' items are
+    interleaved by their rank within their own response, as sortText values of different servers don't compare.
+    """
+
+    def __init__(self) -> None:
+        self.clear()
+
+    def clear(self) -> None:
+        self.key = None  # type: Optional[Tuple[int, int, str]]
+        self.items = []  # type: List[dict]
+        self.incomplete = False
+        self._format = lambda item: ("", "")  # type: Callable[[dict], Tuple[str, str]]
+        self._formatted = {}  # type: Dict[int, Tuple[str, str]]
+        self._matched = ("", None)  # type: Tuple[str, Optional[List[int]]]
+        self._origins = []  # type: List[str]
+        # the origins by the id of the items, which stay alive in self.items.
+        self._origins_by_id = {}  # type: Dict[int, str]
+        self._identities = {}  # type: Dict[Tuple[str, str], str]
+        self._ordinals = None  # type: Optional[List[int]]
+        self.index = CompletionItemIndex()
+
+    def store(self, key: 'Tuple[int, int, str]', items: 'List[dict]',
+              format_item: 'Callable[[dict], Tuple[str, str]]', incomplete: bool, origin: str = "") -> None:
+        self.clear()
+        self.key = key
+        self._format = format_item
+        self.add(items, incomplete, origin)
+
+    def add(self, items: 'List[dict]', incomplete: bool, origin: str) -> None:
+        """ Merges the items of another response for the same key, dropping items another origin already has """
+        merged = bool(self.items)
+        for item in items:
+            identity = completion_identity(item)
+            if self._identities.setdefault(identity, origin) == origin:
+                self.items.append(item)
+                self._origins.append(origin)
+                self._origins_by_id[id(item)] = origin
+        self.incomplete = self.incomplete or incomplete
+        self._matched = ("", None)
+        if merged or self._ordinals is not None:
+            self._ordinals = self._rank_by_origin()
+
+    def origin(self, item: dict) -> 'Optional[str]':
+        return self._origins_by_id.get(id(item))
+
+    def can_narrow(self, key: 'Tuple[int, int, str]') -> bool:
+        return self.key is not None and self.key == key and not self.incomplete
+
+    def completion(self, index: int) -> 'Tuple[str, str]':
+        completion = self._formatted.get(index)
+        if completion is None:
+            completion = self._formatted[index] = self._format(self.items[index])
+            self.index.add(completion[1], self.items[index])
+        return completion
+
+    def narrow(self, typed: str, limit: int = COMPLETION_TOP_ITEMS) -> 'Tuple[List[dict], List[Tuple[str, str]]]':
+        """ Returns the best items and formatted completions for the typed text, best matches first """
+        items = self.items
+        ranked = []  # type: List[Tuple[int, Tuple[int, str], int]]
+        if typed:
+            matched_typed, matched = self._matched
+            candidates = matched if matched is not None and typed.startswith(matched_typed) else range(len(items))
+            for index in candidates:
+                score = fuzzy_score(typed, completion_filter_text(items[index]))
+                if score is not None:
+                    ranked.append((-score, self._rank(index), index))
+            self._matched = (typed, [index for _, _, index in ranked])
+        else:
+            ranked = [(0, self._rank(index), index) for index in range(len(items))]
+        indices = [index for _, _, index in heapq.nsmallest(limit, ranked)]
+        return [items[index] for index in indices], [self.completion(index) for index in indices]
+
+    def _rank(self, index: int) -> 'Tuple[int, str]':
+        if self._ordinals is None:
+            return 0, completion_sort_text(self.items[index])
+        return self._ordinals[index], ""
+
+    def _rank_by_origin(self) -> 'List[int]':
+        by_origin = {}  # type: Dict[str, List[int]]
+        for index, origin in enumerate(self._origins):
+            by_origin.setdefault(origin, []).append(index)
+        ordinals = [0] * len(self.items)
+        for indices in by_origin.values():
+            indices.sort(key=lambda index: completion_sort_text(self.items[index]))
+            for ordinal, index in enumerate(indices):
+                ordinals[index] = ordinal
+        return ordinals
+
+
+class CompletionResolver(object):
+    """ Resolves the best completion items in the background, before one of them gets committed.
+
+    At most max_pending completionItem/resolve requests are in flight; prefetching a new set of items replaces the
+    ones still waiting. Resolved items are kept in an LRU cache keyed by the item and the document version of the
+    completion response they came from.
+    """
+
+    def __init__(self, max_pending: int = COMPLETION_RESOLVE_MAX_PENDING,
+                 max_cached: int = COMPLETION_RESOLVE_CACHE_SIZE) -> None:
+        self._max_pending = max_pending
+        self._max_cached = max_cached
+        self._lock = threading.Lock()
+        self._resolved = OrderedDict()  # type: OrderedDict[Tuple[int, str], dict]
+        self._pending = {}  # type: Dict[Tuple[int, str], List[Callable[[dict], None]]]
+        self._queue = []  # type: List[Tuple[Tuple[int, str], dict]]
+        self._client = None  # type: Any
+
+    @staticmethod
+    def key(item: dict, version: int) -> 'Tuple[int, str]':
+        return version, json.dumps(item, sort_keys=True)
+
+    def prefetch(self, client: 'Any', items: 'List[dict]', version: int) -> None:
+        with self._lock:
+            self._client = client
+            self._queue = []
+            for item in items:
+                key = self.key(item, version)
+                if key not in self._resolved and key not in self._pending:
+                    self._queue.append((key, item))
+            self._send_queued()
+
+    def resolved(self, item: dict, version: int, handler: 'Callable[[dict], None]') -> bool:
+        """ Calls handler with the resolved item once it is available, returns False if it was never requested """
+        key = self.key(item, version)
+        with self._lock:
+            resolved_item = self._resolved.get(key)
+            if resolved_item is None:
+                if key not in self._pending:
+                    return False
+                self._pending[key].append(handler)
+                return True
+            self._resolved.move_to_end(key)
+        handler(resolved_item)
+        return True
+
+    def _send_queued(self) -> None:
+        while self._queue and len(self._pending) < self._max_pending:
+            key, item = self._queue.pop(0)
+            self._pending[key] = []
+            self._client.send_request(Request.resolveCompletionItem(item),
+                                      lambda response, key=key: self._handle_response(key, response),
+                                      lambda error, key=key: self._handle_response(key, None))
+
+    def _handle_response(self, key: 'Tuple[int, str]', response: 'Optional[dict]') -> None:
+        with self._lock:
+            handlers = self._pending.pop(key, [])
+            if response is not None:
+                self._resolved[key] = response
+                while len(self._resolved) > self._max_cached:
+                    self._resolved.popitem(last=False)
+            self._send_queued()
+        if response is not None:
+            for handler in handlers:
+                handler(response)
@@ -1,14 +1,16 @@
+import bisect
 from .logging import debug
-from .url import uri_to_filename
-from .protocol import Diagnostic, DiagnosticSeverity, Point
+from .url import filename_to_uri, uri_to_filename
+from .protocol import Diagnostic, DiagnosticSeverity, Point, Request
 assert Diagnostic
 
 try:
     import sublime
     from typing_extensions import Protocol
-    from typing import Any, List, Dict, Tuple, Callable, Optional
+    from typing import Any, List, Dict, Tuple, Callable, Optional, Set
+    from .sessions import Session
     assert sublime
-    assert Any and List and Dict and Tuple and Callable and Optional
+    assert Any and List and Dict and Tuple and Callable and Optional and Set and Session
 except ImportError:
     pass
     Protocol = object  # type: ignore
@@ -25,6 +27,9 @@ class DiagnosticsUI(Protocol):
     def deselect(self) -> None:
         ...
 
+    def show_more(self) -> None:
+        ...
+
 
 class DiagnosticsStorage(object):
 
@@ -91,6 +96,125 @@ class DiagnosticsStorage(object):
         if self._updatable:
             self._updatable.deselect()
 
+    def show_more(self) -> None:
+        if self._updatable:
+            self._updatable.show_more()
+
+
+class DiagnosticsPuller(object):
+    """ Requests diagnostics from servers that support the pull model (textDocument/diagnostic).
+
+    The resultId of the last report for a document is sent along with the next request, so a server can answer
+    with a small "unchanged" report instead of recomputing and resending everything. Documents that change while
+    not visible are only marked stale, and pulled once they are shown again.
+    """
+
+    def __init__(self, storage: DiagnosticsStorage) -> None:
+        self._storage = storage
+        self._result_ids = {}  # type: Dict[Tuple[str, str], str]
+        # the number of the last request for a document, counting the requests for all documents.
+        self._request_counts = {}  # type: Dict[Tuple[str, str], int]
+        self._requests = 0
+        self._stale = set()  # type: Set[Tuple[str, str]]
+
+    def supports(self, session: 'Session') -> bool:
+        return session.has_capability('diagnosticProvider')
+
+    def supports_workspace(self, session: 'Session') -> bool:
+        provider = session.get_capability('diagnosticProvider')
+        return isinstance(provider, dict) and bool(provider.get('workspaceDiagnostics'))
+
+    def mark_stale(self, config_name: str, file_path: str) -> None:
+        self._stale.add((config_name, file_path))
+
+    def is_stale(self, config_name: str, file_path: str) -> bool:
+        return (config_name, file_path) in self._stale
+
+    def forget(self, config_name: str, file_path: str) -> None:
+        key = (config_name, file_path)
+        self._result_ids.pop(key, None)
+        self._request_counts.pop(key, None)
+        self._stale.discard(key)
+
+    def forget_session(self, config_name: str) -> None:
+        for key in [key for key in self._result_ids if key[0] == config_name]:
+            del self._result_ids[key]
+        for key in [key for key in self._request_counts if key[0] == config_name]:
+            del self._request_counts[key]
+        self._stale = set(key for key in self._stale if key[0] != config_name)
+
+    def pull(self, session: 'Session', file_path: str) -> None:
+        client = session.client
+        if not client:
+            return
+        config_name = session.config.name
+        key = (config_name, file_path)
+        self._stale.discard(key)
+        # as requests are numbered across documents, a report of a forgotten session never matches a new request.
+        self._requests += 1
+        request_count = self._request_counts[key] = self._requests
+        params = self._base_params(session)
+        params["textDocument"] = {"uri": filename_to_uri(file_path)}
+        previous_result_id = self._result_ids.get(key)
+        if previous_result_id:
+            params["previousResultId"] = previous_result_id
+        client.send_request(
+            Request.documentDiagnostic(params),
+            lambda report: self._handle_document_report(config_name, file_path, request_count, report),
+            lambda error: self._handle_document_error(config_name, file_path, request_count))
+
+    def pull_workspace(self, session: 'Session') -> None:
+        client = session.client
+        if not client:
+            return
+        config_name = session.config.name
+        params = self._base_params(session)
+        params["previousResultIds"] = [
+            {"uri": filename_to_uri(file_path), "value": result_id}
+            for (name, file_path), result_id in self._result_ids.items() if name == config_name]
+        client.send_request(
+            Request.workspaceDiagnostic(params),
+            lambda result: self._handle_workspace_report(config_name, result))
+
+    def _base_params(self, session: 'Session') -> 'Dict[str, Any]':
+        params = {}  # type: Dict[str, Any]
+        provider = session.get_capability('diagnosticProvider')
+        if isinstance(provider, dict) and provider.get('identifier'):
+            params["identifier"] = provider['identifier']
+        return params
+
+    def _handle_document_report(self, config_name: str, file_path: str, request_count: int,
+                                report: 'Optional[Dict[str, Any]]') -> None:
+        if self._request_counts.get((config_name, file_path)) != request_count:
+            debug('ignoring outdated diagnostics report for', file_path)
+            return
+        if report:
+            self._apply_report(config_name, file_path, report)
+            for uri, related_report in (report.get('relatedDocuments') or {}).items():
+                self._apply_report(config_name, uri_to_filename(uri), related_report)
+
+    def _handle_document_error(self, config_name: str, file_path: str, request_count: int) -> None:
+        if self._request_counts.get((config_name, file_path)) == request_count:
+            self.mark_stale(config_name, file_path)
+
+    def _handle_workspace_report(self, config_name: str, result: 'Optional[Dict[str, Any]]') -> None:
+        if result:
+            for report in result.get('items') or []:
+                self._apply_report(config_name, uri_to_filename(report['uri']), report)
+
+    def _apply_report(self, config_name: str, file_path: str, report: 'Dict[str, Any]') -> None:
+        key = (config_name, file_path)
+        result_id = report.get('resultId')
+        if result_id:
+            self._result_ids[key] = result_id
+        else:
+            self._result_ids.pop(key, None)
+        if report.get('kind') == 'full':
+            self._storage.receive(config_name, {
+                'uri': filename_to_uri(file_path),
+                'diagnostics': report.get('items') or []
+            })
+
 
 class DocumentsState(Protocol):
 
@@ -122,155 +246,85 @@ class DiagnosticsUpdateWalk(object):
 CURSOR_FORWARD = 1
 CURSOR_BACKWARD = -1
 
+# sorts after any (row, col) position within a file
+_MAX_POSITION = float('inf')
 
-class DiagnosticCursorWalk(DiagnosticsUpdateWalk):
-    def __init__(self, cursor: 'DiagnosticsCursor', direction: int = 0) -> None:
-        self._cursor = cursor
-        self._direction = direction
-        self._current_file_path = ""
-        self._candidate = None  # type: 'Optional[Tuple[str, Diagnostic]]'
-
-    def begin_file(self, file_path: str) -> None:
-        self._current_file_path = file_path
-
-    def _meets_max_severity(self, diagnostic: 'Diagnostic') -> bool:
-        return diagnostic.severity <= self._cursor.max_severity_level
-
-    def _take_candidate(self, diagnostic: 'Diagnostic') -> None:
-        self._candidate = self._current_file_path, diagnostic
-
-    def end(self) -> None:
-        self._cursor.set_value(self._candidate)
-
-
-class FromPositionWalk(DiagnosticCursorWalk):
-    def __init__(self, cursor: 'DiagnosticsCursor', file_path: str, point: Point, direction: int) -> None:
-        super().__init__(cursor, direction)
-        self._first = None  # type: Optional[Tuple[str, Diagnostic]]
-        self._previous = None  # type: Optional[Tuple[str, Diagnostic]]
-
-        # position-specific
-        self._file_path = file_path
-        self._point = point
-        self._first_after_file = None  # type: Optional[Tuple[str, Diagnostic]]
-        self._last_before_file = None  # type: Optional[Tuple[str, Diagnostic]]
 
-    def diagnostic(self, diagnostic: 'Diagnostic') -> None:
-        if self._meets_max_severity(diagnostic):
-            if not self._first:
-                self._first = self._current_file_path, diagnostic
-
-            if self._current_file_path == self._file_path:
-                if self._direction == CURSOR_FORWARD:
-                    self._take_if_nearer_forward(diagnostic)
-                else:
-                    self._take_if_nearer_backward(diagnostic)
-                    self._set_last_before_file(diagnostic)
-            else:
-                if self._direction == CURSOR_FORWARD:
-                    self._set_first_after_file(diagnostic)
-
-            self._previous = self._current_file_path, diagnostic
-
-    def _take_if_nearer_forward(self, diagnostic: Diagnostic) -> None:
-        if diagnostic.range.start.row > self._point.row:
-            if not self._candidate:
-                self._take_candidate(diagnostic)
-            else:
-                candidate_start_row = self._candidate[1].range.start.row
-                if diagnostic.range.start.row < candidate_start_row:
-                    self._take_candidate(diagnostic)
-
-    def _take_if_nearer_backward(self, diagnostic: Diagnostic) -> None:
-        if diagnostic.range.start.row < self._point.row:
-            if not self._candidate:
-                self._take_candidate(diagnostic)
-            else:
-                candidate_start_row = self._candidate[1].range.start.row
-                if diagnostic.range.start.row > candidate_start_row:
-                    self._take_candidate(diagnostic)
-
-    def _set_last_before_file(self, diagnostic: Diagnostic) -> None:
-        if not self._last_before_file and self._previous:
-            if self._previous[0] != self._current_file_path:
-                self._last_before_file = self._previous
-
-    def _set_first_after_file(self, diagnostic: Diagnostic) -> None:
-        if not self._first_after_file:
-            if self._previous and self._previous[0] == self._file_path:
-                self._first_after_file = self._current_file_path, diagnostic
+class DiagnosticsIndex(object):
+    """ Keeps navigable diagnostics of all files ordered by file path and position.
 
-    def end(self) -> None:
-        if self._candidate:
-            self._cursor.set_value(self._candidate)
-        else:
-            if self._direction == CURSOR_FORWARD:
-                self._cursor.set_value(self._first_after_file or self._first)
-            else:
-                self._cursor.set_value(self._last_before_file or self._previous)
+    Entries are replaced one file at a time as diagnostics are published, so lookups can bisect instead of walking
+    the complete diagnostics structure.
+    """
 
+    def __init__(self, max_severity_level: int = DiagnosticSeverity.Warning) -> None:
+        self.max_severity_level = max_severity_level
+        self._keys = []  # type: List[Tuple[str, int, int, int]]
+        self._entries = []  # type: List[Tuple[str, Diagnostic]]
 
-class FromDiagnosticWalk(DiagnosticCursorWalk):
-    def __init__(self, cursor: 'DiagnosticsCursor', direction: int) -> None:
-        super().__init__(cursor, direction)
+    def __len__(self) -> int:
+        return len(self._entries)
 
-        self._first = None  # type: Optional[Tuple[str, Diagnostic]]
-        self._previous = None  # type: Optional[Tuple[str, Diagnostic]]
+    def _file_bounds(self, file_path: str) -> 'Tuple[int, int]':
+        lo = bisect.bisect_left(self._keys, (file_path,))
+        hi = bisect.bisect_left(self._keys, (file_path, _MAX_POSITION), lo)
+        return lo, hi
 
-        assert cursor.value
-        self._file_path, self._diagnostic = cursor.value
-        self._take_next = False
+    def update(self, file_path: str, file_diagnostics: 'Dict[str, List[Diagnostic]]') -> None:
+        navigable = sorted(
+            (diagnostic for diagnostics in file_diagnostics.values() for diagnostic in diagnostics
+             if diagnostic.severity <= self.max_severity_level),
+            key=lambda d: (d.range.start.row, d.range.start.col))
+        lo, hi = self._file_bounds(file_path)
+        self._keys[lo:hi] = [(file_path, d.range.start.row, d.range.start.col, seq) for seq, d in enumerate(navigable)]
+        self._entries[lo:hi] = [(file_path, d) for d in navigable]
 
-    def diagnostic(self, diagnostic: 'Diagnostic') -> None:
-        if self._meets_max_severity(diagnostic):
-
-            if self._direction == CURSOR_FORWARD:
-                if not self._first:
-                    self._first = self._current_file_path, diagnostic
-
-                if self._take_next:
-                    self._take_candidate(diagnostic)
-                    self._take_next = False
-                elif diagnostic == self._diagnostic and self._current_file_path == self._file_path:
-                    self._take_next = True
-            else:
-                if self._current_file_path == self._file_path and self._diagnostic == diagnostic:
-                    if self._previous:
-                        self._candidate = self._previous
-                self._previous = self._current_file_path, diagnostic
-
-    def end(self) -> None:
-        if self._candidate:
-            self._cursor.set_value(self._candidate)
+    def clear(self) -> None:
+        self._keys = []
+        self._entries = []
+
+    def find(self, file_diagnostic: 'Tuple[str, Diagnostic]') -> int:
+        file_path, diagnostic = file_diagnostic
+        start = diagnostic.range.start
+        position = (file_path, start.row, start.col)
+        index = bisect.bisect_left(self._keys, position)
+        while index < len(self._keys) and self._keys[index][:3] == position:
+            if self._entries[index][1] == diagnostic:
+                return index
+            index += 1
+        return -1
+
+    def at(self, index: int) -> 'Optional[Tuple[str, Diagnostic]]':
+        if self._entries:
+            return self._entries[index % len(self._entries)]
+        return None
+
+    def first(self, direction: int) -> 'Optional[Tuple[str, Diagnostic]]':
+        return self.at(0 if direction == CURSOR_FORWARD else -1)
+
+    def next_from_position(self, file_path: str, point: Point, direction: int) -> 'Optional[Tuple[str, Diagnostic]]':
+        if direction == CURSOR_FORWARD:
+            return self.at(bisect.bisect_right(self._keys, (file_path, point.row, _MAX_POSITION)))
         else:
-            if self._direction == CURSOR_FORWARD:
-                self._cursor.set_value(self._first)
-            else:
-                self._cursor.set_value(self._previous)
+            return self.at(bisect.bisect_left(self._keys, (file_path, point.row)) - 1)
 
-
-class TakeFirstDiagnosticWalk(DiagnosticCursorWalk):
-    def diagnostic(self, diagnostic: Diagnostic) -> None:
-        if self._meets_max_severity(diagnostic):
-            if self._direction == CURSOR_FORWARD:
-                if self._candidate is None:
-                    self._take_candidate(diagnostic)
-            else:
-                self._take_candidate(diagnostic)
-
-
-class DiagnosticsUpdatedWalk(DiagnosticCursorWalk):
-    def diagnostic(self, diagnostic: 'Diagnostic') -> None:
-        if self._cursor.value:
-            if self._current_file_path == self._cursor.value[0]:
-                if diagnostic == self._cursor.value[1]:
-                    self._take_candidate(diagnostic)
+    def next_from_diagnostic(self, file_diagnostic: 'Tuple[str, Diagnostic]',
+                             direction: int) -> 'Optional[Tuple[str, Diagnostic]]':
+        index = self.find(file_diagnostic)
+        if index < 0:
+            file_path, diagnostic = file_diagnostic
+            return self.next_from_position(file_path, diagnostic.range.start, direction)
+        return self.at(index + direction)
 
 
 class DiagnosticsCursor(object):
     def __init__(self, show_diagnostics_severity_level: int = DiagnosticSeverity.Warning) -> None:
         self._file_diagnostic = None  # type: 'Optional[Tuple[str, Diagnostic]]'
-        self.max_severity_level = show_diagnostics_severity_level
+        self.index = DiagnosticsIndex(show_diagnostics_severity_level)
+
+    @property
+    def max_severity_level(self) -> int:
+        return self.index.max_severity_level
 
     @property
     def has_value(self) -> bool:
@@ -284,19 +338,21 @@ class DiagnosticsCursor(object):
         return self._file_diagnostic
 
     def from_position(self, direction: int, file_path: 'Optional[str]' = None,
-                      point: 'Optional[Point]' = None) -> DiagnosticsUpdateWalk:
+                      point: 'Optional[Point]' = None) -> None:
         if file_path and point:
-            return FromPositionWalk(self, file_path, point, direction)
+            self.set_value(self.index.next_from_position(file_path, point, direction))
         else:
-            return TakeFirstDiagnosticWalk(self, direction)
+            self.set_value(self.index.first(direction))
 
-    def from_diagnostic(self, direction: int) -> DiagnosticsUpdateWalk:
+    def from_diagnostic(self, direction: int) -> None:
         assert self._file_diagnostic
-        return FromDiagnosticWalk(self, direction)
+        self.set_value(self.index.next_from_diagnostic(self._file_diagnostic, direction))
 
-    def update(self) -> DiagnosticsUpdateWalk:
-        assert self._file_diagnostic
-        return DiagnosticsUpdatedWalk(self)
+    def update(self, file_path: str, file_diagnostics: 'Dict[str, List[Diagnostic]]') -> None:
+        self.index.update(file_path, file_diagnostics)
+        if self._file_diagnostic and self._file_diagnostic[0] == file_path:
+            index = self.index.find(self._file_diagnostic)
+            self.set_value(self.index.at(index) if index >= 0 else None)
 
 
 class DiagnosticsWalker(object):
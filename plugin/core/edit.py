@@ -1,10 +1,19 @@
 from .url import uri_to_filename
+import bisect
+import difflib
 import operator
+import os
 TYPE_CHECKING = False
 if TYPE_CHECKING:
-    from typing import List, Dict, Optional, Any, Iterable, Tuple
+    from typing import List, Dict, Optional, Any, Iterable, Tuple, Sequence
     TextEdit = Tuple[Tuple[int, int], Tuple[int, int], str]
-    assert List and Dict and Optional and Any and Iterable and Tuple
+    # (begin offset, end offset, new text)
+    OffsetEdit = Tuple[int, int, str]
+    assert List and Dict and Optional and Any and Iterable and Tuple and Sequence
+
+# Lines between two unique common lines are compared pairwise only while their old times their new number of lines
+# stays below this, as that comparison takes quadratic time. Larger blocks of lines are replaced as a whole.
+LINE_DIFF_MAX_COST = 250000
 
 
 def parse_workspace_edit(workspace_edit: 'Dict[str, Any]') -> 'Dict[str, List[TextEdit]]':
@@ -41,3 +50,199 @@ def sort_by_application_order(changes: 'Iterable[TextEdit]') -> 'List[TextEdit]'
     # we use the index in the array as the key.
 
     return list(sorted(changes, key=operator.itemgetter(0)))
+
+
+def line_offsets(text: str) -> 'List[int]':
+    """ The offsets at which the lines of text start """
+    offsets = [0]
+    position = text.find('\n')
+    while position >= 0:
+        offsets.append(position + 1)
+        position = text.find('\n', position + 1)
+    return offsets
+
+
+def to_offset_edits(text: str, changes: 'Iterable[Sequence[Any]]') -> 'List[OffsetEdit]':
+    """ Converts text edits on (row, col) positions to edits on offsets in text, in application order """
+    offsets = line_offsets(text)
+    last_row = len(offsets) - 1
+
+    def offset(row: int, col: int) -> int:
+        if row > last_row:
+            return len(text)
+        return min(offsets[row] + col, len(text))
+
+    offset_edits = []  # type: List[OffsetEdit]
+    for start, end, new_text in sort_by_application_order(tuple(change) for change in changes):
+        if start[0] > last_row and not new_text.startswith('\n'):
+            # Handle when a language server (eg gopls) inserts at a row beyond the document
+            # some editors create the line automatically, sublime needs to have the newline prepended.
+            new_text = '\n' + new_text
+        offset_edits.append((offset(*start), offset(*end), new_text))
+    return offset_edits
+
+
+def merge_edits(text: str, edits: 'Iterable[OffsetEdit]') -> 'List[OffsetEdit]':
+    """ Merges overlapping and adjacent edits, which are in application order, into single edits """
+    merged = []  # type: List[OffsetEdit]
+    for begin, end, new_text in edits:
+        if merged and begin <= merged[-1][1]:
+            previous_begin, previous_end, previous_text = merged[-1]
+            merged[-1] = (previous_begin, max(previous_end, end),
+                          previous_text + text[previous_end:begin] + new_text)
+        else:
+            merged.append((begin, end, new_text))
+    return merged
+
+
+def diff_edit(text: str, edit: 'OffsetEdit') -> 'List[OffsetEdit]':
+    """ Splits an edit into the lines it really changes, keeping the common start and end of changed lines """
+    begin, end, new_text = edit
+    old_lines = text[begin:end].splitlines(True)
+    new_lines = new_text.splitlines(True)
+    if len(old_lines) < 2 and len(new_lines) < 2:
+        return [_trim_edit(text, edit)]
+    old_offsets = [begin]
+    for line in old_lines:
+        old_offsets.append(old_offsets[-1] + len(line))
+    edits = []  # type: List[OffsetEdit]
+    for old_first, old_last, new_first, new_last in diff_lines(old_lines, new_lines):
+        replaced = (old_offsets[old_first], old_offsets[old_last], "".join(new_lines[new_first:new_last]))
+        edits.append(_trim_edit(text, replaced))
+    return edits
+
+
+def diff_lines(old_lines: 'List[str]', new_lines: 'List[str]') -> 'List[Tuple[int, int, int, int]]':
+    """ Returns the changed blocks of lines as (old first, old last, new first, new last), in order.
+
+    Like a patience diff, the lines that occur once in both are matched first, in linear time. Only the lines between
+    these are compared pairwise, within LINE_DIFF_MAX_COST.
+    """
+    blocks = []  # type: List[Tuple[int, int, int, int]]
+    _diff_lines(old_lines, new_lines, 0, len(old_lines), 0, len(new_lines), blocks)
+    return blocks
+
+
+def _diff_lines(old_lines: 'List[str]', new_lines: 'List[str]', old_first: int, old_last: int, new_first: int,
+                new_last: int, blocks: 'List[Tuple[int, int, int, int]]') -> None:
+    while old_first < old_last and new_first < new_last and old_lines[old_first] == new_lines[new_first]:
+        old_first += 1
+        new_first += 1
+    while old_first < old_last and new_first < new_last and old_lines[old_last - 1] == new_lines[new_last - 1]:
+        old_last -= 1
+        new_last -= 1
+    if old_first == old_last or new_first == new_last:
+        if old_first != old_last or new_first != new_last:
+            blocks.append((old_first, old_last, new_first, new_last))
+        return
+    anchors = _unique_common_lines(old_lines, new_lines, old_first, old_last, new_first, new_last)
+    if anchors:
+        for old_index, new_index in anchors:
+            _diff_lines(old_lines, new_lines, old_first, old_index, new_first, new_index, blocks)
+            old_first, new_first = old_index + 1, new_index + 1
+        _diff_lines(old_lines, new_lines, old_first, old_last, new_first, new_last, blocks)
+    elif (old_last - old_first) * (new_last - new_first) <= LINE_DIFF_MAX_COST:
+        matcher = difflib.SequenceMatcher(None, old_lines[old_first:old_last], new_lines[new_first:new_last],
+                                          autojunk=False)
+        for tag, old_begin, old_end, new_begin, new_end in matcher.get_opcodes():
+            if tag != 'equal':
+                blocks.append((old_first + old_begin, old_first + old_end, new_first + new_begin, new_first + new_end))
+    else:
+        blocks.append((old_first, old_last, new_first, new_last))
+
+
+def _unique_common_lines(old_lines: 'List[str]', new_lines: 'List[str]', old_first: int, old_last: int,
+                         new_first: int, new_last: int) -> 'List[Tuple[int, int]]':
+    """ The longest run of lines that occur once in both, in the same order, as (old index, new index) """
+    counts = {}  # type: Dict[str, List[int]]
+    for index in range(old_first, old_last):
+        counts.setdefault(old_lines[index], [0, 0, index])[0] += 1
+    pairs = []  # type: List[Tuple[int, int]]
+    for index in range(new_first, new_last):
+        count = counts.get(new_lines[index])
+        if count:
+            count[1] += 1
+            count.append(index)
+    for count in counts.values():
+        if count[0] == 1 and count[1] == 1:
+            pairs.append((count[2], count[3]))
+    pairs.sort()
+    # the longest increasing run of new indices, by patience sorting.
+    tails = []  # type: List[int]
+    tail_pairs = []  # type: List[int]
+    previous = [-1] * len(pairs)
+    for position, (_, new_index) in enumerate(pairs):
+        pile = bisect.bisect_left(tails, new_index)
+        if pile == len(tails):
+            tails.append(new_index)
+            tail_pairs.append(position)
+        else:
+            tails[pile] = new_index
+            tail_pairs[pile] = position
+        previous[position] = tail_pairs[pile - 1] if pile else -1
+    run = []  # type: List[Tuple[int, int]]
+    position = tail_pairs[-1] if tail_pairs else -1
+    while position >= 0:
+        run.append(pairs[position])
+        position = previous[position]
+    run.reverse()
+    return run
+
+
+def _trim_edit(text: str, edit: 'OffsetEdit') -> 'OffsetEdit':
+    begin, end, new_text = edit
+    old_text = text[begin:end]
+    prefix = len(os.path.commonprefix([old_text, new_text]))
+    old_text, new_text = old_text[prefix:], new_text[prefix:]
+    suffix = len(os.path.commonprefix([old_text[::-1], new_text[::-1]]))
+    return begin + prefix, end - suffix, new_text[:len(new_text) - suffix]
+
+
+def minimal_edits(text: str, changes: 'Iterable[Sequence[Any]]') -> 'List[OffsetEdit]':
+    """ Turns the text edits of a server into the fewest, smallest edits on offsets, in document order.
+
+    Overlapping and adjacent edits are merged and edits spanning several lines, like a replacement of the whole
+    document, are reduced to a line diff. Edits that don't change anything are dropped.
+    """
+    edits = []  # type: List[OffsetEdit]
+    for edit in merge_edits(text, to_offset_edits(text, changes)):
+        edits.extend(e for e in diff_edit(text, edit) if e[0] != e[1] or e[2])
+    return edits
+
+
+def apply_edits(text: str, edits: 'Iterable[OffsetEdit]') -> str:
+    """ Applies non-overlapping edits on offsets, in document order, to text """
+    parts = []
+    position = 0
+    for begin, end, new_text in edits:
+        parts.append(text[position:begin])
+        parts.append(new_text)
+        position = end
+    parts.append(text[position:])
+    return "".join(parts)
+
+
+def combine_edits(text: str, edit_lists: 'Iterable[List[Any]]') -> 'Tuple[List[Any], int]':
+    """ Joins lists of text edits made against the same text, like the responses of several servers.
+
+    A list with an edit overlapping an edit of an earlier list is left out. Returns the joined edits and the number
+    of lists left out.
+    """
+    taken = []  # type: List[Tuple[int, int]]
+    combined = []  # type: List[Any]
+    dropped = 0
+    for changes in edit_lists:
+        spans = [(begin, end) for begin, end, _ in to_offset_edits(text, changes)]
+        if any(_overlaps(taken, begin, end) for begin, end in spans):
+            dropped += 1
+            continue
+        for span in spans:
+            bisect.insort(taken, span)
+        combined.extend(changes)
+    return combined, dropped
+
+
+def _overlaps(taken: 'List[Tuple[int, int]]', begin: int, end: int) -> bool:
+    # the taken spans don't overlap, so of those starting before end, the last one reaches furthest.
+    index = bisect.bisect_left(taken, (end,))
+    return index > 0 and begin < taken[index - 1][1]
@@ -0,0 +1,136 @@
+import mmap
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from .logging import debug
+
+try:
+    from typing import Callable, Dict, Iterable, List, Optional, Tuple
+    assert Callable and Dict and Iterable and List and Optional and Tuple
+except ImportError:
+    pass
+
+
+READ_LINES_WORKERS = 4
+
+_executor = None  # type: Optional[ThreadPoolExecutor]
+
+
+def read_lines(file_path: str, rows: 'Iterable[int]') -> 'Dict[int, str]':
+    """ Reads the given 0-based rows of a file in a single pass, stripped. Missing rows and files are left out. """
+    wanted = sorted(set(rows))
+    lines = {}  # type: Dict[int, str]
+    if not wanted:
+        return lines
+    try:
+        with open(file_path, 'rb') as file:
+            try:
+                content = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                return lines  # empty files can't be mapped.
+            try:
+                row = 0
+                start = 0
+                for wanted_row in wanted:
+                    while row < wanted_row:
+                        start = content.find(b'\n', start) + 1
+                        if start == 0:
+                            return lines
+                        row += 1
+                    end = content.find(b'\n', start)
+                    line = content[start:] if end < 0 else content[start:end]
+                    lines[row] = line.decode('utf-8', 'replace').strip()
+            finally:
+                content.close()
+    except (IOError, OSError):
+        pass
+    return lines
+
+
+class LinesReader(object):
+    """ Reads the rows of files on a thread pool, delivering the files in the order they were added.
+
+    on_file_read is called with the index of the file and its lines as soon as a file and all files added before it
+    have been read. Files can be added in several batches, as results of a request arrive.
+    """
+
+    def __init__(self, on_file_read: 'Callable[[int, Dict[int, str]], None]',
+                 read: 'Callable[[str, List[int]], Dict[int, str]]' = read_lines) -> None:
+        self._on_file_read = on_file_read
+        self._read = read
+        self._results = {}  # type: Dict[int, Dict[int, str]]
+        self._lock = threading.Lock()
+        self._added = 0
+        self._next_index = 0
+        self._on_closed = None  # type: Optional[Callable[[], None]]
+        self._ready = deque()  # type: deque
+        self._delivering = False
+
+    def read(self, rows_by_file: 'List[Tuple[str, List[int]]]') -> None:
+        global _executor
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=READ_LINES_WORKERS)
+        for file_path, rows in rows_by_file:
+            with self._lock:
+                index = self._added
+                self._added += 1
+            _executor.submit(self._read, file_path, rows).add_done_callback(self._done_callback(index))
+
+    def close(self, on_closed: 'Callable[[], None]') -> None:
+        """ Calls on_closed once all added files have been delivered. """
+        with self._lock:
+            if self._next_index < self._added or self._delivering:
+                self._on_closed = on_closed
+                return
+        on_closed()
+
+    def _done_callback(self, index: int) -> 'Callable[[Future], None]':
+        def on_done(future: Future) -> None:
+            try:
+                lines = future.result()
+            except Exception as err:
+                # a file that can't be read has no lines, and mustn't hold up the files after it.
+                debug("Failure reading lines:", err)
+                lines = {}
+            self._on_done(index, lines)
+
+        return on_done
+
+    def _on_done(self, index: int, lines: 'Dict[int, str]') -> None:
+        with self._lock:
+            self._results[index] = lines
+            while self._next_index in self._results:
+                self._ready.append((self._next_index, self._results.pop(self._next_index)))
+                self._next_index += 1
+            if self._delivering:
+                return
+            self._delivering = True
+        self._deliver()
+
+    def _deliver(self) -> None:
+        # on_file_read runs outside the lock, on one thread at a time, so files are still delivered in order.
+        while True:
+            with self._lock:
+                if not self._ready:
+                    self._delivering = False
+                    on_closed = self._on_closed
+                    if on_closed and self._next_index == self._added:
+                        self._on_closed = None
+                    else:
+                        on_closed = None
+                    break
+                index, lines = self._ready.popleft()
+            self._on_file_read(index, lines)
+        if on_closed:
+            on_closed()
+
+
+def read_lines_of_files(rows_by_file: 'List[Tuple[str, List[int]]]',
+                        on_file_read: 'Callable[[int, Dict[int, str]], None]',
+                        read: 'Callable[[str, List[int]], Dict[int, str]]' = read_lines) -> None:
+    """ Reads the rows of each file with read on a thread pool and returns immediately.
+
+    on_file_read is called with the index of the file and its lines, in the order of rows_by_file, as soon as a file
+    and all files before it have been read.
+    """
+    LinesReader(on_file_read, read).read(rows_by_file)
@@ -3,6 +3,7 @@ import sublime
 from .logging import set_debug_logging, set_exception_logging
 from .panels import destroy_output_panels, ensure_panel, PanelName
 from .popups import popups
+from .process import standby_processes
 from .registry import windows, load_handlers, unload_sessions
 from .settings import settings, load_settings, unload_settings
 from ..color import remove_color_boxes
@@ -37,6 +38,7 @@ def shutdown() -> None:
     # Also needs to handle package being disabled or removed
     # https://github.com/sublimelsp/LSP/issues/375
     unload_settings()
+    standby_processes.clear()
 
     for window in sublime.windows():
         unload_sessions(window)  # unloads view state from document sync and diagnostics
@@ -111,6 +111,16 @@ class LspUpdatePanelCommand(sublime_plugin.TextCommand):
         selection.clear()
 
 
+class LspReplacePanelRegionCommand(sublime_plugin.TextCommand):
+    """
+    Replaces part of a panel with new text, leaving the rest of the panel untouched.
+    """
+
+    def run(self, edit: sublime.Edit, begin: int, end: int, characters: str = "") -> None:
+        with mutable(self.view):
+            self.view.replace(edit, sublime.Region(begin, end), characters)
+
+
 class LspUpdateServerPanelCommand(sublime_plugin.TextCommand):
     def run(self, edit: sublime.Edit, prefix: str, message: str) -> None:
         with mutable(self.view):
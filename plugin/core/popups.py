@@ -1,4 +1,15 @@
+import mdpopups
 import sublime
+from .cache import LRUCache
+
+try:
+    from typing import Any, Dict, Tuple
+    assert Any and Dict and Tuple
+except ImportError:
+    pass
+
+
+MARKDOWN_CACHE_SIZE = 100
 
 
 class PopupsConfig(object):
@@ -6,9 +17,30 @@ class PopupsConfig(object):
     def __init__(self) -> None:
         self.classname = "lsp_popup"
         self.stylesheet = ""
+        self.phantom_stylesheet = ""
+        self._html = LRUCache(MARKDOWN_CACHE_SIZE)
+        self._scope_styles = {}  # type: Dict[Tuple[str, str], Any]
 
     def load_css(self) -> None:
         self.stylesheet = sublime.load_resource("Packages/LSP/popups.css")
+        self.phantom_stylesheet = sublime.load_resource("Packages/LSP/phantoms.css")
+
+    def md2html(self, view: sublime.View, content: str) -> str:
+        """ mdpopups.md2html, remembering the html of recently rendered content per color scheme """
+        key = (view.settings().get("color_scheme") or "", content)
+        html = self._html.get(key)
+        if html is None:
+            html = mdpopups.md2html(view, content)
+            self._html.set(key, html)
+        return html
+
+    def scope_style(self, view: sublime.View, scope: str) -> 'Any':
+        """ mdpopups.scope2style, computed once per color scheme """
+        key = (view.settings().get("color_scheme") or "", scope)
+        style = self._scope_styles.get(key)
+        if style is None:
+            style = self._scope_styles[key] = mdpopups.scope2style(view, scope)
+        return style
 
 
 popups = PopupsConfig()
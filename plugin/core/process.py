@@ -1,4 +1,5 @@
 from .logging import debug, exception_log
+from collections import OrderedDict
 import os
 import shutil
 import subprocess
@@ -63,6 +64,160 @@ def start_server(
     return process
 
 
+# The oldest standby process is terminated when starting one more would exceed this.
+MAX_STANDBY_PROCESSES = 4
+
+# Seconds a standby is kept after the last session for its command line ended, so restarting the server can take it.
+STANDBY_RELEASE_DELAY = 10.0
+
+
+def standby_key(config_name: str, server_binary_args: 'List[str]', working_dir: 'Optional[str]',
+                env: 'Dict[str, str]') -> 'Tuple[str, Tuple[str, ...], Optional[str], Tuple[Tuple[str, str], ...]]':
+    return config_name, tuple(server_binary_args), working_dir, tuple(sorted(env.items()))
+
+
+class StderrForwarder(object):
+    """ Passes the stderr output of a standby process on to the session that takes it """
+
+    def __init__(self) -> None:
+        self.target = None  # type: Optional[Callable[[str], None]]
+
+    def __call__(self, message: str) -> None:
+        target = self.target
+        if target:
+            target(message)
+
+
+class StandbyProcesses(object):
+    """ Started but unused server processes, each kept for the next session with the same command line.
+
+    Taking a process starts a replacement in the background, so restarting a server or starting it in another
+    window doesn't wait for the process to start up. A standby is kept while a session that took a process for its
+    command line runs or ended less than release_delay seconds ago, and at most MAX_STANDBY_PROCESSES are kept.
+    """
+
+    def __init__(self, start: 'Callable[..., Optional[subprocess.Popen]]' = start_server,
+                 release_delay: float = STANDBY_RELEASE_DELAY) -> None:
+        self._start = start
+        self._release_delay = release_delay
+        self._release_timers = {}  # type: Dict[Any, threading.Timer]
+        self._processes = OrderedDict()  # type: Dict[Any, Tuple[subprocess.Popen, StderrForwarder]]
+        self._users = {}  # type: Dict[Any, int]
+        self._config_names = None  # type: Optional[List[str]]
+        self._lock = threading.Lock()
+        self._generation = 0
+
+    def __len__(self) -> int:
+        return len(self._processes)
+
+    def take(self, config_name: str, server_binary_args: 'List[str]', working_dir: 'Optional[str]',
+             env: 'Dict[str, str]', on_stderr_log: 'Optional[Callable[[str], None]]') -> 'Optional[subprocess.Popen]':
+        """ Returns a running standby process for the command line if there is one, and starts a new standby.
+
+        Every call must be followed by a call to release once the session of the config ended.
+        """
+        key = standby_key(config_name, server_binary_args, working_dir, env)
+        with self._lock:
+            standby = self._processes.pop(key, None)
+            self._users[key] = self._users.get(key, 0) + 1
+            timer = self._release_timers.pop(key, None)
+            if timer:
+                timer.cancel()
+            generation = self._generation
+        threading.Thread(target=self._start_standby, args=(generation, key, server_binary_args, working_dir, env),
+                         daemon=True).start()
+        if standby:
+            process, forwarder = standby
+            if process.poll() is None:
+                debug("taking standby process", server_binary_args)
+                forwarder.target = on_stderr_log
+                return process
+        return None
+
+    def release(self, config_name: str, server_binary_args: 'List[str]', working_dir: 'Optional[str]',
+                env: 'Dict[str, str]') -> None:
+        """ Terminates the standby for the command line a while after the last session that took a process for it
+        ended, unless another session takes it first """
+        key = standby_key(config_name, server_binary_args, working_dir, env)
+        with self._lock:
+            users = self._users.get(key, 0) - 1
+            if users > 0:
+                self._users[key] = users
+                return
+            self._users[key] = 0
+            timer = threading.Timer(self._release_delay, self._release_unused)
+            timer.args = (key, timer)
+            timer.daemon = True
+            self._release_timers[key] = timer
+        timer.start()
+
+    def _release_unused(self, key: 'Any', timer: threading.Timer) -> None:
+        with self._lock:
+            if self._release_timers.get(key) is not timer:
+                return
+            del self._release_timers[key]
+            self._users.pop(key, None)
+            standby = self._processes.pop(key, None)
+        if standby:
+            _terminate(standby[0])
+
+    def prune(self, config_names: 'List[str]') -> None:
+        """ Terminates the standbys of configs that are no longer in config_names, e.g. when the settings changed """
+        with self._lock:
+            self._config_names = list(config_names)
+            keys = [key for key in self._processes if key[0] not in config_names]
+            standbys = [self._processes.pop(key) for key in keys]
+        for process, _ in standbys:
+            _terminate(process)
+
+    def clear(self) -> None:
+        with self._lock:
+            standbys = list(self._processes.values())
+            self._processes.clear()
+            self._users.clear()
+            for timer in self._release_timers.values():
+                timer.cancel()
+            self._release_timers.clear()
+            self._generation += 1
+        for process, _ in standbys:
+            _terminate(process)
+
+    def _start_standby(self, generation: int, key: 'Any', server_binary_args: 'List[str]', working_dir: 'Optional[str]',
+                       env: 'Dict[str, str]') -> None:
+        forwarder = StderrForwarder()
+        try:
+            process = self._start(server_binary_args, working_dir, env, forwarder)
+        except Exception as err:
+            exception_log("Failure starting a standby process", err)
+            return
+        if not process:
+            return
+        with self._lock:
+            if generation != self._generation or key not in self._users or (
+                    self._config_names is not None and key[0] not in self._config_names):
+                # cleared, released or pruned while starting
+                replaced = [(process, forwarder)]  # type: List[Tuple[subprocess.Popen, StderrForwarder]]
+            else:
+                replaced = []
+                if key in self._processes:
+                    replaced.append(self._processes.pop(key))
+                self._processes[key] = (process, forwarder)
+                while len(self._processes) > MAX_STANDBY_PROCESSES:
+                    replaced.append(self._processes.pop(next(iter(self._processes))))
+        for standby in replaced:
+            _terminate(standby[0])
+
+
+def _terminate(process: 'subprocess.Popen') -> None:
+    try:
+        process.terminate()
+    except Exception:
+        pass
+
+
+standby_processes = StandbyProcesses()
+
+
 def attach_logger(process: 'subprocess.Popen', stream: 'IO[Any]', log_callback: 'Callable[[str], None]') -> None:
     threading.Thread(target=log_stream, args=(process, stream, log_callback)).start()
 
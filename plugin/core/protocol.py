@@ -92,10 +92,13 @@ class DocumentHighlightKind(object):
 
 
 class Request:
-    def __init__(self, method: str, params: 'Optional[Mapping[str, Any]]') -> None:
+    def __init__(self, method: str, params: 'Optional[Mapping[str, Any]]',
+                 partial_result_token: 'Optional[Union[int, str]]' = None) -> None:
         self.method = method
         self.params = params
         self.jsonrpc = "2.0"
+        # set for requests that can stream partial results through $/progress notifications.
+        self.partial_result_token = partial_result_token
 
     @classmethod
     def initialize(cls, params: dict) -> 'Request':
@@ -114,8 +117,8 @@ class Request:
         return Request("textDocument/signatureHelp", params)
 
     @classmethod
-    def references(cls, params: dict) -> 'Request':
-        return Request("textDocument/references", params)
+    def references(cls, params: dict, partial_result_token: 'Optional[Union[int, str]]' = None) -> 'Request':
+        return Request("textDocument/references", params, partial_result_token)
 
     @classmethod
     def definition(cls, params: dict) -> 'Request':
@@ -150,8 +153,8 @@ class Request:
         return Request("workspace/executeCommand", params)
 
     @classmethod
-    def workspaceSymbol(cls, params: dict) -> 'Request':
-        return Request("workspace/symbol", params)
+    def workspaceSymbol(cls, params: dict, partial_result_token: 'Optional[Union[int, str]]' = None) -> 'Request':
+        return Request("workspace/symbol", params, partial_result_token)
 
     @classmethod
     def formatting(cls, params: dict) -> 'Request':
@@ -166,13 +169,21 @@ class Request:
         return Request("textDocument/rangeFormatting", params)
 
     @classmethod
-    def documentSymbols(cls, params: dict) -> 'Request':
-        return Request("textDocument/documentSymbol", params)
+    def documentSymbols(cls, params: dict, partial_result_token: 'Optional[Union[int, str]]' = None) -> 'Request':
+        return Request("textDocument/documentSymbol", params, partial_result_token)
 
     @classmethod
     def documentHighlight(cls, params: dict) -> 'Request':
         return Request("textDocument/documentHighlight", params)
 
+    @classmethod
+    def documentDiagnostic(cls, params: dict) -> 'Request':
+        return Request("textDocument/diagnostic", params)
+
+    @classmethod
+    def workspaceDiagnostic(cls, params: dict) -> 'Request':
+        return Request("workspace/diagnostic", params)
+
     @classmethod
     def resolveCompletionItem(cls, params: dict) -> 'Request':
         return Request("completionItem/resolve", params)
@@ -192,6 +203,8 @@ class Request:
         }  # type: Dict[str, Any]
         if self.params is not None:
             r["params"] = self.params
+        if self.partial_result_token is not None:
+            r["params"] = dict(self.params or {}, partialResultToken=self.partial_result_token)
         return r
 
 
@@ -244,6 +257,10 @@ class Notification:
     def didChangeWorkspaceFolders(cls, params: dict) -> 'Notification':
         return Notification("workspace/didChangeWorkspaceFolders", params)
 
+    @classmethod
+    def cancelRequest(cls, request_id: int) -> 'Notification':
+        return Notification("$/cancelRequest", {"id": request_id})
+
     @classmethod
     def exit(cls) -> 'Notification':
         return Notification("exit")
@@ -107,6 +107,8 @@ class Client(object):
         self.request_id = 0
         self.logger = PreformattedPayloadLogger(settings, "server", debug)
         self._response_handlers = {}  # type: Dict[int, Tuple[Optional[Callable], Optional[Callable[[Any], None]]]]
+        self._partial_result_handlers = {}  # type: Dict[Union[int, str], Callable[[Any], None]]
+        self._partial_result_tokens = {}  # type: Dict[int, Union[int, str]]
         self._request_handlers = {}  # type: Dict[str, Callable]
         self._notification_handlers = {}  # type: Dict[str, Callable]
         self._sync_request_results = {}  # type: Dict[int, Optional[Any]]
@@ -122,12 +124,23 @@ class Client(object):
             request: Request,
             handler: 'Callable[[Optional[Any]], None]',
             error_handler: 'Optional[Callable[[Any], None]]' = None,
-    ) -> 'None':
+            partial_handler: 'Optional[Callable[[Any], None]]' = None,
+    ) -> 'Optional[int]':
+        """
+        Sends a request and returns its id. With a partial_handler, the server may send parts of the result through
+        $/progress notifications before the response, which then only holds the remaining part.
+        """
         self.request_id += 1
         if self.transport is not None:
             self.logger.outgoing_request(self.request_id, request.method, request.params, blocking=False)
             self._response_handlers[self.request_id] = (handler, error_handler)
+            if partial_handler is not None:
+                if request.partial_result_token is None:
+                    request.partial_result_token = "partialResult/{}".format(self.request_id)
+                self._partial_result_handlers[request.partial_result_token] = partial_handler
+                self._partial_result_tokens[self.request_id] = request.partial_result_token
             self.send_payload(request.to_payload(self.request_id))
+            return self.request_id
         else:
             debug('unable to send', request.method)
             if error_handler is not None:
@@ -157,6 +170,15 @@ class Client(object):
             return None
         return result
 
+    def cancel_request(self, request_id: int) -> None:
+        """ Asks the server to cancel a request sent with send_request. Its handlers won't be called anymore. """
+        if request_id in self._response_handlers:
+            self._response_handlers[request_id] = (lambda result: None, lambda error: None)
+            token = self._partial_result_tokens.pop(request_id, None)
+            if token is not None:
+                self._partial_result_handlers.pop(token, None)
+            self.send_notification(Notification.cancelRequest(request_id))
+
     def send_notification(self, notification: Notification) -> None:
         if self.transport is not None:
             self.logger.outgoing_notification(notification.method, notification.params)
@@ -225,6 +247,9 @@ class Client(object):
         # because of the usage of the condition variable below.
         request_id = int(response["id"])
         handler, error_handler = self._response_handlers.pop(request_id, (None, None))
+        token = self._partial_result_tokens.pop(request_id, None)
+        if token is not None:
+            self._partial_result_handlers.pop(token, None)
         if "result" in response and "error" not in response:
             result = response["result"]
             self.logger.incoming_response(request_id, result)
@@ -262,6 +287,12 @@ class Client(object):
                 self.logger.incoming_request(request_id_int, method, params, unhandled)
 
             self.handle(request_id_int, method, params, "request", self._request_handlers, log)
+        elif method == "$/progress" and params and params.get("token") in self._partial_result_handlers:
+            self.logger.incoming_notification(method, params, False)
+            try:
+                self._partial_result_handlers[params["token"]](params.get("value"))
+            except Exception as err:
+                exception_log("Error handling partial result", err)
         else:
             self.handle(None, method, params, "notification", self._notification_handlers,
                         self.logger.incoming_notification)
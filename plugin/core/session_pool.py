@@ -0,0 +1,241 @@
+import json
+import threading
+from .logging import debug
+from .protocol import WorkspaceFolder
+from .sessions import Session
+from .types import ClientConfig, ClientStates
+
+try:
+    from typing_extensions import Protocol
+    from typing import Any, Callable, Dict, List, Optional, Tuple
+    assert Any and Callable and Dict and List and Optional and Tuple and WorkspaceFolder and ClientConfig
+    SessionKey = Tuple[str, Tuple[str, ...], str]
+    SessionStarter = Callable[[Callable[[Session], None], Callable[[Session], None], Callable[[str], None]],
+                              Optional[Session]]
+except ImportError:
+    Protocol = object  # type: ignore
+
+
+class SessionUser(Protocol):
+    """ A window using a pooled session """
+
+    def prepare_session(self, session: Session) -> None:
+        """ Called before the initialize request of a session this window started """
+        ...
+
+    def initialize_session(self, session: Session) -> None:
+        """ Called once the server is initialized, for the first window using it """
+        ...
+
+    def join_session(self, session: Session) -> None:
+        """ Called for the other windows, once the server is initialized """
+        ...
+
+    def leave_session(self, config_name: str) -> None:
+        """ Called when a session ended, or when this window released a session other windows still use """
+        ...
+
+    def on_shared_session_ended(self, config_name: str) -> None:
+        """ Called when another window ended a session this window uses, e.g. to restart it """
+        ...
+
+
+def session_key(config: ClientConfig, workspace_folders: 'List[WorkspaceFolder]') -> 'SessionKey':
+    """ Windows share a session only when the server would be started and initialized the same way for them """
+    resolved = json.dumps({
+        "command": config.binary_args,
+        "tcp": [config.tcp_host, config.tcp_port, config.tcp_mode],
+        "env": config.env,
+        "settings": config.settings,
+        "init_options": config.init_options
+    }, sort_keys=True, default=str)
+    return config.name, tuple(sorted(folder.path for folder in workspace_folders)), resolved
+
+
+class PooledSession(object):
+    """ A session with the windows using it, in the order they acquired it, and their handlers for the server """
+
+    def __init__(self, key: 'SessionKey', user: SessionUser) -> None:
+        self.key = key
+        self.session = None  # type: Optional[Session]
+        self.users = [user]  # type: List[SessionUser]
+        self.ended_by = None  # type: Optional[SessionUser]
+        self._request_handlers = {}  # type: Dict[str, Dict[int, Callable[[Any, int], None]]]
+        self._notification_handlers = {}  # type: Dict[str, Dict[int, Callable[[Any], None]]]
+        self._crash_handlers = {}  # type: Dict[int, Callable[[], None]]
+
+    def on_request(self, user: SessionUser, method: str, handler: 'Callable[[Any, int], None]') -> None:
+        handlers = self._request_handlers.get(method)
+        if handlers is None:
+            handlers = self._request_handlers[method] = {}
+            if self.session:
+                self.session.client.on_request(
+                    method, lambda params, request_id: self._handle_request(method, params, request_id))
+        handlers[id(user)] = handler
+
+    def on_notification(self, user: SessionUser, method: str, handler: 'Callable[[Any], None]') -> None:
+        handlers = self._notification_handlers.get(method)
+        if handlers is None:
+            handlers = self._notification_handlers[method] = {}
+            if self.session:
+                self.session.client.on_notification(method, lambda params: self._handle_notification(method, params))
+        handlers[id(user)] = handler
+
+    def set_crash_handler(self, user: SessionUser, handler: 'Callable[[], None]') -> None:
+        if not self._crash_handlers and self.session:
+            self.session.client.set_crash_handler(self._handle_crash)
+        self._crash_handlers[id(user)] = handler
+
+    def remove_user(self, user: SessionUser) -> None:
+        self.users.remove(user)
+        for handlers in list(self._request_handlers.values()) + list(self._notification_handlers.values()):
+            handlers.pop(id(user), None)
+        self._crash_handlers.pop(id(user), None)
+
+    def handle_pre_initialize(self, session: Session) -> None:
+        self.session = session
+        self.users[0].prepare_session(session)
+
+    def handle_post_initialize(self, session: Session) -> None:
+        self.users[0].initialize_session(session)
+        for user in self.users[1:]:
+            user.join_session(session)
+
+    def _first_handler(self, handlers: 'Dict[int, Any]') -> 'Optional[Any]':
+        for user in self.users:
+            handler = handlers.get(id(user))
+            if handler:
+                return handler
+        return None
+
+    def _handle_request(self, method: str, params: 'Any', request_id: int) -> None:
+        # a request gets one response, so the window that acquired the session first handles it.
+        handler = self._first_handler(self._request_handlers.get(method, {}))
+        if handler:
+            handler(params, request_id)
+
+    def _handle_notification(self, method: str, params: 'Any') -> None:
+        handlers = self._notification_handlers.get(method, {})
+        for user in list(self.users):
+            handler = handlers.get(id(user))
+            if handler:
+                handler(params)
+
+    def _handle_crash(self) -> None:
+        handler = self._first_handler(self._crash_handlers)
+        if handler:
+            handler()
+
+
+class SessionPool(object):
+    """ Sessions shared by the windows that use the same config with the same workspace folders.
+
+    The first window that acquires a session starts it. It ends once the last window released it, or when a window
+    ends it for all, e.g. to restart the server. Requests from the server are handled by the first window still using
+    the session and notifications by all windows, while each window syncs its own documents.
+    """
+
+    def __init__(self) -> None:
+        self._entries = {}  # type: Dict[SessionKey, PooledSession]
+        # sessions are acquired and released on the async thread, but end on the thread reading from the server.
+        self._lock = threading.Lock()
+
+    def acquire(self, config: ClientConfig, workspace_folders: 'List[WorkspaceFolder]', user: SessionUser,
+                start: 'SessionStarter') -> 'Optional[Session]':
+        key = session_key(config, workspace_folders)
+        joined = False
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry.session and entry.session.state != ClientStates.STOPPING:
+                session = entry.session
+                if user not in entry.users:
+                    debug("sharing session", config.name, "with another window")
+                    entry.users.append(user)
+                    joined = session.state == ClientStates.READY
+            else:
+                session = None
+                entry = PooledSession(key, user)
+                self._entries[key] = entry
+        if session:
+            if joined:
+                user.join_session(session)
+            return session
+        started = entry
+        try:
+            session = start(started.handle_pre_initialize, started.handle_post_initialize,
+                            lambda config_name: self._handle_post_exit(started, config_name))
+        finally:
+            if session is None:
+                with self._lock:
+                    if self._entries.get(key) is started:
+                        del self._entries[key]
+        return session
+
+    def release(self, session: Session, user: SessionUser) -> None:
+        """ Stops using a session, which ends when no other window uses it """
+        with self._lock:
+            entry = self._entry(session)
+            if not entry or user not in entry.users:
+                return
+            shared = len(entry.users) > 1
+            if shared:
+                entry.remove_user(user)
+            else:
+                entry.ended_by = user
+        if shared:
+            user.leave_session(session.config.name)
+        else:
+            session.end()
+
+    def end(self, session: Session, user: SessionUser) -> None:
+        """ Ends a session for all windows using it """
+        with self._lock:
+            entry = self._entry(session)
+            if entry:
+                entry.ended_by = user
+                self._entries.pop(entry.key, None)
+        session.end()
+
+    def on_request(self, session: Session, user: SessionUser, method: str,
+                   handler: 'Callable[[Any, int], None]') -> None:
+        with self._lock:
+            entry = self._entry(session)
+        if entry:
+            entry.on_request(user, method, handler)
+        else:
+            session.client.on_request(method, handler)
+
+    def on_notification(self, session: Session, user: SessionUser, method: str,
+                        handler: 'Callable[[Any], None]') -> None:
+        with self._lock:
+            entry = self._entry(session)
+        if entry:
+            entry.on_notification(user, method, handler)
+        else:
+            session.client.on_notification(method, handler)
+
+    def set_crash_handler(self, session: Session, user: SessionUser, handler: 'Callable[[], None]') -> None:
+        with self._lock:
+            entry = self._entry(session)
+        if entry:
+            entry.set_crash_handler(user, handler)
+        else:
+            session.client.set_crash_handler(handler)
+
+    def _entry(self, session: Session) -> 'Optional[PooledSession]':
+        # called with the lock held.
+        for entry in self._entries.values():
+            if entry.session is session:
+                return entry
+        return None
+
+    def _handle_post_exit(self, entry: PooledSession, config_name: str) -> None:
+        with self._lock:
+            if self._entries.get(entry.key) is entry:
+                del self._entries[entry.key]
+            users = list(entry.users)
+        for user in users:
+            if entry.ended_by is None or user is entry.ended_by:
+                user.leave_session(config_name)
+            else:
+                user.on_shared_session_ended(config_name)
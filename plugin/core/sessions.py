@@ -2,7 +2,7 @@ from .types import ClientConfig, ClientStates, Settings
 from .protocol import Request, Notification
 from .transports import start_tcp_transport, start_tcp_listener, TCPTransport, Transport
 from .rpc import Client, attach_stdio_client, Response
-from .process import start_server
+from .process import start_server, standby_processes
 from .logging import debug
 import os
 import threading
@@ -44,7 +44,20 @@ def create_session(config: ClientConfig,
             server_args = list(s.replace("{port}", str(tcp_port)) for s in config.binary_args)
 
         working_dir = workspace_folders[0].path if workspace_folders else None
-        process = start_server(server_args, working_dir, env, on_stderr_log)
+        process = None
+        standby = config.name in settings.standby_servers and not config.tcp_mode and not tcp_port
+        if standby:
+            process = standby_processes.take(config.name, server_args, working_dir, env, on_stderr_log)
+            on_session_exit = on_post_exit
+
+            def release_standby(config_name: str) -> None:
+                standby_processes.release(config.name, server_args, working_dir, env)
+                if on_session_exit:
+                    on_session_exit(config_name)
+
+            on_post_exit = release_standby
+        if not process:
+            process = start_server(server_args, working_dir, env, on_stderr_log)
         if process:
             if config.tcp_mode == "host":
                 client_socket, address = socket.accept()
@@ -62,6 +75,8 @@ def create_session(config: ClientConfig,
                         pass
             else:
                 session = with_client(attach_stdio_client(process, settings))
+        if standby and not session:
+            standby_processes.release(config.name, server_args, working_dir, env)
     else:
         if config.tcp_port:
             transport = start_tcp_transport(config.tcp_port)
@@ -108,6 +123,7 @@ def get_initialize_params(workspace_folders: 'List[WorkspaceFolder]', config: Cl
                 "references": {},
                 "documentHighlight": {},
                 "documentSymbol": {
+                    "hierarchicalDocumentSymbolSupport": True,
                     "symbolKind": {
                         "valueSet": symbol_kinds
                     }
@@ -129,6 +145,9 @@ def get_initialize_params(workspace_folders: 'List[WorkspaceFolder]', config: Cl
                 "colorProvider": {},
                 "publishDiagnostics": {
                     "relatedInformation": True
+                },
+                "diagnostic": {
+                    "relatedDocumentSupport": True
                 }
             },
             "workspace": {
@@ -141,7 +160,10 @@ def get_initialize_params(workspace_folders: 'List[WorkspaceFolder]', config: Cl
                         "valueSet": symbol_kinds
                     }
                 },
-                "configuration": True
+                "configuration": True,
+                "diagnostics": {
+                    "refreshSupport": True
+                }
             }
         }
     }
@@ -180,6 +202,9 @@ class Session(object):
         self.client = client
         self.ready_lock = threading.Lock()
         self._workspace_folders = workspace_folders
+        # windows sharing the session each sync their documents, so open documents are counted per uri.
+        self._document_users = {}  # type: Dict[str, int]
+        self._document_versions = {}  # type: Dict[str, int]
         if on_pre_initialize:
             on_pre_initialize(self)
         self._initialize()
@@ -203,6 +228,27 @@ class Session(object):
                 return True
         return False
 
+    def open_document(self, uri: str) -> bool:
+        """ Counts a window opening the document, returning whether the server still has to be told """
+        count = self._document_users.get(uri, 0)
+        self._document_users[uri] = count + 1
+        return count == 0
+
+    def close_document(self, uri: str) -> bool:
+        """ Counts a window closing the document, returning whether the server has to be told """
+        count = self._document_users.pop(uri, 0) - 1
+        if count > 0:
+            self._document_users[uri] = count
+            return False
+        self._document_versions.pop(uri, None)
+        return count == 0
+
+    def document_version(self, uri: str, version: int) -> int:
+        """ The version to send for a change, which keeps increasing when several windows change the document """
+        version = max(version, self._document_versions.get(uri, 0) + 1)
+        self._document_versions[uri] = version
+        return version
+
     def update_folders(self, folders: 'List[WorkspaceFolder]') -> None:
         with self.ready_lock:
             if self._unsafe_supports_workspace_folders():
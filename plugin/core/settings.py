@@ -1,6 +1,7 @@
 import sublime
 from .types import Settings, ClientConfig, LanguageConfig
 from .logging import debug
+from .process import standby_processes
 
 PLUGIN_NAME = 'LSP'
 
@@ -77,12 +78,26 @@ def update_settings(settings: Settings, settings_obj: sublime.Settings) -> None:
                                                            settings.document_highlight_scopes)
     settings.diagnostics_gutter_marker = read_str_setting(settings_obj, "diagnostics_gutter_marker", "dot")
     settings.show_code_actions_bulb = read_bool_setting(settings_obj, "show_code_actions_bulb", False)
+    settings.prefetch_code_actions = read_bool_setting(settings_obj, "prefetch_code_actions", False)
     settings.show_symbol_action_links = read_bool_setting(settings_obj, "show_symbol_action_links", False)
+    settings.prefetch_hover = read_bool_setting(settings_obj, "prefetch_hover", False)
+    settings.prefetch_definition = read_bool_setting(settings_obj, "prefetch_definition", False)
+    settings.pull_workspace_diagnostics = read_bool_setting(settings_obj, "pull_workspace_diagnostics", False)
+    settings.edit_closed_files_on_disk = read_bool_setting(settings_obj, "edit_closed_files_on_disk", False)
+    settings.share_servers_between_windows = read_bool_setting(settings_obj, "share_servers_between_windows", False)
     settings.only_show_lsp_completions = read_bool_setting(settings_obj, "only_show_lsp_completions", False)
     settings.complete_all_chars = read_bool_setting(settings_obj, "complete_all_chars", True)
     settings.completion_hint_type = read_str_setting(settings_obj, "completion_hint_type", "auto")
+    settings.prefetch_completion_resolve = read_bool_setting(settings_obj, "prefetch_completion_resolve", False)
+    settings.completion_deadline_ms = read_int_setting(settings_obj, "completion_deadline_ms", 300)
+    settings.pre_save_timeout_ms = read_int_setting(settings_obj, "pre_save_timeout_ms", 1000)
+    settings.apply_late_format_on_save = read_bool_setting(settings_obj, "apply_late_format_on_save", False)
+    settings.prefetch_document_symbols = read_bool_setting(settings_obj, "prefetch_document_symbols", False)
     settings.show_references_in_quick_panel = read_bool_setting(settings_obj, "show_references_in_quick_panel", False)
+    settings.workspace_symbols_as_you_type = read_bool_setting(settings_obj, "workspace_symbols_as_you_type", False)
+    settings.workspace_symbol_index = read_bool_setting(settings_obj, "workspace_symbol_index", False)
     settings.disabled_capabilities = read_array_setting(settings_obj, "disabled_capabilities", [])
+    settings.standby_servers = read_array_setting(settings_obj, "standby_servers", [])
     settings.log_debug = read_bool_setting(settings_obj, "log_debug", False)
     settings.log_server = read_bool_setting(settings_obj, "log_server", True)
     settings.log_stderr = read_bool_setting(settings_obj, "log_stderr", False)
@@ -147,13 +162,18 @@ settings = Settings()
 client_configs = ClientConfigs()
 
 
+def _on_new_settings(settings_obj: sublime.Settings) -> None:
+    update_settings(settings, settings_obj)
+    standby_processes.prune(settings.standby_servers)
+
+
 def load_settings() -> None:
     global _settings_obj
     loaded_settings_obj = sublime.load_settings("LSP.sublime-settings")
     _settings_obj = loaded_settings_obj
     update_settings(settings, loaded_settings_obj)
     client_configs.update(loaded_settings_obj)
-    loaded_settings_obj.add_on_change("_on_new_settings", lambda: update_settings(settings, loaded_settings_obj))
+    loaded_settings_obj.add_on_change("_on_new_settings", lambda: _on_new_settings(loaded_settings_obj))
     loaded_settings_obj.add_on_change("_on_new_client_settings", lambda: client_configs.update(loaded_settings_obj))
 
 
@@ -0,0 +1,234 @@
+import bisect
+import os
+import re
+import threading
+from array import array
+from .completion import fuzzy_score
+from .url import filename_to_uri
+
+try:
+    from typing import Any, Dict, Iterable, List, Optional, Tuple
+    assert Any and Dict and Iterable and List and Optional and Tuple
+    # (name, kind, container name, line, character)
+    IndexEntry = Tuple[str, int, str, int, int]
+except ImportError:
+    pass
+
+
+SYMBOL_INDEX_HEADER = "LSP symbol index 1\n"
+
+# Fuzzy matching stops after scoring this many candidates, to bound the time of short queries on large indexes.
+SYMBOL_INDEX_MAX_CANDIDATES = 5000
+
+
+def _clean(text: str) -> str:
+    return text.replace("\t", " ").replace("\n", " ")
+
+
+class SymbolIndexSnapshot(object):
+    """ The names of an index in one sorted, newline separated string, to search them with bisect and regexes """
+
+    def __init__(self, files: 'Dict[str, Tuple[float, List[IndexEntry]]]') -> None:
+        keyed = []  # type: List[Tuple[str, str, IndexEntry]]
+        for file_path, (_, entries) in files.items():
+            for entry in entries:
+                keyed.append((_clean(entry[0]).lower(), file_path, entry))
+        keyed.sort(key=lambda item: item[0])
+        self.refs = [(file_path, entry) for _, file_path, entry in keyed]
+        self.starts = array('L')
+        offset = 0
+        for name, _, _ in keyed:
+            self.starts.append(offset)
+            offset += len(name) + 1
+        self.blob = "\n".join(name for name, _, _ in keyed)
+
+    def key(self, position: int) -> str:
+        start = self.starts[position]
+        end = self.starts[position + 1] - 1 if position + 1 < len(self.starts) else len(self.blob)
+        return self.blob[start:end]
+
+    def prefix_range(self, prefix: str) -> 'Tuple[int, int]':
+        lo, hi = 0, len(self.refs)
+        while lo < hi:
+            middle = (lo + hi) // 2
+            if self.key(middle) < prefix:
+                lo = middle + 1
+            else:
+                hi = middle
+        first = lo
+        hi = len(self.refs)
+        while lo < hi:
+            middle = (lo + hi) // 2
+            if self.key(middle).startswith(prefix):
+                lo = middle + 1
+            else:
+                hi = middle
+        return first, lo
+
+    def query(self, query: str, limit: int) -> 'List[int]':
+        lowered = query.lower()
+        first, last = self.prefix_range(lowered)
+        # shorter names are closer to the query
+        positions = sorted(range(first, last), key=lambda position: (len(self.refs[position][1][0]), position))
+        del positions[limit:]
+        if len(positions) < limit:
+            # a subsequence of the query within a line; each gap stops at the next wanted character.
+            chars = [re.escape(char) for char in lowered]
+            pattern = re.compile(chars[0] + "".join("[^{}\n]*{}".format(char, char) for char in chars[1:]))
+            scored = []  # type: List[Tuple[int, int]]
+            previous = -1
+            for match in pattern.finditer(self.blob):
+                position = bisect.bisect_right(self.starts, match.start()) - 1
+                if position == previous or first <= position < last:
+                    continue
+                previous = position
+                score = fuzzy_score(query, self.refs[position][1][0])
+                if score is not None:
+                    scored.append((-score, position))
+                    if len(scored) >= SYMBOL_INDEX_MAX_CANDIDATES:
+                        break
+            scored.sort()
+            positions.extend(position for _, position in scored[:limit - len(positions)])
+        return positions
+
+
+class SymbolIndex(object):
+    """ Symbols of the files of a project, with the modification time of each file, saved to a file.
+
+    Queries match a prefix of the symbol name first, then fuzzy subsequences. They search a snapshot of the names,
+    which rebuild() renews after changes, so building it for large indexes can happen off the main thread.
+    """
+
+    def __init__(self, path: 'Optional[str]') -> None:
+        self.path = path
+        self._files = {}  # type: Dict[str, Tuple[float, List[IndexEntry]]]
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._snapshot = None  # type: Optional[SymbolIndexSnapshot]
+        self._snapshot_stale = True
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(entries) for _, entries in self._files.values())
+
+    def mtime(self, file_path: str) -> 'Optional[float]':
+        with self._lock:
+            stored = self._files.get(file_path)
+            return stored[0] if stored else None
+
+    def set_file(self, file_path: str, mtime: float, entries: 'List[IndexEntry]') -> None:
+        """ Replaces the symbols of a file, as from a documentSymbol response """
+        with self._lock:
+            self._files[file_path] = (mtime, list(entries))
+            self._changed()
+
+    def merge_symbols(self, file_path: str, mtime: float, entries: 'List[IndexEntry]') -> None:
+        """ Adds symbols of a file, as from a workspace/symbol response. Symbols of an older version are dropped. """
+        with self._lock:
+            stored = self._files.get(file_path)
+            if stored and stored[0] == mtime:
+                known = set(stored[1])
+                new_entries = [entry for entry in entries if entry not in known]
+                if not new_entries:
+                    return
+                self._files[file_path] = (mtime, stored[1] + new_entries)
+            else:
+                self._files[file_path] = (mtime, list(entries))
+            self._changed()
+
+    def remove_file(self, file_path: str) -> None:
+        with self._lock:
+            if self._files.pop(file_path, None):
+                self._changed()
+
+    def is_empty(self) -> bool:
+        return not self._files
+
+    def is_modified(self) -> bool:
+        return self._dirty
+
+    def rebuild(self) -> None:
+        """ Renews the snapshot searched by queries, if the index changed """
+        with self._lock:
+            if not self._snapshot_stale:
+                return
+            self._snapshot_stale = False
+            files = dict(self._files)
+        self._snapshot = SymbolIndexSnapshot(files)
+
+    def query(self, query: str, limit: int) -> 'List[Dict[str, Any]]':
+        """ Returns up to limit symbols matching query as SymbolInformation, prefix matches first """
+        snapshot = self._snapshot
+        if not query or not snapshot:
+            return []
+        return [symbol_information(*snapshot.refs[position]) for position in snapshot.query(query, limit)]
+
+    def load(self) -> None:
+        """ Reads the saved index. Files that were updated in the meantime keep their symbols. """
+        if not self.path:
+            return
+        loaded = {}  # type: Dict[str, Tuple[float, List[IndexEntry]]]
+        try:
+            with open(self.path, encoding="utf-8") as file:
+                if file.readline() != SYMBOL_INDEX_HEADER:
+                    return
+                entries = []  # type: List[IndexEntry]
+                for line in file:
+                    fields = line.rstrip("\n").split("\t")
+                    if fields[0] == "F":
+                        entries = []
+                        loaded[fields[1]] = (float(fields[2]), entries)
+                    else:
+                        entries.append((fields[0], int(fields[1]), fields[2], int(fields[3]), int(fields[4])))
+        except (IOError, OSError, ValueError, IndexError):
+            return
+        with self._lock:
+            for file_path, stored in loaded.items():
+                self._files.setdefault(file_path, stored)
+            self._snapshot_stale = True
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        with self._lock:
+            files = list(self._files.items())
+            self._dirty = False
+        lines = [SYMBOL_INDEX_HEADER]
+        for file_path, (mtime, entries) in files:
+            lines.append("F\t{}\t{!r}\n".format(_clean(file_path), mtime))
+            for name, kind, container, line, character in entries:
+                lines.append("{}\t{}\t{}\t{}\t{}\n".format(_clean(name), kind, _clean(container), line, character))
+        temporary_path = self.path + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(temporary_path, "w", encoding="utf-8") as file:
+                file.writelines(lines)
+            os.replace(temporary_path, self.path)
+        except (IOError, OSError):
+            self._dirty = True
+
+    def _changed(self) -> None:
+        self._dirty = True
+        self._snapshot_stale = True
+
+
+def symbol_information(file_path: str, entry: 'IndexEntry') -> 'Dict[str, Any]':
+    name, kind, container, line, character = entry
+    point = {"line": line, "character": character}
+    return {
+        "name": name,
+        "kind": kind,
+        "containerName": container,
+        "location": {"uri": filename_to_uri(file_path), "range": {"start": point, "end": point}}
+    }
+
+
+def entries_of_symbol_information(symbols: 'Iterable[Dict[str, Any]]') -> 'Dict[str, List[IndexEntry]]':
+    """ Groups workspace/symbol results by file uri """
+    entries_by_uri = {}  # type: Dict[str, List[IndexEntry]]
+    for symbol in symbols:
+        start = symbol["location"]["range"]["start"]
+        entries_by_uri.setdefault(symbol["location"]["uri"], []).append(
+            (symbol["name"], symbol.get("kind") or 0, symbol.get("containerName") or "", start["line"],
+             start["character"]))
+    return entries_by_uri
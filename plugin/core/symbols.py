@@ -0,0 +1,109 @@
+from .cache import LRUCache
+from .completion import fuzzy_score
+from .protocol import Point, Range
+
+try:
+    from typing import Any, Dict, List, Optional
+    assert Any and Dict and List and Optional
+except ImportError:
+    pass
+
+
+DOCUMENT_SYMBOL_CACHE_SIZE = 50
+
+
+class SymbolEntry(object):
+    """ A DocumentSymbol or SymbolInformation of a document, with the dotted names of its containers """
+
+    def __init__(self, name: str, kind: int, range: Range, selection_range: Range, container: str,
+                 depth: int) -> None:
+        self.name = name
+        self.kind = kind
+        self.range = range
+        self.selection_range = selection_range
+        self.container = container
+        self.depth = depth
+
+    def __repr__(self) -> str:
+        return "{}({}, {}, {})".format(self.name, self.kind, self.range, self.container)
+
+
+def flatten_symbols(items: 'List[Dict[str, Any]]', container: str = "", depth: int = 0) -> 'List[SymbolEntry]':
+    """ Flattens a documentSymbol response in document order, parents before their children """
+    entries = []  # type: List[SymbolEntry]
+    for item in items:
+        kind = item.get("kind") or 0
+        if "location" in item:
+            # SymbolInformation, which has no children.
+            r = Range.from_lsp(item["location"]["range"])
+            entries.append(SymbolEntry(item["name"], kind, r, r, item.get("containerName") or container, depth))
+        else:
+            r = Range.from_lsp(item["range"])
+            selection_range = Range.from_lsp(item["selectionRange"]) if "selectionRange" in item else r
+            entries.append(SymbolEntry(item["name"], kind, r, selection_range, container, depth))
+            child_container = container + "." + item["name"] if container else item["name"]
+            entries.extend(flatten_symbols(item.get("children") or [], child_container, depth + 1))
+    return entries
+
+
+class DocumentSymbols(object):
+    """ The symbols of one version of a document """
+
+    def __init__(self, version: int, response: 'List[Dict[str, Any]]') -> None:
+        self.version = version
+        self.response = response
+        self.entries = flatten_symbols(response)
+
+    def containing(self, point: Point) -> 'List[SymbolEntry]':
+        """ The symbols whose range contains point, outermost first """
+        return sorted((entry for entry in self.entries if entry.range.contains(point)),
+                      key=lambda entry: entry.depth)
+
+
+class DocumentSymbolCache(object):
+    """ Document symbols keyed by (uri, version), keeping only the latest version of each document """
+
+    def __init__(self, max_size: int) -> None:
+        self._entries = LRUCache(max_size)
+
+    def get(self, uri: str, version: int) -> 'Optional[DocumentSymbols]':
+        return self._entries.get((uri, version))
+
+    def store(self, uri: str, version: int, response: 'List[Dict[str, Any]]') -> DocumentSymbols:
+        symbols = DocumentSymbols(version, response)
+        self._entries.discard(lambda key: key[0] == uri and key[1] != version)
+        self._entries.set((uri, version), symbols)
+        return symbols
+
+
+# Shared by everything that reads document symbols.
+document_symbol_cache = DocumentSymbolCache(DOCUMENT_SYMBOL_CACHE_SIZE)
+
+
+class WorkspaceSymbolCache(object):
+    """ The workspace symbols of the last query answered by the server, narrowed locally for longer queries """
+
+    def __init__(self) -> None:
+        self.query = None  # type: Optional[str]
+        self.symbols = []  # type: List[Dict[str, Any]]
+
+    def store(self, query: str, symbols: 'List[Dict[str, Any]]') -> None:
+        self.query = query
+        self.symbols = symbols
+
+    def can_narrow(self, query: str) -> bool:
+        return self.query is not None and query.startswith(self.query)
+
+    def narrow(self, query: str, limit: 'Optional[int]' = None) -> 'Optional[List[Dict[str, Any]]]':
+        """ Returns the cached symbols matching query, best first, or None if the cache doesn't cover query """
+        if not self.can_narrow(query):
+            return None
+        if query == self.query:
+            return self.symbols[:limit]
+        scored = []
+        for index, symbol in enumerate(self.symbols):
+            score = fuzzy_score(query, symbol["name"])
+            if score is not None:
+                scored.append((-score, index, symbol))
+        scored.sort(key=lambda item: item[:2])
+        return [symbol for _, _, symbol in scored[:limit]]
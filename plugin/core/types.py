@@ -27,11 +27,25 @@ class Settings(object):
         }
         self.diagnostics_gutter_marker = "dot"
         self.show_code_actions_bulb = False
+        self.prefetch_code_actions = False
         self.show_symbol_action_links = False
+        self.prefetch_hover = False
+        self.prefetch_definition = False
+        self.pull_workspace_diagnostics = False
+        self.edit_closed_files_on_disk = False
+        self.share_servers_between_windows = False
         self.complete_all_chars = False
         self.completion_hint_type = "auto"
+        self.prefetch_completion_resolve = False
+        self.completion_deadline_ms = 300
+        self.pre_save_timeout_ms = 1000
+        self.apply_late_format_on_save = False
+        self.prefetch_document_symbols = False
         self.show_references_in_quick_panel = False
+        self.workspace_symbols_as_you_type = False
+        self.workspace_symbol_index = False
         self.disabled_capabilities = []  # type: List[str]
+        self.standby_servers = []  # type: List[str]
         self.log_debug = True
         self.log_server = True
         self.log_stderr = False
@@ -0,0 +1,277 @@
+from abc import ABCMeta, abstractmethod
+import bisect
+import threading
+import sublime
+
+from .protocol import Range
+from .views import range_to_region, region_to_range
+
+try:
+    from typing import Any, List, Dict, Tuple, Optional, Iterable, Hashable
+    assert Any and List and Dict and Tuple and Optional and Iterable and Hashable
+except ImportError:
+    pass
+
+
+# Rows rendered above and below the visible part of a view.
+VIEWPORT_MARGIN_ROWS = 150
+
+# Up to this many ranges, everything is rendered at once and scrolling is not tracked.
+VIEWPORT_MIN_RANGES = 500
+
+VIEWPORT_POLL_INTERVAL_MS = 250
+
+
+class RangeIndex(object):
+    """ Ranges with attached data, ordered by start row to find the ones touching a span of rows """
+
+    def __init__(self, items: 'List[Tuple[Range, Any]]') -> None:
+        self._items = sorted(items, key=lambda item: (item[0].start.row, item[0].start.col))
+        self._start_rows = [item[0].start.row for item in self._items]
+        self._max_row_span = 0
+        for item in self._items:
+            self._max_row_span = max(self._max_row_span, item[0].end.row - item[0].start.row)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def all(self) -> 'List[Tuple[Range, Any]]':
+        return self._items
+
+    def between(self, first_row: int, last_row: int) -> 'List[Tuple[Range, Any]]':
+        lo = bisect.bisect_left(self._start_rows, first_row - self._max_row_span)
+        hi = bisect.bisect_right(self._start_rows, last_row)
+        return [item for item in self._items[lo:hi] if item[0].end.row >= first_row]
+
+
+def diff_rendered(rendered: 'Iterable[Hashable]', wanted: 'Iterable[Hashable]') -> 'Tuple[List[Any], List[Any]]':
+    """ Returns the rendered keys that are no longer wanted and the wanted keys that are not rendered yet """
+    wanted_keys = set(wanted)
+    rendered_keys = set(rendered)
+    return [key for key in rendered_keys if key not in wanted_keys], [key for key in wanted_keys
+                                                                      if key not in rendered_keys]
+
+
+def visible_rows(view: sublime.View, margin: int = 0) -> 'Tuple[int, int]':
+    visible = view.visible_region()
+    first_row = view.rowcol(visible.begin())[0]
+    last_row = view.rowcol(visible.end())[0]
+    return max(0, first_row - margin), last_row + margin
+
+
+class ViewportRenderer(object, metaclass=ABCMeta):
+    """ Renders the part of its ranges that is near the visible region of the view.
+
+    The full data is kept in RangeIndex instances. Only when there are more than VIEWPORT_MIN_RANGES ranges the
+    renderer restricts itself to the visible rows plus a margin, and re-renders once scrolling leaves that margin.
+
+    Ranges are stored with the change count of the view they were set for. Once the view was edited they point at
+    stale rows, so they are not rendered again: what is rendered already stays where Sublime moved it with the text,
+    until new ranges are set.
+    """
+
+    def __init__(self, view: sublime.View) -> None:
+        self.view = view
+        self._rendered_rows = None  # type: Optional[Tuple[int, int]]
+        self._lock = threading.Lock()
+
+    @abstractmethod
+    def size(self) -> int:
+        """ Returns the number of ranges """
+        pass
+
+    @abstractmethod
+    def _render(self, rows: 'Optional[Tuple[int, int]]', key: 'Optional[str]') -> None:
+        """ Renders the ranges within rows, or all of them when rows is None, only for the layer key if given """
+        pass
+
+    def render(self, key: 'Optional[str]' = None) -> None:
+        """ Renders everything, or only the layer with the given key when the rendered rows still fit """
+        with self._lock:
+            if self.size() > VIEWPORT_MIN_RANGES:
+                rendered = self._rendered_rows
+                first_row, last_row = visible_rows(self.view)
+                if key is None or not rendered or first_row < rendered[0] or last_row > rendered[1]:
+                    key = None
+                    self._rendered_rows = (max(0, first_row - VIEWPORT_MARGIN_ROWS), last_row + VIEWPORT_MARGIN_ROWS)
+                viewport_watcher.watch(self)
+            else:
+                if self._rendered_rows:
+                    key = None
+                self._rendered_rows = None
+                viewport_watcher.unwatch(self)
+            self._render(self._rendered_rows, key)
+
+    def on_viewport_changed(self) -> None:
+        rendered = self._rendered_rows
+        if rendered:
+            first_row, last_row = visible_rows(self.view)
+            if rendered[0] <= first_row and last_row <= rendered[1]:
+                return
+        self.render()
+
+    def _is_current(self, change_count: int) -> bool:
+        return change_count == self.view.change_count()
+
+    @staticmethod
+    def _select(index: RangeIndex, rows: 'Optional[Tuple[int, int]]') -> 'List[Tuple[Range, Any]]':
+        return index.between(*rows) if rows else index.all()
+
+
+class ViewportRegions(ViewportRenderer):
+    """ Region layers (one per key) of a view, rendered with add_regions """
+
+    def __init__(self, view: sublime.View) -> None:
+        super().__init__(view)
+        # (ranges, scope, icon, flags, change count)
+        self._layers = {}  # type: Dict[str, Tuple[RangeIndex, str, str, int, int]]
+
+    def size(self) -> int:
+        return sum(len(layer[0]) for layer in self._layers.values())
+
+    def set(self, key: str, ranges: 'List[Range]', scope: str, icon: str = "", flags: int = 0) -> None:
+        with self._lock:
+            self._layers[key] = (RangeIndex([(r, None) for r in ranges]), scope, icon, flags,
+                                 self.view.change_count())
+        self.render(key)
+
+    def erase(self, key: str) -> None:
+        with self._lock:
+            if self._layers.pop(key, None) is None:
+                return
+            self.view.erase_regions(key)
+        self.render(key)
+
+    def _render(self, rows: 'Optional[Tuple[int, int]]', key: 'Optional[str]') -> None:
+        for layer_key, (index, scope, icon, flags, change_count) in self._layers.items():
+            if (key is None or key == layer_key) and self._is_current(change_count):
+                regions = [range_to_region(r, self.view) for r, _ in self._select(index, rows)]
+                self.view.add_regions(layer_key, regions, scope, icon, flags)
+
+
+class ViewportPhantoms(ViewportRenderer):
+    """ Phantoms of a view with a common key, holding (range, content, layout) items.
+
+    Instead of a PhantomSet, which compares every new phantom with every existing one, rendered phantoms are kept
+    by (begin, end, content, layout), so an update only adds and erases the phantoms that changed.
+    """
+
+    def __init__(self, view: sublime.View, key: str) -> None:
+        super().__init__(view)
+        self._key = key
+        self._items = []  # type: List[Tuple[Range, str, int]]
+        self._index = RangeIndex([])
+        self._change_count = view.change_count()
+        self._rendered = {}  # type: Dict[Tuple[int, int, str, int], Tuple[int, int]]
+
+    def size(self) -> int:
+        return len(self._index)
+
+    def update(self, items: 'List[Tuple[Range, str, int]]') -> None:
+        with self._lock:
+            self._set_items(items, self.view.change_count())
+        self.render()
+
+    def track_edits(self) -> None:
+        """ Moves the ranges of rendered phantoms to the place Sublime moved the phantoms to while editing.
+
+        When all phantoms are rendered, all ranges are up to date again. Otherwise those that aren't rendered are
+        stale, and the phantoms are not rendered again until new items are set.
+        """
+        with self._lock:
+            change_count = self.view.change_count() if self._rendered_rows is None else self._change_count
+            if not self._rendered:
+                self._change_count = change_count
+                return
+            rendered = list(self._rendered.items())
+            regions = self.view.query_phantoms([phantom_id for _, (phantom_id, _) in rendered])
+            items = list(self._items)
+            self._rendered = {}
+            for (key, (phantom_id, item_index)), region in zip(rendered, regions):
+                _, content, layout = items[item_index]
+                items[item_index] = (region_to_range(self.view, region), content, layout)
+                self._rendered[(region.begin(), region.end(), content, layout)] = (phantom_id, item_index)
+            self._set_items(items, change_count)
+
+    def _set_items(self, items: 'List[Tuple[Range, str, int]]', change_count: int) -> None:
+        self._items = items
+        self._change_count = change_count
+        self._index = RangeIndex([(r, (content, layout, i)) for i, (r, content, layout) in enumerate(items)])
+
+    def _render(self, rows: 'Optional[Tuple[int, int]]', key: 'Optional[str]') -> None:
+        if not self._is_current(self._change_count):
+            return
+        wanted = {}  # type: Dict[Tuple[int, int, str, int], int]
+        for r, (content, layout, item_index) in self._select(self._index, rows):
+            region = range_to_region(r, self.view)
+            wanted[(region.begin(), region.end(), content, layout)] = item_index
+        stale, missing = diff_rendered(self._rendered, wanted)
+        for phantom_key in stale:
+            self.view.erase_phantom_by_id(self._rendered.pop(phantom_key)[0])
+        for phantom_key in missing:
+            begin, end, content, layout = phantom_key
+            phantom_id = self.view.add_phantom(self._key, sublime.Region(begin, end), content, layout)
+            self._rendered[phantom_key] = (phantom_id, wanted[phantom_key])
+        for phantom_key, (phantom_id, _) in self._rendered.items():
+            self._rendered[phantom_key] = (phantom_id, wanted[phantom_key])
+
+
+class ViewportWatcher(object):
+    """ Polls the visible region of views with watched renderers, as Sublime has no scroll event """
+
+    def __init__(self) -> None:
+        self._renderers = {}  # type: Dict[int, ViewportRenderer]
+        self._visible_regions = {}  # type: Dict[int, Tuple[int, int]]
+        self._polling = False
+
+    def watch(self, renderer: ViewportRenderer) -> None:
+        self._renderers[id(renderer)] = renderer
+        if not self._polling:
+            self._polling = True
+            sublime.set_timeout_async(self._poll, VIEWPORT_POLL_INTERVAL_MS)
+
+    def unwatch(self, renderer: ViewportRenderer) -> None:
+        self._renderers.pop(id(renderer), None)
+        self._visible_regions.pop(id(renderer), None)
+
+    def _poll(self) -> None:
+        for key, renderer in list(self._renderers.items()):
+            if not renderer.view.is_valid():
+                self.unwatch(renderer)
+                continue
+            visible = renderer.view.visible_region()
+            if self._visible_regions.get(key) != (visible.a, visible.b):
+                self._visible_regions[key] = (visible.a, visible.b)
+                renderer.on_viewport_changed()
+        if self._renderers:
+            sublime.set_timeout_async(self._poll, VIEWPORT_POLL_INTERVAL_MS)
+        else:
+            self._polling = False
+
+
+viewport_watcher = ViewportWatcher()
+_regions_by_view = {}  # type: Dict[int, ViewportRegions]
+_phantoms_by_view = {}  # type: Dict[Tuple[int, str], ViewportPhantoms]
+
+
+def _discard_closed_views() -> None:
+    for view_id in [view_id for view_id, r in _regions_by_view.items() if not r.view.is_valid()]:
+        del _regions_by_view[view_id]
+    for key in [key for key, p in _phantoms_by_view.items() if not p.view.is_valid()]:
+        del _phantoms_by_view[key]
+
+
+def viewport_regions(view: sublime.View) -> ViewportRegions:
+    renderer = _regions_by_view.get(view.id())
+    if not renderer:
+        _discard_closed_views()
+        renderer = _regions_by_view[view.id()] = ViewportRegions(view)
+    return renderer
+
+
+def viewport_phantoms(view: sublime.View, key: str) -> ViewportPhantoms:
+    renderer = _phantoms_by_view.get((view.id(), key))
+    if not renderer:
+        _discard_closed_views()
+        renderer = _phantoms_by_view[(view.id(), key)] = ViewportPhantoms(view, key)
+    return renderer
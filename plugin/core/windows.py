@@ -1,10 +1,11 @@
-from .diagnostics import DiagnosticsStorage
+from .diagnostics import DiagnosticsStorage, DiagnosticsPuller
 from .logging import debug
 from .types import (ClientConfig, WindowLike, ViewLike,
                     LanguageConfig, config_supports_syntax, ConfigRegistry,
                     GlobalConfigs, Settings)
 from .edit import parse_workspace_edit
 from .protocol import Notification, Response
+from .session_pool import SessionPool
 from .sessions import Session
 from .url import filename_to_uri
 from .workspace import (
@@ -49,6 +50,9 @@ class DocumentHandler(Protocol):
     def remove_session(self, config_name: str) -> None:
         ...
 
+    def close_documents(self, session: Session) -> None:
+        ...
+
     def reset(self) -> None:
         ...
 
@@ -70,6 +74,12 @@ class DocumentHandler(Protocol):
     def has_document_state(self, file_name: str) -> bool:
         ...
 
+    def refresh_diagnostics(self, session: Session) -> None:
+        ...
+
+    def set_diagnostics_puller(self, diagnostics_puller: 'Optional[DiagnosticsPuller]') -> None:
+        ...
+
 
 def get_active_views(window: WindowLike) -> 'List[ViewLike]':
     views = list()  # type: List[ViewLike]
@@ -123,6 +133,10 @@ class WindowDocumentHandler(object):
         self._workspace = workspace
         self.changed = nop
         self.saved = nop
+        self.diagnostics_puller = None  # type: Optional[DiagnosticsPuller]
+
+    def set_diagnostics_puller(self, diagnostics_puller: 'Optional[DiagnosticsPuller]') -> None:
+        self.diagnostics_puller = diagnostics_puller
 
     def add_session(self, session: Session) -> None:
         self._sessions.setdefault(session.config.name, []).append(session)
@@ -131,6 +145,16 @@ class WindowDocumentHandler(object):
     def remove_session(self, config_name: str) -> None:
         if config_name in self._sessions:
             del self._sessions[config_name]
+        if self.diagnostics_puller:
+            self.diagnostics_puller.forget_session(config_name)
+
+    def close_documents(self, session: Session) -> None:
+        """ Closes the documents of this window in a session that other windows keep using """
+        for file_name in list(self._document_states):
+            if session.handles_path(file_name) and self._session_supports_notification(session, 'openClose'):
+                uri = filename_to_uri(file_name)
+                if session.close_document(uri) and session.client:
+                    session.client.send_notification(Notification.didClose({"textDocument": {"uri": uri}}))
 
     def reset(self) -> None:
         for view in self._window.views():
@@ -236,20 +260,50 @@ class WindowDocumentHandler(object):
                     for session in sessions:
                         if self._session_supports_notification(session, 'openClose'):
                             self._notify_did_open(view, session)
+            else:
+                self._pull_stale_diagnostics(view, file_name)
 
     def _notify_did_open(self, view: ViewLike, session: Session) -> None:
         file_name = view.file_name()
         if file_name:
             ds = self.get_document_state(file_name)
+            uri = filename_to_uri(file_name)
+            if not session.open_document(uri):
+                # another window sharing the session has it open already.
+                self._pull_diagnostics(view, session)
+                return
             params = {
                 "textDocument": {
-                    "uri": filename_to_uri(file_name),
+                    "uri": uri,
                     "languageId": self._view_language(view, session.config.name),
                     "text": view.substr(self._sublime.Region(0, view.size())),
                     "version": ds.version
                 }
             }
             session.client.send_notification(Notification.didOpen(params))
+            self._pull_diagnostics(view, session)
+
+    def _pull_diagnostics(self, view: ViewLike, session: Session) -> None:
+        file_name = view.file_name()
+        if file_name and self.diagnostics_puller and self.diagnostics_puller.supports(session):
+            if view in get_active_views(self._window):
+                self.diagnostics_puller.pull(session, file_name)
+            else:
+                self.diagnostics_puller.mark_stale(session.config.name, file_name)
+
+    def _pull_stale_diagnostics(self, view: ViewLike, file_name: str) -> None:
+        if self.diagnostics_puller:
+            for session in self._get_applicable_sessions(view):
+                if self.diagnostics_puller.is_stale(session.config.name, file_name):
+                    self.diagnostics_puller.pull(session, file_name)
+
+    def refresh_diagnostics(self, session: Session) -> None:
+        if not self.diagnostics_puller:
+            return
+        for file_name in list(self._document_states):
+            view = self._window.find_open_file(file_name)
+            if view and session in self._get_applicable_sessions(view):
+                self._pull_diagnostics(view, session)
 
     def handle_view_closed(self, view: ViewLike) -> None:
         file_name = view.file_name()
@@ -257,9 +311,11 @@ class WindowDocumentHandler(object):
             del self._document_states[file_name]
             for session in self._get_applicable_sessions(view, 'openClose'):
                 debug('closing', file_name, session.config.name)
-                if session.client:
+                if session.close_document(filename_to_uri(file_name)) and session.client:
                     params = {"textDocument": {"uri": filename_to_uri(file_name)}}
                     session.client.send_notification(Notification.didClose(params))
+                if self.diagnostics_puller:
+                    self.diagnostics_puller.forget(session.config.name, file_name)
 
     def handle_view_saved(self, view: ViewLike) -> None:
         file_name = view.file_name()
@@ -321,13 +377,14 @@ class WindowDocumentHandler(object):
                         params = {
                             "textDocument": {
                                 "uri": uri,
-                                "version": document_state.inc_version(),
+                                "version": session.document_version(uri, document_state.inc_version()),
                             },
                             "contentChanges": [{
                                 "text": view.substr(self._sublime.Region(0, view.size()))
                             }]
                         }
                         session.client.send_notification(Notification.didChange(params))
+                        self._pull_diagnostics(view, session)
 
 
 def extract_message(params: 'Any') -> str:
@@ -347,13 +404,16 @@ class WindowManager(object):
         sublime: 'Any',
         handler_dispatcher: LanguageHandlerListener,
         on_closed: 'Optional[Callable]' = None,
-        server_panel_factory: 'Optional[Callable]' = None
+        server_panel_factory: 'Optional[Callable]' = None,
+        session_pool: 'Optional[SessionPool]' = None
     ) -> None:
         self._window = window
         self._settings = settings
         self._configs = configs
         self.diagnostics = diagnostics
         self.documents = documents
+        self._diagnostics_puller = DiagnosticsPuller(diagnostics)
+        documents.set_diagnostics_puller(self._diagnostics_puller)
         self.server_panel_factory = server_panel_factory
         self._sessions = dict()  # type: Dict[str, List[Session]]
         self._start_session = session_starter
@@ -363,6 +423,7 @@ class WindowManager(object):
         self._on_closed = on_closed
         self._is_closing = False
         self._initialization_lock = threading.Lock()
+        self._session_pool = session_pool
         self._workspace = workspace
         self._workspace.on_changed = self._on_project_changed
         self._workspace.on_switched = self._on_project_switched
@@ -483,15 +544,23 @@ class WindowManager(object):
         self._window.status_message("Starting " + config.name + "...")
         session = None  # type: Optional[Session]
         workspace_folders = sorted_workspace_folders(self._workspace.folders, file_path)
-        try:
-            session = self._start_session(
+
+        def start(on_pre_initialize: 'Callable[[Session], None]', on_post_initialize: 'Callable[[Session], None]',
+                  on_post_exit: 'Callable[[str], None]') -> 'Optional[Session]':
+            return self._start_session(
                 self._window,                  # window
                 workspace_folders,             # workspace_folders
                 config,                        # config
-                self._handle_pre_initialize,   # on_pre_initialize
-                self._handle_post_initialize,  # on_post_initialize
-                self._handle_post_exit,        # on_post_exit
+                on_pre_initialize,             # on_pre_initialize
+                on_post_initialize,            # on_post_initialize
+                on_post_exit,                  # on_post_exit
                 lambda msg: self._handle_stderr_log(config.name, msg))  # on_stderr_log
+
+        try:
+            if self._session_pool:
+                session = self._session_pool.acquire(config, workspace_folders, self, start)
+            else:
+                session = start(self._handle_pre_initialize, self._handle_post_initialize, self._handle_post_exit)
         except Exception as e:
             message = "\n\n".join([
                 "Could not start {}",
@@ -526,15 +595,27 @@ class WindowManager(object):
         self.end_sessions()
 
     def end_sessions(self) -> None:
+        if self._session_pool and not self._restarting:
+            # sessions that other windows keep using must be told which documents of this window are gone.
+            for config_sessions in self._sessions.values():
+                for session in config_sessions:
+                    self.documents.close_documents(session)
         self.documents.reset()
         for config_name in list(self._sessions):
             self.end_config_sessions(config_name)
 
     def end_config_sessions(self, config_name: str) -> None:
         config_sessions = self._sessions[config_name] or []
-        for session in config_sessions:
+        for session in list(config_sessions):
             debug("unloading session", config_name)
-            session.end()
+            if not self._session_pool:
+                session.end()
+            elif self._restarting:
+                # a restart is for all windows sharing the server.
+                self._session_pool.end(session, self)
+            else:
+                self.documents.close_documents(session)
+                self._session_pool.release(session, self)
 
     def get_project_path(self, file_path: str) -> 'Optional[str]':
         candidate = None  # type: Optional[str]
@@ -562,54 +643,97 @@ class WindowManager(object):
 
         client.send_response(Response(request_id, items))
 
+    def _refresh_diagnostics(self, session: Session, client: Client, request_id: int) -> None:
+        client.send_response(Response(request_id, None))
+        self._pull_workspace_diagnostics(session)
+        self.documents.refresh_diagnostics(session)
+
+    def _pull_workspace_diagnostics(self, session: Session) -> None:
+        # diagnostics of the whole workspace can take a server long to compute, so they are opt-in.
+        if self._settings.pull_workspace_diagnostics and self._diagnostics_puller.supports_workspace(session):
+            self._diagnostics_puller.pull_workspace(session)
+
     def _payload_log_sink(self, message: str) -> None:
         self._sublime.set_timeout_async(lambda: self._handle_server_message(":", message), 0)
 
+    def _on_request(self, session: 'Session', method: str, handler: 'Callable[[Any, int], None]') -> None:
+        if self._session_pool:
+            self._session_pool.on_request(session, self, method, handler)
+        else:
+            session.client.on_request(method, handler)
+
+    def _on_notification(self, session: 'Session', method: str, handler: 'Callable[[Any], None]') -> None:
+        if self._session_pool:
+            self._session_pool.on_notification(session, self, method, handler)
+        else:
+            session.client.on_notification(method, handler)
+
     def _handle_pre_initialize(self, session: 'Session') -> None:
         client = session.client
-        client.set_crash_handler(lambda: self._handle_server_crash(session.config))
         client.set_error_display_handler(self._window.status_message)
 
         if self.server_panel_factory:
             client.logger.server_name = session.config.name
             client.logger.sink = self._payload_log_sink
 
-        client.on_request(
-            "window/showMessageRequest",
+        self._add_window_handlers(session)
+
+    def _add_window_handlers(self, session: 'Session') -> None:
+        client = session.client
+        if self._session_pool:
+            self._session_pool.set_crash_handler(session, self, lambda: self._handle_server_crash(session.config))
+        else:
+            client.set_crash_handler(lambda: self._handle_server_crash(session.config))
+
+        self._on_request(
+            session, "window/showMessageRequest",
             lambda params, request_id: self._handle_message_request(params, client, request_id))
 
-        client.on_notification(
-            "window/showMessage",
+        self._on_notification(
+            session, "window/showMessage",
             lambda params: self._handle_show_message(session.config.name, params))
 
-        client.on_notification(
-            "window/logMessage",
+        self._on_notification(
+            session, "window/logMessage",
             lambda params: self._handle_log_message(session.config.name, params))
 
-    def _handle_post_initialize(self, session: 'Session') -> None:
+    def _add_workspace_handlers(self, session: 'Session') -> None:
         client = session.client
 
         # handle server requests and notifications
-        client.on_request(
-            "workspace/applyEdit",
+        self._on_request(
+            session, "workspace/applyEdit",
             lambda params, request_id: self._apply_workspace_edit(params, client, request_id))
 
-        client.on_request(
-            "workspace/configuration",
+        self._on_request(
+            session, "workspace/configuration",
             lambda params, request_id: self._get_session_config(params, session, client, request_id))
 
-        client.on_notification(
-            "textDocument/publishDiagnostics",
+        self._on_notification(
+            session, "textDocument/publishDiagnostics",
             lambda params: self.diagnostics.receive(session.config.name, params))
 
-        self._handlers.on_initialized(session.config.name, self._window, client)
-
-        client.send_notification(Notification.initialized())
+        self._on_request(
+            session, "workspace/diagnostic/refresh",
+            lambda params, request_id: self._refresh_diagnostics(session, client, request_id))
 
+    def _attach_session(self, session: 'Session') -> None:
         document_sync = session.capabilities.get("textDocumentSync")
         if document_sync:
             self.documents.add_session(session)
 
+        self._pull_workspace_diagnostics(session)
+
+    def _handle_post_initialize(self, session: 'Session') -> None:
+        client = session.client
+        self._add_workspace_handlers(session)
+
+        self._handlers.on_initialized(session.config.name, self._window, client)
+
+        client.send_notification(Notification.initialized())
+
+        self._attach_session(session)
+
         if session.config.settings:
             configParams = {
                 'settings': session.config.settings
@@ -618,6 +742,28 @@ class WindowManager(object):
 
         self._window.status_message("{} initialized".format(session.config.name))
 
+    def prepare_session(self, session: 'Session') -> None:
+        self._handle_pre_initialize(session)
+
+    def initialize_session(self, session: 'Session') -> None:
+        self._handle_post_initialize(session)
+
+    def join_session(self, session: 'Session') -> None:
+        """ Starts using an initialized session that another window started """
+        self._add_window_handlers(session)
+        self._add_workspace_handlers(session)
+        self._attach_session(session)
+        self._window.status_message("{} initialized".format(session.config.name))
+
+    def leave_session(self, config_name: str) -> None:
+        self._handle_post_exit(config_name)
+
+    def on_shared_session_ended(self, config_name: str) -> None:
+        self._handle_post_exit(config_name)
+        if not self._is_closing and self._window.is_valid():
+            # another window restarts the server, which this window then shares again.
+            self._sublime.set_timeout_async(self.start_active_views, 500)
+
     def handle_view_closed(self, view: ViewLike) -> None:
         if view.file_name():
             if not self._is_closing:
@@ -641,6 +787,7 @@ class WindowManager(object):
         debug('clients for window {} unloaded'.format(self._window.id()))
         if self._restarting:
             debug('window {} sessions unloaded - restarting'.format(self._window.id()))
+            self._restarting = False
             self.start_active_views()
         elif not self._window.is_valid():
             debug('window {} closed and sessions unloaded'.format(self._window.id()))
@@ -696,6 +843,7 @@ class WindowRegistry(object):
         self._diagnostics_ui_class = None  # type: Optional[Callable]
         self._server_panel_factory = None  # type: Optional[Callable]
         self._settings = None  # type: Optional[Settings]
+        self._session_pool = SessionPool()
 
     def set_diagnostics_ui(self, ui_class: 'Any') -> None:
         self._diagnostics_ui_class = ui_class
@@ -727,7 +875,8 @@ class WindowRegistry(object):
                 sublime=self._sublime,
                 handler_dispatcher=self._handler_dispatcher,
                 on_closed=lambda: self._on_closed(window),
-                server_panel_factory=self._server_panel_factory)
+                server_panel_factory=self._server_panel_factory,
+                session_pool=self._session_pool if self._settings.share_servers_between_windows else None)
             self._windows[window.id()] = state
         return state
 
@@ -0,0 +1,176 @@
+import codecs
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from .edit import apply_edits, minimal_edits
+
+try:
+    from typing import Any, Dict, List, Optional, Tuple
+    assert Any and Dict and List and Optional and Tuple
+except ImportError:
+    pass
+
+
+WORKSPACE_EDIT_WORKERS = 4
+
+# Journals of older workspace edits are removed beyond this many.
+WORKSPACE_EDIT_JOURNALS_KEPT = 10
+
+JOURNAL_MANIFEST = "journal.json"
+
+
+def _digest(content: bytes) -> str:
+    return hashlib.sha1(content).hexdigest()
+
+
+def write_atomically(file_path: str, content: bytes) -> None:
+    """ Writes to a temporary file next to file_path that then replaces it, so readers never see a partial file """
+    descriptor, temporary_path = tempfile.mkstemp(dir=os.path.dirname(file_path), prefix=".lsp-")
+    try:
+        with os.fdopen(descriptor, "wb") as file:
+            file.write(content)
+        if os.path.exists(file_path):
+            shutil.copymode(file_path, temporary_path)
+        os.replace(temporary_path, file_path)
+    except BaseException:
+        try:
+            os.remove(temporary_path)
+        except OSError:
+            pass
+        raise
+
+
+class WorkspaceEditJournal(object):
+    """ The original contents of files edited on disk by one workspace edit, to undo it.
+
+    The originals are copied into the journal directory before a file is replaced. Undoing restores only the files
+    that still have the content the edit gave them.
+    """
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        self._files = []  # type: List[Dict[str, str]]
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._files)
+
+    def record(self, file_path: str, original: bytes, edited: bytes) -> None:
+        with self._lock:
+            name = str(len(self._files))
+            self._files.append({"path": file_path, "original": name, "edited": _digest(edited)})
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, name), "wb") as file:
+            file.write(original)
+
+    def save(self) -> None:
+        if self._files:
+            with open(os.path.join(self.directory, JOURNAL_MANIFEST), "w", encoding="utf-8") as file:
+                json.dump({"files": self._files}, file)
+
+    @classmethod
+    def load(cls, directory: str) -> 'Optional[WorkspaceEditJournal]':
+        try:
+            with open(os.path.join(directory, JOURNAL_MANIFEST), encoding="utf-8") as file:
+                files = json.load(file)["files"]
+        except (IOError, OSError, ValueError, KeyError):
+            return None
+        journal = cls(directory)
+        journal._files = files
+        return journal
+
+    def restore(self) -> 'Tuple[List[str], List[str]]':
+        """ Puts back the original contents, returning the restored files and those changed since the edit """
+        restored = []  # type: List[str]
+        skipped = []  # type: List[str]
+        for entry in self._files:
+            file_path = entry["path"]
+            try:
+                with open(file_path, "rb") as file:
+                    if _digest(file.read()) != entry["edited"]:
+                        skipped.append(file_path)
+                        continue
+                with open(os.path.join(self.directory, entry["original"]), "rb") as file:
+                    write_atomically(file_path, file.read())
+                restored.append(file_path)
+            except (IOError, OSError):
+                skipped.append(file_path)
+        shutil.rmtree(self.directory, ignore_errors=True)
+        return restored, skipped
+
+
+def new_journal(journals_path: str) -> WorkspaceEditJournal:
+    """ Starts a journal in journals_path, removing the oldest ones beyond WORKSPACE_EDIT_JOURNALS_KEPT """
+    for name in sorted(_journal_names(journals_path))[:-WORKSPACE_EDIT_JOURNALS_KEPT + 1]:
+        shutil.rmtree(os.path.join(journals_path, name), ignore_errors=True)
+    return WorkspaceEditJournal(os.path.join(journals_path, "{:.6f}".format(time.time())))
+
+
+def last_journal(journals_path: str) -> 'Optional[WorkspaceEditJournal]':
+    for name in sorted(_journal_names(journals_path), reverse=True):
+        journal = WorkspaceEditJournal.load(os.path.join(journals_path, name))
+        if journal:
+            return journal
+    return None
+
+
+def _journal_names(journals_path: str) -> 'List[str]':
+    try:
+        return os.listdir(journals_path)
+    except OSError:
+        return []
+
+
+def edit_file(file_path: str, changes: 'List[Any]', journal: WorkspaceEditJournal) -> bool:
+    """ Applies text edits to a file on disk, returning whether it changed.
+
+    A byte order mark is kept out of the edited text, and line breaks in new text get the line endings of the file.
+    """
+    with open(file_path, "rb") as file:
+        original = file.read()
+    bom = codecs.BOM_UTF8 if original.startswith(codecs.BOM_UTF8) else b""
+    text = original[len(bom):].decode("utf-8")
+    line_ending = "\r\n" if "\r\n" in text[:text.find("\n") + 1] else "\n"
+    if line_ending != "\n":
+        changes = [(start, end, new_text.replace("\r\n", "\n").replace("\n", line_ending))
+                   for start, end, new_text in changes]
+    edits = minimal_edits(text, changes)
+    if not edits:
+        return False
+    edited = bom + apply_edits(text, edits).encode("utf-8")
+    journal.record(file_path, original, edited)
+    write_atomically(file_path, edited)
+    return True
+
+
+def edit_files(changes_by_file: 'Dict[str, List[Any]]',
+               journal: WorkspaceEditJournal) -> 'Tuple[List[str], List[Tuple[str, str]]]':
+    """ Edits the files in parallel and saves the journal, returning the edited files and the failures with reasons.
+
+    Files that could not be read as UTF-8 are failures too, so they can be edited in a view instead.
+    """
+    def edit(file_path: str) -> 'Optional[str]':
+        try:
+            edit_file(file_path, changes_by_file[file_path], journal)
+            return None
+        except (IOError, OSError, UnicodeDecodeError) as error:
+            return str(error)
+
+    edited = []  # type: List[str]
+    failed = []  # type: List[Tuple[str, str]]
+    with ThreadPoolExecutor(max_workers=WORKSPACE_EDIT_WORKERS) as executor:
+        for file_path, error in zip(changes_by_file, executor.map(edit, list(changes_by_file))):
+            if error is None:
+                edited.append(file_path)
+            else:
+                failed.append((file_path, error))
+    try:
+        journal.save()
+    except (IOError, OSError):
+        pass
+    return edited, failed
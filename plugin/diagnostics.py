@@ -1,5 +1,6 @@
 import html
 import os
+import threading
 import sublime
 import sublime_plugin
 
@@ -8,6 +9,8 @@ from .core.panels import ensure_panel
 from .core.protocol import Diagnostic, DiagnosticSeverity, DiagnosticRelatedInformation, Point, Range
 from .core.settings import settings, PLUGIN_NAME
 from .core.views import range_to_region, region_to_range
+from .core.viewport import viewport_regions
+from .core.popups import popups
 from .core.registry import windows, LSPViewEventListener
 from .core.diagnostics import DiagnosticsWalker, DiagnosticsUpdateWalk, DiagnosticsCursor, DocumentsState
 
@@ -39,6 +42,9 @@ UNDERLINE_FLAGS = (sublime.DRAW_SQUIGGLY_UNDERLINE | sublime.DRAW_NO_OUTLINE | s
 
 BOX_FLAGS = sublime.DRAW_NO_FILL | sublime.DRAW_EMPTY_AS_OVERWRITE
 
+# Called with the view of a file after new diagnostics for it were published.
+view_diagnostics_listeners = []  # type: List[Callable[[sublime.View], None]]
+
 
 def format_severity(severity: int) -> str:
     return diagnostic_severity_names.get(severity, "???")
@@ -132,6 +138,12 @@ class LspPreviousDiagnosticCommand(sublime_plugin.WindowCommand):
         windows.lookup(self.window).diagnostics.select_previous()
 
 
+class LspShowMoreDiagnosticsCommand(sublime_plugin.WindowCommand):
+
+    def run(self) -> None:
+        windows.lookup(self.window).diagnostics.show_more()
+
+
 class LspHideDiagnosticCommand(sublime_plugin.WindowCommand):
 
     def run(self) -> None:
@@ -210,7 +222,7 @@ class DiagnosticsPhantoms(object):
             self._window.open_file(file_path + ":" + location, sublime.ENCODED_POSITION | sublime.TRANSIENT)
 
     def create_phantom_html(self, content: str, severity: str) -> str:
-        stylesheet = sublime.load_resource("Packages/LSP/phantoms.css")
+        stylesheet = popups.phantom_stylesheet
         return """<body id=inline-error>
                     <style>{}</style>
                     <div class="{}-arrow"></div>
@@ -233,12 +245,12 @@ class DiagnosticViewRegions(DiagnosticsUpdateWalk):
 
     def __init__(self, view: sublime.View) -> None:
         self._view = view
-        self._regions = {}  # type: Dict[int, List[sublime.Region]]
+        self._ranges = {}  # type: Dict[int, List[Range]]
         self._relevant_file = False
 
     def begin(self) -> None:
-        for severity in self._regions:
-            self._regions[severity] = []
+        for severity in self._ranges:
+            self._ranges[severity] = []
 
     def begin_file(self, file_name: str) -> None:
         # TODO: would be nice if walk could skip this updater
@@ -247,22 +259,22 @@ class DiagnosticViewRegions(DiagnosticsUpdateWalk):
 
     def diagnostic(self, diagnostic: Diagnostic) -> None:
         if self._relevant_file:
-            self._regions.setdefault(diagnostic.severity, []).append(range_to_region(diagnostic.range, self._view))
+            self._ranges.setdefault(diagnostic.severity, []).append(diagnostic.range)
 
     def end_file(self, file_name: str) -> None:
         self._relevant_file = False
 
     def end(self) -> None:
+        regions = viewport_regions(self._view)
         for severity in range(DiagnosticSeverity.Error, DiagnosticSeverity.Hint):
             region_name = "lsp_" + format_severity(severity)
-            if severity in self._regions:
-                regions = self._regions[severity]
+            if severity in self._ranges:
                 scope_name = diagnostic_severity_scopes[severity]
-                self._view.add_regions(
-                    region_name, regions, scope_name, settings.diagnostics_gutter_marker,
+                regions.set(
+                    region_name, self._ranges[severity], scope_name, settings.diagnostics_gutter_marker,
                     UNDERLINE_FLAGS if settings.diagnostics_highlight_style == "underline" else BOX_FLAGS)
             else:
-                self._view.erase_regions(region_name)
+                regions.erase(region_name)
 
 
 class HasRelevantDiagnostics(DiagnosticsUpdateWalk):
@@ -303,34 +315,120 @@ class StatusBarSummary(DiagnosticsUpdateWalk):
             active_view.set_status('lsp_errors_warning_count', count)
 
 
-class DiagnosticOutputPanel(DiagnosticsUpdateWalk):
+# Lines rendered into the diagnostics panel before the remainder is cut off, and the amount added by each
+# lsp_show_more_diagnostics.
+DIAGNOSTICS_PANEL_PAGE_LINES = 1000
+
+
+class PanelSection(object):
+    """ The formatted diagnostics of one file in the diagnostics panel """
+
+    def __init__(self, header: str, items: 'List[str]') -> None:
+        self.header = header
+        self.items = items
+        self.item_line_counts = [item.count("\n") + 1 for item in items]
+        self.line_count = 1 + sum(self.item_line_counts)
+        self.text = "\n".join([header] + items) + "\n"
+
+    def truncated(self, max_lines: int) -> 'Tuple[str, int]':
+        lines = [self.header]
+        remaining = max_lines - 1
+        shown = 0
+        for item, line_count in zip(self.items, self.item_line_counts):
+            if line_count > remaining:
+                break
+            lines.append(item)
+            remaining -= line_count
+            shown += 1
+        return "\n".join(lines) + "\n", len(self.items) - shown
+
+
+class DiagnosticOutputPanel(object):
+    """ Renders the diagnostics panel one file section at a time.
+
+    Only the span of the panel between the first and last changed section is replaced on an update. Formatting
+    happens on the calling (non-UI) thread, only the buffer replacement runs as a panel command.
+    """
+
     def __init__(self, window: sublime.Window) -> None:
         self._window = window
-        self._to_render = []  # type: List[str]
         self._panel = ensure_diagnostics_panel(self._window)
+        self._sections = {}  # type: Dict[str, PanelSection]
+        self._rendered = []  # type: List[str]
+        self._max_lines = DIAGNOSTICS_PANEL_PAGE_LINES
+        self._lock = threading.Lock()
 
-    def begin(self) -> None:
-        self._to_render = []
-        self._file_content = ""
-
-    def begin_file(self, file_path: str) -> None:
-        self._base_dir = windows.lookup(self._window).get_project_path(file_path)
-        self._file_content = ""
+    def update(self, file_path: str, file_diagnostics: 'Dict[str, List[Diagnostic]]') -> None:
+        base_dir = windows.lookup(self._window).get_project_path(file_path)
+        items = [self.format_diagnostic(diagnostic)
+                 for diagnostics in file_diagnostics.values() for diagnostic in diagnostics
+                 if diagnostic.severity <= settings.show_diagnostics_severity_level]
+        with self._lock:
+            if items:
+                panel_file_path = os.path.relpath(file_path, base_dir) if base_dir else file_path
+                self._sections[file_path] = PanelSection(" ◌ {}:".format(panel_file_path), items)
+            elif file_path in self._sections:
+                del self._sections[file_path]
+            else:
+                return
+            self._render(base_dir)
+
+    def show_more(self) -> None:
+        with self._lock:
+            self._max_lines += DIAGNOSTICS_PANEL_PAGE_LINES
+            self._render(None)
+
+    def _layout(self) -> 'List[str]':
+        chunks = []  # type: List[str]
+        remaining = self._max_lines
+        hidden = 0
+        for file_path in sorted(self._sections):
+            section = self._sections[file_path]
+            if remaining <= 1:
+                hidden += len(section.items)
+                continue
+            separator = "\n" if chunks else ""
+            if section.line_count <= remaining:
+                chunks.append(separator + section.text if separator else section.text)
+                remaining -= section.line_count + 1
+            else:
+                text, section_hidden = section.truncated(remaining)
+                chunks.append(separator + text)
+                hidden += section_hidden
+                remaining = 0
+        if hidden:
+            chunks.append("\n ... {} more diagnostics, run \"LSP: Show More Diagnostics\" to expand\n".format(hidden))
+        return chunks
+
+    def _render(self, base_dir: 'Optional[str]') -> None:
+        panel = self._panel
+        if not panel or not panel.is_valid():
+            panel = self._panel = ensure_diagnostics_panel(self._window)
+        assert panel, "must have a panel now!"
+        if base_dir:
+            panel.settings().set("result_base_dir", base_dir)
+
+        old = self._rendered
+        new = self._rendered = self._layout()
+        old_size = sum(len(chunk) for chunk in old)
+        if panel.size() != old_size:
+            # the panel was modified behind our back, start over
+            panel.run_command("lsp_update_panel", {"characters": "".join(new)})
+            return
 
-    def diagnostic(self, diagnostic: Diagnostic) -> None:
-        if diagnostic.severity <= settings.show_diagnostics_severity_level:
-            item = self.format_diagnostic(diagnostic)
-            self._file_content += item + "\n"
+        prefix = 0
+        while prefix < len(old) and prefix < len(new) and old[prefix] == new[prefix]:
+            prefix += 1
+        suffix = 0
+        while suffix < len(old) - prefix and suffix < len(new) - prefix and old[-1 - suffix] == new[-1 - suffix]:
+            suffix += 1
+        if prefix == len(old) == len(new):
+            return
 
-    def end_file(self, file_path: str) -> None:
-        if self._file_content:
-            panel_file_path = os.path.relpath(file_path, self._base_dir) if self._base_dir else file_path
-            self._to_render.append(" ◌ {}:\n{}".format(panel_file_path, self._file_content))
-
-    def end(self) -> None:
-        assert self._panel, "must have a panel now!"
-        self._panel.settings().set("result_base_dir", self._base_dir)
-        self._panel.run_command("lsp_update_panel", {"characters": "\n".join(self._to_render)})
+        begin = sum(len(chunk) for chunk in old[:prefix])
+        end = old_size - sum(len(chunk) for chunk in old[len(old) - suffix:])
+        characters = "".join(new[prefix:len(new) - suffix])
+        panel.run_command("lsp_replace_panel_region", {"begin": begin, "end": end, "characters": characters})
 
     def format_diagnostic(self, diagnostic: Diagnostic) -> str:
         location = "{:>8}:{:<4}".format(
@@ -377,14 +475,16 @@ class DiagnosticsPresenter(object):
             self._window.run_command("hide_panel", {"panel": "output.diagnostics"})
 
     def update(self, file_path: str, config_name: str, diagnostics: 'Dict[str, Dict[str, List[Diagnostic]]]') -> None:
-        self._diagnostics = diagnostics
         self._received_diagnostics_after_change = True
+        self._cursor.update(file_path, diagnostics.get(file_path, {}))
 
         if not self._window.is_valid():
             debug('ignoring update to closed window')
             return
 
-        updatables = [self._panel_update, self._relevance_check]
+        self._panel_update.update(file_path, diagnostics.get(file_path, {}))
+
+        updatables = [self._relevance_check]  # type: List[DiagnosticsUpdateWalk]
         if settings.show_diagnostics_count_in_view_status:
             updatables.append(self._bar_summary_update)
 
@@ -392,12 +492,11 @@ class DiagnosticsPresenter(object):
         if view and view.is_valid():
             view_region_updater = DiagnosticViewRegions(view)
             updatables.append(view_region_updater)
+            for listener in view_diagnostics_listeners:
+                listener(view)
         else:
             debug('view not found for', file_path)
 
-        if self._cursor.has_value:
-            updatables.append(self._cursor.update())
-
         walker = DiagnosticsWalker(updatables)
         walker.walk(diagnostics)
 
@@ -414,11 +513,14 @@ class DiagnosticsPresenter(object):
                 file_path = active_view.file_name()
                 point = Point(*active_view.rowcol(active_view.sel()[0].begin()))
 
-        walk = self._cursor.from_diagnostic(direction) if self._cursor.has_value else self._cursor.from_position(
-            direction, file_path, point)
-        walker = DiagnosticsWalker([walk])
-        walker.walk(self._diagnostics)
+        if self._cursor.has_value:
+            self._cursor.from_diagnostic(direction)
+        else:
+            self._cursor.from_position(direction, file_path, point)
         self._phantoms.set_diagnostic(self._cursor.value)
 
     def deselect(self) -> None:
         self._phantoms.set_diagnostic(None)
+
+    def show_more(self) -> None:
+        sublime.set_timeout_async(self._panel_update.show_more)
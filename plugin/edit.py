@@ -1,17 +1,36 @@
+import os
 import sublime
 import sublime_plugin
-from .core.edit import sort_by_application_order
+import threading
+from .core.edit import minimal_edits
 from .core.logging import debug
+from .core.settings import settings
+from .core.workspace_edit import edit_files, last_journal, new_journal
 
 TYPE_CHECKING = False
 if TYPE_CHECKING:
     from typing import List, Dict, Optional, Any, Iterable, Tuple
     TextEdit = Tuple[Tuple[int, int], Tuple[int, int], str]
-    assert List and Dict and Optional and Any and Iterable
+    assert List and Dict and Optional and Any and Iterable and Tuple
+
+
+def _journals_path() -> str:
+    return os.path.join(sublime.cache_path(), "LSP", "workspace_edits")
+
+
+def _find_open_file(path: str) -> 'Optional[sublime.View]':
+    for window in sublime.windows():
+        view = window.find_open_file(path)
+        if view:
+            return view
+    return None
 
 
 class LspApplyWorkspaceEditCommand(sublime_plugin.WindowCommand):
     def run(self, changes: 'Optional[Dict[str, List[TextEdit]]]' = None) -> None:
+        if changes and settings.edit_closed_files_on_disk:
+            self.apply_edits_on_disk(changes)
+            return
         documents_changed = 0
         if changes:
             for path, document_changes in changes.items():
@@ -24,6 +43,38 @@ class LspApplyWorkspaceEditCommand(sublime_plugin.WindowCommand):
         else:
             self.window.status_message('No changes to apply to workspace')
 
+    def apply_edits_on_disk(self, changes: 'Dict[str, List[TextEdit]]') -> None:
+        """ Edits open files in their views, which notify the servers, and all other files directly on disk """
+        closed_changes = {}  # type: Dict[str, List[TextEdit]]
+        for path, document_changes in changes.items():
+            view = _find_open_file(path)
+            if view:
+                view.run_command('lsp_apply_document_edit', {'changes': document_changes})
+            else:
+                closed_changes[path] = document_changes
+        in_views = len(changes) - len(closed_changes)
+        if not closed_changes:
+            self.window.status_message('Applied changes to {} documents'.format(in_views))
+            return
+        self.window.status_message('Applying changes to {} documents...'.format(len(changes)))
+
+        def edit_on_disk() -> None:
+            edited, failed = edit_files(closed_changes, new_journal(_journals_path()))
+            sublime.set_timeout(lambda: self.on_edited_on_disk(in_views, edited, failed, closed_changes))
+
+        threading.Thread(target=edit_on_disk, daemon=True).start()
+
+    def on_edited_on_disk(self, in_views: int, edited: 'List[str]', failed: 'List[Tuple[str, str]]',
+                          changes: 'Dict[str, List[TextEdit]]') -> None:
+        # files that can't be edited on disk, e.g. because they aren't UTF-8, are edited in a view instead.
+        for path, error in failed:
+            debug('editing in a view, as editing on disk failed:', path, error)
+            self.open_and_apply_edits(path, changes[path])
+        message = 'Applied changes to {} documents'.format(in_views + len(edited) + len(failed))
+        if edited:
+            message += ', {} of them on disk'.format(len(edited))
+        self.window.status_message(message)
+
     def open_and_apply_edits(self, path: str, file_changes: 'List[TextEdit]') -> None:
         view = self.window.open_file(path)
         if view:
@@ -40,25 +91,35 @@ class LspApplyWorkspaceEditCommand(sublime_plugin.WindowCommand):
             debug('view not found to apply', path, file_changes)
 
 
+class LspUndoWorkspaceEditCommand(sublime_plugin.WindowCommand):
+    """ Restores the files that the last workspace edit changed on disk """
+
+    def run(self) -> None:
+        def undo() -> None:
+            journal = last_journal(_journals_path())
+            if journal:
+                restored, skipped = journal.restore()
+                message = 'Restored {} documents'.format(len(restored))
+                if skipped:
+                    debug('not restored, as they changed since the edit:', skipped)
+                    message += ', {} changed since the edit'.format(len(skipped))
+            else:
+                message = 'No workspace edit to undo'
+            sublime.set_timeout(lambda: self.window.status_message(message))
+
+        threading.Thread(target=undo, daemon=True).start()
+
+
 class LspApplyDocumentEditCommand(sublime_plugin.TextCommand):
 
     def run(self, edit: 'Any', changes: 'Optional[List[TextEdit]]' = None) -> None:
-        # Apply the changes in reverse, so that we don't invalidate the range
-        # of any change that we haven't applied yet.
         if changes:
-            last_row, last_col = self.view.rowcol(self.view.size())
-            for change in reversed(sort_by_application_order(changes)):
-                start, end, newText = change
-                region = sublime.Region(self.view.text_point(*start), self.view.text_point(*end))
-
-                if start[0] > last_row and newText[0] != '\n':
-                    # Handle when a language server (eg gopls) inserts at a row beyond the document
-                    # some editors create the line automatically, sublime needs to have the newline prepended.
-                    debug('adding new line for edit at line {}, document ended at line {}'.format(start[0], last_row))
-                    self.apply_change(region, '\n' + newText, edit)
-                    last_row, last_col = self.view.rowcol(self.view.size())
-                else:
-                    self.apply_change(region, newText, edit)
+            # Only the parts that really change are edited, which keeps the selections and folds elsewhere.
+            text = self.view.substr(sublime.Region(0, self.view.size()))
+            # Apply the changes in reverse, so that we don't invalidate the range
+            # of any change that we haven't applied yet.
+            for begin, end, new_text in reversed(minimal_edits(text, changes)):
+                self.apply_change(sublime.Region(begin, end), new_text, edit)
 
     def apply_change(self, region: 'sublime.Region', newText: str, edit: 'Any') -> None:
         if region.empty():
@@ -1,8 +1,11 @@
 import sublime
+import threading
 from .core.protocol import Request
 from .core.configurations import is_supported_syntax
-from .core.settings import client_configs
-from .core.edit import parse_text_edit
+from .core.logging import debug
+from .core.rpc import Client
+from .core.settings import client_configs, settings
+from .core.edit import combine_edits, parse_text_edit
 from .core.registry import (
     LspTextCommand, LSPViewEventListener, session_for_view, client_from_session, sessions_for_view
 )
@@ -11,8 +14,8 @@ from .core.sessions import Session
 from .core.views import region_to_range
 
 try:
-    from typing import Dict, Any, List, Optional
-    assert Dict and Any and List and Optional
+    from typing import Dict, Any, Callable, List, Optional
+    assert Dict and Any and Callable and List and Optional
 except ImportError:
     pass
 
@@ -34,9 +37,51 @@ def wants_will_save_wait_until(session: Session) -> bool:
     return False
 
 
+class PreSaveRequests(object):
+    """ Requests sent in parallel before a save, whose responses are awaited together until a shared deadline """
+
+    def __init__(self) -> None:
+        self._responses = {}  # type: Dict[int, Optional[List[dict]]]
+        self._sent = 0
+        self._condition = threading.Condition()
+        self._waited = False
+        self._on_late_response = None  # type: Optional[Callable[[int, Optional[List[dict]]], None]]
+
+    def send(self, client: Client, request: Request) -> int:
+        index = self._sent
+        self._sent += 1
+        client.send_request(request, lambda response: self._on_response(index, response),
+                            lambda error: self._on_response(index, None))
+        return index
+
+    def wait(self, timeout: float, on_late_response: 'Optional[Callable[[int, Optional[List[dict]]], None]]' = None
+             ) -> 'List[Optional[List[dict]]]':
+        """ Returns the responses in the order the requests were sent. Those that didn't arrive in time are None.
+
+        on_late_response is called with the index and the response of each of those that arrives later on.
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: len(self._responses) == self._sent, timeout)
+            self._waited = True
+            self._on_late_response = on_late_response
+            return [self._responses.get(index) for index in range(self._sent)]
+
+    def _on_response(self, index: int, response: 'Optional[List[dict]]') -> None:
+        with self._condition:
+            if not self._waited:
+                self._responses[index] = response
+                self._condition.notify()
+                return
+            handler = self._on_late_response
+        if handler:
+            handler(index, response)
+
+
 class FormatOnSaveListener(LSPViewEventListener):
     def __init__(self, view: sublime.View) -> None:
         super().__init__(view)
+        self._saving_late_edits = False
+        self._late_format_version = None  # type: Optional[int]
 
     @classmethod
     def is_applicable(cls, view_settings: dict) -> bool:
@@ -47,53 +92,74 @@ class FormatOnSaveListener(LSPViewEventListener):
 
     def on_pre_save(self) -> None:
         file_path = self.view.file_name()
-        if not file_path:
+        if not file_path or self._saving_late_edits:
+            self._saving_late_edits = False
             return
 
-        self._view_maybe_dirty = True
-        for session in sessions_for_view(self.view):
-            if wants_will_save_wait_until(session):
-                self._purge_changes_if_needed()
-                self._will_save_wait_until(file_path, session)
-
+        uri = filename_to_uri(file_path)
+        requests = PreSaveRequests()
+        format_index = None  # type: Optional[int]
+        sessions = [session for session in sessions_for_view(self.view) if wants_will_save_wait_until(session)]
+        format_client = None  # type: Optional[Client]
         if self.view.settings().get("lsp_format_on_save"):
-            self._purge_changes_if_needed()
-            self._format_on_save(file_path)
-
-    def _purge_changes_if_needed(self) -> None:
-        if self._view_maybe_dirty:
-            self.manager.documents.purge_changes(self.view)
-            self._view_maybe_dirty = False
+            format_client = client_from_session(session_for_view(self.view, 'documentFormattingProvider'))
+        if not sessions and not format_client:
+            return
 
-    def _will_save_wait_until(self, file_path: str, session: Session) -> None:
-        client = client_from_session(session)
-        if client:
-            params = {
-                "textDocument": {
-                    "uri": filename_to_uri(file_path)
-                },
-                "reason": 1  # TextDocumentSaveReason.Manual
-            }
-            request = Request.willSaveWaitUntil(params)
-            response = client.execute_request(request)
-            if response:
-                apply_response_to_view(response, self.view)
-                self._view_maybe_dirty = True
-
-    def _format_on_save(self, file_path: str) -> None:
-        client = client_from_session(session_for_view(self.view, 'documentFormattingProvider'))
-        if client:
+        # all requests are made against the current content, so they can be answered in parallel.
+        self.manager.documents.purge_changes(self.view)
+        for session in sessions:
+            client = client_from_session(session)
+            if client:
+                params = {
+                    "textDocument": {
+                        "uri": uri
+                    },
+                    "reason": 1  # TextDocumentSaveReason.Manual
+                }
+                requests.send(client, Request.willSaveWaitUntil(params))
+        if format_client:
             params = {
                 "textDocument": {
-                    "uri": filename_to_uri(file_path)
+                    "uri": uri
                 },
                 "options": options_for_view(self.view)
             }
-            request = Request.formatting(params)
-            response = client.execute_request(request)
-            if response:
-                apply_response_to_view(response, self.view)
-                self._view_maybe_dirty = True
+            format_index = requests.send(format_client, Request.formatting(params))
+
+        version = self.view.change_count()
+
+        def on_late_response(index: int, response: 'Optional[List[dict]]') -> None:
+            if index == format_index:
+                sublime.set_timeout(lambda: self._apply_late(response, version))
+
+        # the handler is passed to wait, so a response arriving right after the deadline isn't missed.
+        late_handler = on_late_response if format_index is not None and settings.apply_late_format_on_save else None
+        responses = requests.wait(settings.pre_save_timeout_ms / 1000, late_handler)
+        self._late_format_version = None
+        if any(responses):
+            self._apply_responses(responses)
+        elif late_handler and format_index is not None and responses[format_index] is None:
+            self._late_format_version = version
+
+    def _apply_responses(self, responses: 'List[Optional[List[dict]]]') -> None:
+        text = self.view.substr(sublime.Region(0, self.view.size()))
+        edit_lists = [list(parse_text_edit(change) for change in response) for response in responses if response]
+        edits, dropped = combine_edits(text, edit_lists)
+        if dropped:
+            debug('left out', dropped, 'pre-save responses overlapping the edits of another server')
+        self.view.run_command('lsp_apply_document_edit', {'changes': edits})
+
+    def _apply_late(self, response: 'Optional[List[dict]]', version: int) -> None:
+        # the formatting was made for the saved content, so it only applies if nothing changed since.
+        if version != self._late_format_version:
+            return
+        self._late_format_version = None
+        if not response or not self.view.is_valid() or self.view.change_count() != version:
+            return
+        apply_response_to_view(response, self.view)
+        self._saving_late_edits = True
+        self.view.run_command('save')
 
 
 class LspFormatDocumentCommand(LspTextCommand):
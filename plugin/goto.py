@@ -1,19 +1,158 @@
+import os
 import sublime
+import sublime_plugin
+import threading
 
-from .core.registry import LspTextCommand
+from .core.cache import LRUCache
+from .core.configurations import is_supported_syntax
+from .core.registry import LspTextCommand, session_for_view
 from .core.protocol import Request, Point
 from .core.documents import get_document_position, get_position, is_at_word
+from .core.settings import client_configs, settings
 from .core.url import uri_to_filename
 from .core.logging import debug
 from Default.history_list import get_jump_history_for_view
 
 try:
-    from typing import List, Dict, Optional, Any, Tuple
-    assert List and Dict and Optional and Any and Tuple
+    from typing import List, Dict, Optional, Any, Tuple, Callable
+    assert List and Dict and Optional and Any and Tuple and Callable
+    # (file path, file path with the encoded position, (row, col))
+    GotoLocation = Tuple[str, str, Tuple[int, int]]
 except ImportError:
     pass
 
 
+SUBLIME_WORD_MASK = 515
+GOTO_CACHE_SIZE = 50
+GOTO_PREFETCH_DELAY_MS = 500
+WARMED_FILES_SIZE = 100
+
+# Goto locations keyed by (buffer, change count, word region, goto kind, config name).
+goto_cache = LRUCache(GOTO_CACHE_SIZE)
+# Counts the edits of views, so locations that arrive after an edit aren't cached.
+_edits = 0
+_pending_gotos = {}  # type: Dict[Tuple[int, int, int, int, str, str], List[Callable[[List[GotoLocation]], None]]]
+# Target files read recently, keyed by (file, mtime).
+_warmed_files = LRUCache(WARMED_FILES_SIZE)
+
+
+def goto_locations(response: 'Optional[Any]') -> 'List[GotoLocation]':
+    """ Converts a Location, Location[] or LocationLink[] response to locations with encoded positions """
+    def process_response(response: dict) -> 'GotoLocation':
+        if "targetUri" in response:
+            # TODO: Do something clever with originSelectionRange and targetRange.
+            file_path = uri_to_filename(response["targetUri"])
+            start = Point.from_lsp(response["targetSelectionRange"]["start"])
+        else:
+            file_path = uri_to_filename(response["uri"])
+            start = Point.from_lsp(response["range"]["start"])
+        row = start.row + 1
+        col = start.col + 1
+        file_path_and_row_col = "{}:{}:{}".format(file_path, row, col)
+        return file_path, file_path_and_row_col, (row, col)
+
+    if not response:
+        return []
+    # TODO: DocumentLink support.
+    if isinstance(response, dict):
+        return [process_response(response)]
+    return [process_response(x) for x in response]
+
+
+def request_goto(view: sublime.View, point: int, goto_kind: str,
+                 handler: 'Callable[[List[GotoLocation]], None]') -> bool:
+    """ Calls handler with the locations of the word at point, from the cache if they were requested before.
+
+    Returns False when no server can answer.
+    """
+    session = session_for_view(view, goto_kind + "Provider", point)
+    if not session or not session.client:
+        return False
+    word = view.word(point)
+    key = (view.buffer_id(), view.change_count(), word.begin(), word.end(), goto_kind, session.config.name)
+    locations = goto_cache.get(key)
+    if locations is not None:
+        handler(locations)
+        return True
+    if key in _pending_gotos:
+        _pending_gotos[key].append(handler)
+        return True
+    document_position = get_document_position(view, point)
+    request_type = getattr(Request, goto_kind, None)
+    if not document_position or not request_type:
+        return False
+    _pending_gotos[key] = [handler]
+    edits = _edits
+
+    def handle_response(response: 'Optional[Any]') -> None:
+        locations = goto_locations(response)
+        # no locations may only mean the server isn't ready yet, so they are asked for again next time.
+        if locations and edits == _edits:
+            goto_cache.set(key, locations)
+        for handler in _pending_gotos.pop(key, []):
+            handler(locations)
+
+    def handle_error(error: 'Any') -> None:
+        _pending_gotos.pop(key, None)
+
+    session.client.send_request(request_type(document_position), handle_response, handle_error)
+    return True
+
+
+def warm_files(locations: 'List[GotoLocation]') -> None:
+    """ Reads the target files that are not open in the background, so opening them doesn't wait for the disk """
+    window = sublime.active_window()
+    file_paths = [file_path for file_path, _, _ in locations if not window or not window.find_open_file(file_path)]
+    if file_paths:
+        threading.Thread(target=lambda: _read_files(file_paths), daemon=True).start()
+
+
+def _read_files(file_paths: 'List[str]') -> None:
+    for file_path in set(file_paths):
+        try:
+            key = (file_path, os.path.getmtime(file_path))
+            if key not in _warmed_files:
+                with open(file_path, 'rb') as file:
+                    while file.read(1 << 16):
+                        pass
+                _warmed_files.set(key, True)
+        except (IOError, OSError):
+            continue
+
+
+class GotoPrefetchListener(sublime_plugin.ViewEventListener):
+    """ Requests the definition of the word under the caret when the caret rests """
+
+    def __init__(self, view: sublime.View) -> None:
+        super().__init__(view)
+        self._prefetch_point = -1
+
+    @classmethod
+    def is_applicable(cls, view_settings: dict) -> bool:
+        syntax = view_settings.get('syntax')
+        return bool(syntax and is_supported_syntax(syntax, client_configs.all))
+
+    def on_modified_async(self) -> None:
+        global _edits
+        _edits += 1
+        buffer_id = self.view.buffer_id()
+        file_name = self.view.file_name()
+        # locations in the edited file may have moved, whichever file they were requested from.
+        goto_cache.discard_items(lambda key, locations: key[0] == buffer_id or any(
+            file_path == file_name for file_path, _, _ in locations))
+
+    def on_selection_modified_async(self) -> None:
+        if settings.prefetch_definition and len(self.view.sel()) == 1:
+            point = self.view.sel()[0].begin()
+            if point != self._prefetch_point:
+                self._prefetch_point = point
+                sublime.set_timeout_async(lambda: self._prefetch(point), GOTO_PREFETCH_DELAY_MS)
+
+    def _prefetch(self, point: int) -> None:
+        if point == self._prefetch_point and self.view.classify(point) & SUBLIME_WORD_MASK:
+            request_goto(self.view, point, "definition", warm_files)
+
+
 class LspGotoCommand(LspTextCommand):
 
     def __init__(self, view: sublime.View) -> None:
@@ -26,36 +165,11 @@ class LspGotoCommand(LspTextCommand):
         return False
 
     def run(self, edit: sublime.Edit, event: 'Optional[dict]' = None) -> None:
-        client = self.client_with_capability(self.goto_kind + "Provider")
-        if client:
-            pos = get_position(self.view, event)
-            document_position = get_document_position(self.view, pos)
-            if document_position:
-                request_type = getattr(Request, self.goto_kind)
-                if not request_type:
-                    debug("unrecognized goto kind:", self.goto_kind)
-                    return
-                request = request_type(document_position)
-                client.send_request(
-                    request, lambda response: self.handle_response(response, pos))
-
-    def handle_response(self, response: 'Optional[Any]', position: int) -> None:
-        def process_response_list(responses: list) -> 'List[Tuple[str, str, Tuple[int, int]]]':
-            return [process_response(x) for x in responses]
-
-        def process_response(response: dict) -> 'Tuple[str, str, Tuple[int, int]]':
-            if "targetUri" in response:
-                # TODO: Do something clever with originSelectionRange and targetRange.
-                file_path = uri_to_filename(response["targetUri"])
-                start = Point.from_lsp(response["targetSelectionRange"]["start"])
-            else:
-                file_path = uri_to_filename(response["uri"])
-                start = Point.from_lsp(response["range"]["start"])
-            row = start.row + 1
-            col = start.col + 1
-            file_path_and_row_col = "{}:{}:{}".format(file_path, row, col)
-            return file_path, file_path_and_row_col, (row, col)
+        pos = get_position(self.view, event)
+        if not request_goto(self.view, pos, self.goto_kind, lambda locations: self.handle_response(locations, pos)):
+            debug("unable to request", self.goto_kind)
 
+    def handle_response(self, locations: 'List[GotoLocation]', position: int) -> None:
         def open_location(window: sublime.Window, location: 'Tuple[str, str, Tuple[int, int]]') -> None:
             fname, file_path_and_row_col, rowcol = location
             row, col = rowcol
@@ -88,14 +202,9 @@ class LspGotoCommand(LspTextCommand):
 
         window = sublime.active_window()
         view = self.view
-        if response:
+        if locations:
             # Save to jump back history.
             get_jump_history_for_view(view).push_selection(view)
-            # TODO: DocumentLink support.
-            if isinstance(response, dict):
-                locations = [process_response(response)]
-            else:
-                locations = process_response_list(response)
             if len(locations) == 1:
                 open_location(window, locations[0])
             elif len(locations) > 1:
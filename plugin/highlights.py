@@ -2,11 +2,11 @@ import sublime
 import sublime_plugin
 
 from .core.configurations import is_supported_syntax
-from .core.protocol import Request, Range, DocumentHighlightKind
+from .core.protocol import Request, Range, Point, DocumentHighlightKind
 from .core.registry import session_for_view, client_from_session
 from .core.documents import get_document_position
 from .core.settings import settings, client_configs
-from .core.views import range_to_region
+from .core.viewport import viewport_regions, RangeIndex
 try:
     from typing import List, Dict, Optional
     assert List and Dict and Optional
@@ -25,8 +25,9 @@ _kind2name = {
 
 
 def remove_highlights(view: sublime.View) -> None:
+    regions = viewport_regions(view)
     for kind in settings.document_highlight_scopes.keys():
-        view.erase_regions("lsp_highlight_{}".format(kind))
+        regions.erase("lsp_highlight_{}".format(kind))
 
 
 class DocumentHighlightListener(sublime_plugin.ViewEventListener):
@@ -46,6 +47,9 @@ class DocumentHighlightListener(sublime_plugin.ViewEventListener):
         self._initialized = False
         self._enabled = False
         self._stored_point = -1
+        # The ranges of the last highlight response, valid as long as the view's change count is the same.
+        self._highlights = RangeIndex([])
+        self._highlights_version = -1
 
     def on_selection_modified_async(self) -> None:
         if not self._initialized:
@@ -63,6 +67,10 @@ class DocumentHighlightListener(sublime_plugin.ViewEventListener):
     def _queue(self) -> None:
         current_point = self.view.sel()[0].begin()
         if self._stored_point != current_point:
+            if len(self.view.sel()) == 1 and self._is_highlighted(current_point):
+                # the caret moved within the highlighted occurrences, they stay valid.
+                self._stored_point = current_point
+                return
             self._clear_regions()
             self._stored_point = current_point
             sublime.set_timeout_async(lambda: self._purge(current_point), 500)
@@ -71,9 +79,16 @@ class DocumentHighlightListener(sublime_plugin.ViewEventListener):
         if current_point == self._stored_point:
             self._on_document_highlight()
 
+    def _is_highlighted(self, point: int) -> bool:
+        if self._highlights_version != self.view.change_count():
+            return False
+        row, col = self.view.rowcol(point)
+        return any(r.contains(Point(row, col)) for r, _ in self._highlights.between(row, row))
+
     def _clear_regions(self) -> None:
-        for kind in settings.document_highlight_scopes.keys():
-            self.view.erase_regions("lsp_highlight_{}".format(kind))
+        self._highlights = RangeIndex([])
+        self._highlights_version = -1
+        remove_highlights(self.view)
 
     def _on_document_highlight(self) -> None:
         self._clear_regions()
@@ -89,19 +104,20 @@ class DocumentHighlightListener(sublime_plugin.ViewEventListener):
                 params = get_document_position(self.view, point)
                 if params:
                     request = Request.documentHighlight(params)
-                    client.send_request(request, self._handle_response)
+                    version = self.view.change_count()
+                    client.send_request(request, lambda response: self._handle_response(response, version))
 
-    def _handle_response(self, response: 'Optional[List]') -> None:
+    def _handle_response(self, response: 'Optional[List]', version: int) -> None:
         if not response:
             return
-        kind2regions = {}  # type: Dict[str, List[sublime.Region]]
+        kind2ranges = {}  # type: Dict[str, List[Range]]
         for kind in range(0, 4):
-            kind2regions[_kind2name[kind]] = []
+            kind2ranges[_kind2name[kind]] = []
         for highlight in response:
-            r = range_to_region(Range.from_lsp(highlight["range"]), self.view)
+            r = Range.from_lsp(highlight["range"])
             kind = highlight.get("kind", DocumentHighlightKind.Unknown)
             if kind is not None:
-                kind2regions[_kind2name[kind]].append(r)
+                kind2ranges[_kind2name[kind]].append(r)
         if settings.document_highlight_style == "fill":
             flags = 0
         elif settings.document_highlight_style == "box":
@@ -116,9 +132,12 @@ class DocumentHighlightListener(sublime_plugin.ViewEventListener):
                 flags |= sublime.DRAW_SQUIGGLY_UNDERLINE
 
         self._clear_regions()
-        for kind_str, regions in kind2regions.items():
-            if regions:
+        if version == self.view.change_count():
+            self._highlights = RangeIndex([(r, None) for ranges in kind2ranges.values() for r in ranges])
+            self._highlights_version = version
+        regions = viewport_regions(self.view)
+        for kind_str, ranges in kind2ranges.items():
+            if ranges:
                 scope = settings.document_highlight_scopes.get(kind_str, None)
                 if scope:
-                    self.view.add_regions("lsp_highlight_{}".format(kind_str),
-                                          regions, scope=scope, flags=flags)
+                    regions.set("lsp_highlight_{}".format(kind_str), ranges, scope=scope, flags=flags)
@@ -13,21 +13,53 @@ from .core.documents import get_document_position
 from .core.popups import popups
 from .code_actions import actions_manager, run_code_action_or_command
 from .core.settings import client_configs, settings
+from .core.cache import LRUCache
 
 try:
-    from typing import List, Optional, Any, Dict
+    from typing import List, Optional, Any, Dict, Callable, Tuple
     from .code_actions import CodeActionOrCommand
-    assert List and Optional and Any and Dict and Diagnostic and CodeActionOrCommand
+    assert List and Optional and Any and Dict and Callable and Tuple and Diagnostic and CodeActionOrCommand
 except ImportError:
     pass
 
 
 SUBLIME_WORD_MASK = 515
+HOVER_CACHE_SIZE = 50
+HOVER_PREFETCH_DELAY_MS = 500
+
+# Hover responses keyed by (file, change count, word region, config name).
+hover_cache = LRUCache(HOVER_CACHE_SIZE)
+_missing = object()
+
+
+def hover_key(view: sublime.View, point: int, config_name: str) -> 'Tuple[str, int, int, int, str]':
+    word = view.word(point)
+    return view.file_name() or "", view.change_count(), word.begin(), word.end(), config_name
+
+
+def request_hover(view: sublime.View, point: int, handler: 'Callable[[Optional[Any]], None]') -> None:
+    """ Calls handler with the hover response for the word at point, from the cache if it was requested before """
+    session = session_for_view(view, 'hoverProvider', point)
+    if session and session.client:
+        key = hover_key(view, point, session.config.name)
+        response = hover_cache.get(key, _missing)
+        if response is not _missing:
+            handler(response)
+            return
+        document_position = get_document_position(view, point)
+        if document_position:
+
+            def handle_response(response: 'Optional[Any]') -> None:
+                hover_cache.set(key, response)
+                handler(response)
+
+            session.client.send_request(Request.hover(document_position), handle_response)
 
 
 class HoverHandler(sublime_plugin.ViewEventListener):
     def __init__(self, view: sublime.View) -> None:
         self.view = view
+        self._prefetch_point = -1
 
     @classmethod
     def is_applicable(cls, view_settings: dict) -> bool:
@@ -44,6 +76,21 @@ class HoverHandler(sublime_plugin.ViewEventListener):
             return
         self.view.run_command("lsp_hover", {"point": point})
 
+    def on_modified_async(self) -> None:
+        file_name = self.view.file_name()
+        hover_cache.discard(lambda key: key[0] == file_name)
+
+    def on_selection_modified_async(self) -> None:
+        if settings.prefetch_hover and len(self.view.sel()) == 1:
+            point = self.view.sel()[0].begin()
+            if point != self._prefetch_point:
+                self._prefetch_point = point
+                sublime.set_timeout_async(lambda: self._prefetch(point), HOVER_PREFETCH_DELAY_MS)
+
+    def _prefetch(self, point: int) -> None:
+        if point == self._prefetch_point and self.view.classify(point) & SUBLIME_WORD_MASK:
+            request_hover(self.view, point, lambda response: None)
+
 
 _test_contents = []  # type: List[str]
 
@@ -101,16 +148,7 @@ class LspHoverCommand(LspTextCommand):
             self.request_show_hover(hover_point)
 
     def request_symbol_hover(self, point: int) -> None:
-        # todo: session_for_view looks up windowmanager twice (config and for sessions)
-        # can we memoize some part (eg. where no point is provided?)
-        session = session_for_view(self.view, 'hoverProvider', point)
-        if session:
-            document_position = get_document_position(self.view, point)
-            if document_position:
-                if session.client:
-                    session.client.send_request(
-                        Request.hover(document_position),
-                        lambda response: self.handle_response(response, point))
+        request_hover(self.view, point, lambda response: self.handle_response(response, point))
 
     def request_code_actions(self, point: int) -> None:
         actions_manager.request(self.view, point, lambda response: self.handle_code_actions(response, point),
@@ -206,7 +244,7 @@ class LspHoverCommand(LspTextCommand):
                 formatted.append(value)
 
         if formatted:
-            return mdpopups.md2html(self.view, "\n".join(formatted))
+            return popups.md2html(self.view, "\n".join(formatted))
 
         return ""
 
@@ -1,14 +1,14 @@
 import os
 import sublime
-import linecache
+from collections import OrderedDict
 
 from .core.documents import is_at_word, get_position, get_document_position
+from .core.lines import LinesReader, read_lines
 from .core.panels import ensure_panel
 from .core.protocol import Request, Point
 from .core.registry import LspTextCommand, windows
 from .core.settings import PLUGIN_NAME, settings
 from .core.url import uri_to_filename
-from .core.views import get_line
 
 try:
     from typing import List, Dict, Optional, Callable, Tuple
@@ -31,6 +31,13 @@ class LspSymbolReferencesCommand(LspTextCommand):
         self.word_region = None  # type: Optional[sublime.Region]
         self.word = ""
         self.base_dir = None  # type: Optional[str]
+        self.references_count = 0
+        self.points_by_file = []  # type: List[Tuple[str, List[Point]]]
+        self.references_by_file = OrderedDict()  # type: Dict[str, List[Tuple[Point, str]]]
+        self.reader = None  # type: Optional[LinesReader]
+        self.panel = None  # type: Optional[sublime.View]
+        # the state above belongs to the latest request, the callbacks of earlier ones are dropped.
+        self.request_id = 0
 
     def is_enabled(self, event: 'Optional[dict]' = None) -> bool:
         if self.has_client_with_capability('referencesProvider'):
@@ -57,32 +64,78 @@ class LspSymbolReferencesCommand(LspTextCommand):
                 document_position['context'] = {
                     "includeDeclaration": False
                 }
+                self.request_id += 1
+                request_id = self.request_id
+                self.references_count = 0
+                self.points_by_file = []
+                self.references_by_file = OrderedDict()
+                # each file is read once, on a thread pool, and shown as soon as it and the files before it are read.
+                self.reader = LinesReader(lambda index, lines: self.on_file_read(request_id, index, lines),
+                                          self._read_lines)
+                self.panel = None
                 request = Request.references(document_position)
                 client.send_request(
-                    request, lambda response: self.handle_response(response, pos))
-
-    def handle_response(self, response: 'Optional[List[ReferenceDict]]', pos: int) -> None:
+                    request,
+                    lambda response: self.handle_response(request_id, response, pos),
+                    None,
+                    lambda references: self.handle_partial_response(request_id, references))
+
+    def handle_partial_response(self, request_id: int, references: 'Optional[List[ReferenceDict]]') -> None:
+        if request_id == self.request_id:
+            self.add_references(references or [], False)
+
+    def handle_response(self, request_id: int, response: 'Optional[List[ReferenceDict]]', pos: int) -> None:
+        if request_id != self.request_id:
+            return
         window = self.view.window()
-
-        if response is None:
-            response = []
+        self.add_references(response or [], True)
 
         if window:
-            references_count = len(response)
             # return if there are no references
-            if references_count < 1:
+            if self.references_count < 1:
                 window.run_command("hide_panel", {"panel": "output.references"})
                 window.status_message("No references found")
                 return
 
-            references_by_file = self._group_references_by_file(response)
-
-            if settings.show_references_in_quick_panel:
-                self.show_quick_panel(references_by_file)
-            else:
-                self.show_references_panel(references_by_file)
+        if self.reader:
+            self.reader.close(lambda: self.on_references_read(request_id))
+
+    def add_references(self, references: 'List[ReferenceDict]', complete: bool) -> None:
+        if not references or not self.reader:
+            return
+        started = self.references_count > 0
+        self.references_count += len(references)
+        if not settings.show_references_in_quick_panel and not started:
+            # without partial results the count is known before the panel is shown.
+            self.panel = self.start_references_panel(self.references_count if complete else None)
+        points_by_file = list(self._group_references_by_file(references).items())
+        self.points_by_file.extend(points_by_file)
+        self.reader.read([(file_path, [point.row for point in points]) for file_path, points in points_by_file])
+
+    def on_file_read(self, request_id: int, index: int, lines: 'Dict[int, str]') -> None:
+        if request_id != self.request_id:
+            return
+        file_path, points = self.points_by_file[index]
+        references = [(point, lines.get(point.row, "")) for point in points]
+        if settings.show_references_in_quick_panel:
+            self.references_by_file.setdefault(file_path, []).extend(references)
+        elif self.panel:
+            self.append_references(self.panel, file_path, references)
+
+    def on_references_read(self, request_id: int) -> None:
+        if request_id != self.request_id:
+            return
+        if settings.show_references_in_quick_panel:
+            self.show_quick_panel(self.references_by_file)
+        elif self.panel:
+            self.highlight_references(self.panel)
+            window = self.view.window()
+            if window:
+                window.status_message("{} references for '{}'".format(self.references_count, self.word))
 
     def show_quick_panel(self, references_by_file: 'Dict[str, List[Tuple[Point, str]]]') -> None:
+        # the list is replaced only now, as the panel of the previous request uses it until this one replaces it.
+        self.reflist = []
         selected_index = -1
         current_file_path = self.view.file_name()
         for file_path, references in references_by_file.items():
@@ -119,38 +172,44 @@ class LspSymbolReferencesCommand(LspTextCommand):
             if window:
                 window.open_file(self.get_selected_file_path(index), flags)
 
-    def show_references_panel(self, references_by_file: 'Dict[str, List[Tuple[Point, str]]]') -> None:
+    def start_references_panel(self, references_count: 'Optional[int]') -> 'Optional[sublime.View]':
         window = self.view.window()
         if window:
             panel = ensure_references_panel(window)
             if not panel:
-                return
-
-            text = ''
-            references_count = 0
-            for file, references in references_by_file.items():
-                text += '◌ {}:\n'.format(self.get_relative_path(file))
-                for reference in references:
-                    references_count += 1
-                    point, line = reference
-                    text += '\t{:>8}:{:<4} {}\n'.format(point.row + 1, point.col + 1, line)
-                # append a new line after each file name
-                text += '\n'
+                return None
 
             base_dir = windows.lookup(window).get_project_path(self.view.file_name() or "")
             panel.settings().set("result_base_dir", base_dir)
 
             panel.run_command("lsp_clear_panel")
             window.run_command("show_panel", {"panel": "output.references"})
-            panel.run_command('append', {
-                'characters': "{} references for '{}'\n\n{}".format(references_count, self.word, text),
-                'force': True,
-                'scroll_to_end': False
-            })
-
-            # highlight all word occurrences
-            regions = panel.find_all(r"\b{}\b".format(self.word))
-            panel.add_regions('ReferenceHighlight', regions, 'comment', flags=sublime.DRAW_OUTLINED)
+            if references_count is None:
+                self._append_to_panel(panel, "References for '{}'\n\n".format(self.word))
+            else:
+                self._append_to_panel(panel, "{} references for '{}'\n\n".format(references_count, self.word))
+            return panel
+        return None
+
+    def append_references(self, panel: sublime.View, file_path: str, references: 'List[Tuple[Point, str]]') -> None:
+        text = '◌ {}:\n'.format(self.get_relative_path(file_path))
+        for point, line in references:
+            text += '\t{:>8}:{:<4} {}\n'.format(point.row + 1, point.col + 1, line)
+        # append a new line after each file name
+        text += '\n'
+        self._append_to_panel(panel, text)
+
+    def highlight_references(self, panel: sublime.View) -> None:
+        # highlight all word occurrences
+        regions = panel.find_all(r"\b{}\b".format(self.word))
+        panel.add_regions('ReferenceHighlight', regions, 'comment', flags=sublime.DRAW_OUTLINED)
+
+    def _append_to_panel(self, panel: sublime.View, characters: str) -> None:
+        panel.run_command('append', {
+            'characters': characters,
+            'force': True,
+            'scroll_to_end': False
+        })
 
     def get_selected_file_path(self, index: int) -> str:
         return self.get_full_path(self.reflist[index][0])
@@ -169,22 +228,19 @@ class LspSymbolReferencesCommand(LspTextCommand):
     def want_event(self) -> bool:
         return True
 
-    def _group_references_by_file(self, references: 'List[ReferenceDict]'
-                                  ) -> 'Dict[str, List[Tuple[Point, str]]]':
+    def _group_references_by_file(self, references: 'List[ReferenceDict]') -> 'Dict[str, List[Point]]':
         """ Return a dictionary that groups references by the file it belongs. """
-        grouped_references = {}  # type: Dict[str, List[Tuple[Point, str]]]
+        grouped_references = OrderedDict()  # type: Dict[str, List[Point]]
         for reference in references:
             file_path = uri_to_filename(reference["uri"])
             point = Point.from_lsp(reference['range']['start'])
-
-            # get line of the reference, to showcase its use
-            reference_line = get_line(self.view.window(), file_path, point.row)
-
-            if grouped_references.get(file_path) is None:
-                grouped_references[file_path] = []
-            grouped_references[file_path].append((point, reference_line))
-
-        # we don't want to cache the line, we always want to get fresh data
-        linecache.clearcache()
-
+            grouped_references.setdefault(file_path, []).append(point)
         return grouped_references
+
+    def _read_lines(self, file_path: str, rows: 'List[int]') -> 'Dict[int, str]':
+        """ Get the lines of the reference, to showcase its use. Open files are read from the buffer. """
+        window = self.view.window()
+        view = window.find_open_file(file_path) if window else None
+        if view:
+            return {row: view.substr(view.line(view.text_point(row, 0))).strip() for row in rows}
+        return read_lines(file_path, rows)
@@ -21,10 +21,7 @@ assert SignatureHelp
 
 class ColorSchemeScopeRenderer(object):
     def __init__(self, view: sublime.View) -> None:
-        self._scope_styles = {}  # type: dict
         self._view = view
-        for scope in ["entity.name.function", "variable.parameter", "punctuation"]:
-            self._scope_styles[scope] = mdpopups.scope2style(view, scope)
 
     def function(self, content: str, escape: bool = True) -> str:
         return self._wrap_with_scope_style(content, "entity.name.function", escape=escape)
@@ -36,10 +33,10 @@ class ColorSchemeScopeRenderer(object):
         return self._wrap_with_scope_style(content, "variable.parameter", emphasize)
 
     def markdown(self, content: str) -> str:
-        return mdpopups.md2html(self._view, content)
+        return popups.md2html(self._view, content)
 
     def _wrap_with_scope_style(self, content: str, scope: str, emphasize: bool = False, escape: bool = True) -> str:
-        color = self._scope_styles[scope]["color"]
+        color = popups.scope_style(self._view, scope)["color"]
         additional_styles = 'font-weight: bold; text-decoration: underline;' if emphasize else ''
         content = html.escape(content, quote=False) if escape else content
         return '<span style="color: {};{}">{}</span>'.format(color, additional_styles, content)
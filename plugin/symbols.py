@@ -1,17 +1,26 @@
 import sublime
-from .core.logging import debug
-from .core.protocol import Request, Range
+import sublime_plugin
+from .core.configurations import is_supported_syntax
+from .core.protocol import Request
 from .core.protocol import SymbolKind
-from .core.registry import LspTextCommand
+from .core.registry import LspTextCommand, session_for_view, client_from_session, windows
+from .core.settings import client_configs, settings
+from .core.symbols import DocumentSymbols, SymbolEntry, document_symbol_cache, flatten_symbols
 from .core.url import filename_to_uri
 from .core.views import range_to_region
 
 try:
-    from typing import List, Optional, Any, Tuple
-    assert List and Optional and Any and Tuple
+    from typing import List, Optional, Any, Tuple, Callable, Dict
+    assert List and Optional and Any and Tuple and Callable and Dict
 except ImportError:
     pass
 
+# While results stream in, the quick panel waits this long for all of them before it shows the ones so far.
+QUICK_PANEL_SHOW_DELAY_MS = 1000
+
+# Document symbols are requested again once a view wasn't edited for this long.
+DOCUMENT_SYMBOLS_REFRESH_DELAY_MS = 1000
+
 symbol_kind_names = {
     SymbolKind.File: "file",
     SymbolKind.Module: "module",
@@ -46,53 +55,208 @@ def format_symbol_kind(kind: int) -> str:
     return symbol_kind_names.get(kind, str(kind))
 
 
-def format_symbol(item: dict) -> 'List[str]':
+def format_symbol(entry: SymbolEntry) -> 'List[str]':
     """
     items may be a list of strings, or a list of string lists.
     In the latter case, each entry in the quick panel will show multiple rows
     """
-    prefix = item.get("containerName", "")
-    label = prefix + "." + item.get("name") if prefix else item.get("name")
-    return [label, format_symbol_kind(item.get("kind") or 0)]
+    label = entry.container + "." + entry.name if entry.container else entry.name
+    return [label, format_symbol_kind(entry.kind)]
+
+
+class PendingDocumentSymbols(object):
+    """ A documentSymbol request in flight, shared by everyone asking for the same document version """
+
+    def __init__(self) -> None:
+        self.parts = []  # type: List[List[Dict[str, Any]]]
+        self.handlers = []  # type: List[Callable[[DocumentSymbols], None]]
+        self.part_handlers = []  # type: List[Callable[[List[Dict[str, Any]]], None]]
+
+    def join(self, handler: 'Callable[[DocumentSymbols], None]',
+             on_part: 'Optional[Callable[[List[Dict[str, Any]]], None]]') -> None:
+        self.handlers.append(handler)
+        if on_part:
+            for part in self.parts:
+                on_part(part)
+            self.part_handlers.append(on_part)
+
+    def add_part(self, part: 'Optional[List[Dict[str, Any]]]') -> None:
+        if part:
+            self.parts.append(part)
+            for on_part in self.part_handlers:
+                on_part(part)
+
+
+_pending_document_symbols = {}  # type: Dict[Tuple[str, int], PendingDocumentSymbols]
+
+# Called with every view and the document symbols that were received for it.
+document_symbols_listeners = []  # type: List[Callable[[sublime.View, DocumentSymbols], None]]
+
+
+def request_document_symbols(view: sublime.View, handler: 'Callable[[DocumentSymbols], None]',
+                             on_part: 'Optional[Callable[[List[Dict[str, Any]]], None]]' = None) -> None:
+    """ Calls handler with the symbols of the current version of the view, from the shared cache if possible.
+
+    on_part is called with the symbols as they arrive, before handler.
+    """
+    file_path = view.file_name()
+    client = client_from_session(session_for_view(view, 'documentSymbolProvider'))
+    if not file_path or not client:
+        return
+    uri = filename_to_uri(file_path)
+    version = view.change_count()
+    cached = document_symbol_cache.get(uri, version)
+    if cached:
+        if on_part and cached.response:
+            on_part(cached.response)
+        handler(cached)
+        return
+    key = (uri, version)
+    pending = _pending_document_symbols.get(key)
+    if pending:
+        pending.join(handler, on_part)
+        return
+    pending = _pending_document_symbols[key] = PendingDocumentSymbols()
+    pending.join(handler, on_part)
+    window = view.window()
+    if window:
+        # the server must have seen the changes of this version before it is asked for its symbols.
+        windows.lookup(window).documents.purge_changes(view)
+
+    def handle_response(response: 'Optional[List[Dict[str, Any]]]') -> None:
+        pending.add_part(response)
+        _pending_document_symbols.pop(key, None)
+        symbols = document_symbol_cache.store(uri, version, [item for part in pending.parts for item in part])
+        for handler in pending.handlers:
+            handler(symbols)
+        for listener in document_symbols_listeners:
+            listener(view, symbols)
+
+    def handle_error(error: 'Any') -> None:
+        _pending_document_symbols.pop(key, None)
+        # the symbols that arrived are delivered but not cached, so the next request asks the server again.
+        symbols = DocumentSymbols(version, [item for part in pending.parts for item in part])
+        for handler in pending.handlers:
+            handler(symbols)
+        window = view.window()
+        if window:
+            reason = error.get("message", "none provided by server :(")
+            window.status_message("command 'textDocument/documentSymbol' failed. Reason: {}".format(reason))
+
+    client.send_request(Request.documentSymbols({"textDocument": {"uri": uri}}), handle_response, handle_error,
+                        pending.add_part)
+
+
+class DocumentSymbolsListener(sublime_plugin.ViewEventListener):
+    """ Keeps the document symbol cache up to date with the view, once edits settle """
+
+    @classmethod
+    def is_applicable(cls, view_settings: dict) -> bool:
+        syntax = view_settings.get('syntax')
+        return bool(syntax and is_supported_syntax(syntax, client_configs.all))
+
+    def on_activated_async(self) -> None:
+        self._refresh(self.view.change_count())
+
+    def on_modified_async(self) -> None:
+        version = self.view.change_count()
+        sublime.set_timeout_async(lambda: self._refresh(version), DOCUMENT_SYMBOLS_REFRESH_DELAY_MS)
+
+    def _refresh(self, version: int) -> None:
+        if settings.prefetch_document_symbols and version == self.view.change_count():
+            request_document_symbols(self.view, lambda symbols: None)
+
+
+class StreamingQuickPanel(object):
+    """ A quick panel for results that arrive in parts.
+
+    The panel is shown when all results arrived, or with the results so far once QUICK_PANEL_SHOW_DELAY_MS passed since
+    the first ones. If more results arrive after that, the panel is shown again with all of them once they are complete,
+    keeping the highlighted item selected. on_select is called once, with -1 when the panel is cancelled.
+    """
+
+    def __init__(self, window: sublime.Window, on_select: 'Callable[[int], None]') -> None:
+        self.window = window
+        self.items = []  # type: List[Any]
+        self._on_select = on_select
+        self._shown = 0
+        self._show_scheduled = False
+        self._panel = 0
+        self._selected_index = 0
+        self._closed = False
+
+    def add(self, items: 'List[Any]') -> None:
+        self.items.extend(items)
+        if not items:
+            return
+        if self._shown:
+            self.window.status_message("{} more results arrived after the list was shown".format(
+                len(self.items) - self._shown))
+        elif not self._show_scheduled:
+            self._show_scheduled = True
+            sublime.set_timeout(self._show, QUICK_PANEL_SHOW_DELAY_MS)
+
+    def complete(self) -> None:
+        """ Shows the panel right away, or again if results arrived since it was shown, as no more will arrive """
+        sublime.set_timeout(self._show)
+
+    def _show(self) -> None:
+        if self._closed or self._shown == len(self.items):
+            return
+        self._shown = len(self.items)
+        # showing a panel cancels the one that is open, which must not count as the user cancelling.
+        self._panel += 1
+        panel = self._panel
+        self.window.show_quick_panel(
+            list(self.items),
+            lambda index: self._select(panel, index),
+            0,
+            self._selected_index,
+            lambda index: self._highlight(panel, index))
+
+    def _select(self, panel: int, index: int) -> None:
+        if panel == self._panel:
+            self._closed = True
+            self._on_select(index)
+
+    def _highlight(self, panel: int, index: int) -> None:
+        if panel == self._panel and index >= 0:
+            self._selected_index = index
 
 
 class LspDocumentSymbolsCommand(LspTextCommand):
     def __init__(self, view: sublime.View) -> None:
         super().__init__(view)
+        self.symbols = []  # type: List[SymbolEntry]
+        self.quick_panel = None  # type: Optional[StreamingQuickPanel]
 
     def is_enabled(self, event: 'Optional[dict]' = None) -> bool:
         return self.has_client_with_capability('documentSymbolProvider')
 
     def run(self, edit: sublime.Edit) -> None:
-        client = self.client_with_capability('documentSymbolProvider')
-        file_path = self.view.file_name()
-        if client and file_path:
-            params = {
-                "textDocument": {
-                    "uri": filename_to_uri(file_path)
-                }
-            }
-            request = Request.documentSymbols(params)
-            client.send_request(request, self.handle_response)
-
-    def handle_response(self, response: 'Optional[List]') -> None:
-        response_list = response or []
-        symbols = list(format_symbol(item) for item in response_list)
-        self.symbols = response_list
         window = self.view.window()
         if window:
-            window.show_quick_panel(symbols, self.on_symbol_selected)
+            self.symbols = []
+            self.quick_panel = StreamingQuickPanel(window, self.on_symbol_selected)
+            request_document_symbols(self.view, self.handle_response, self.handle_part)
+
+    def handle_part(self, part: 'List[Dict[str, Any]]') -> None:
+        entries = flatten_symbols(part)
+        self.symbols.extend(entries)
+        if self.quick_panel:
+            self.quick_panel.add(list(format_symbol(entry) for entry in entries))
+
+    def handle_response(self, symbols: DocumentSymbols) -> None:
+        if self.quick_panel:
+            self.quick_panel.complete()
+        window = self.view.window()
+        if window and not symbols.entries:
+            window.status_message("No symbols found")
 
     def on_symbol_selected(self, symbol_index: int) -> None:
         if symbol_index == -1:
             return
-        selected_symbol = self.symbols[symbol_index]
-        range = selected_symbol.get('location', selected_symbol.get('range'))
-        range = range.get('range', range)
-        if not range:
-            debug('could not recognize the type: expected either SymbolInformation or DocumentSymbol')
-            return
-        region = range_to_region(Range.from_lsp(range), self.view)
+        region = range_to_region(self.symbols[symbol_index].selection_range, self.view)
         self.view.show_at_center(region)
         self.view.sel().clear()
         self.view.sel().add(region)
@@ -1,30 +1,202 @@
+import hashlib
+import html
 import sublime_plugin
 import sublime
+import threading
 from .core.protocol import Request
 from .core.registry import LspTextCommand
+from .core.rpc import Client
+from .core.settings import settings
+from .core.symbol_index import SymbolIndex, entries_of_symbol_information
+from .core.symbols import DocumentSymbols, WorkspaceSymbolCache
 from .core.url import uri_to_filename
-from .symbols import format_symbol_kind
+from .symbols import format_symbol_kind, StreamingQuickPanel, document_symbols_listeners
 import os
 
 try:
-    from typing import List, Optional, Dict, Any
-    assert List and Optional and Dict and Any
+    from typing import List, Optional, Dict, Any, Set, Tuple, Callable
+    assert List and Optional and Dict and Any and Set and Tuple and Callable
 except ImportError:
     pass
 
 
+# While typing, a query is only sent after the keyboard rested this long.
+WORKSPACE_SYMBOL_DEBOUNCE_MS = 200
+
+WORKSPACE_SYMBOL_PREVIEW_ITEMS = 10
+
+WORKSPACE_SYMBOL_INDEX_RESULTS = 100
+
+# Changes to a symbol index are written to disk after this delay, together with the changes that follow.
+SYMBOL_INDEX_SAVE_DELAY_MS = 10000
+
+_symbol_indexes = {}  # type: Dict[str, SymbolIndex]
+_symbol_index_saves = set()  # type: Set[str]
+
+
+def _in_background(function: 'Callable[[], None]') -> None:
+    # loading, saving and searching large indexes takes seconds, which would hold up the async thread.
+    threading.Thread(target=function, daemon=True).start()
+
+
+def symbol_index_for_window(window: 'Optional[sublime.Window]') -> 'Optional[SymbolIndex]':
+    """ The symbol index of the folders of a window, loaded from disk in the background when first used """
+    if not settings.workspace_symbol_index or not window or not window.folders():
+        return None
+    name = hashlib.sha1("\n".join(sorted(window.folders())).encode("utf-8")).hexdigest()
+    index = _symbol_indexes.get(name)
+    if not index:
+        index = _symbol_indexes[name] = SymbolIndex(os.path.join(sublime.cache_path(), "LSP", "symbols", name))
+        _in_background(index.load)
+    return index
+
+
+def _symbol_index_changed(index: SymbolIndex) -> None:
+    if index.path and index.path not in _symbol_index_saves:
+        _symbol_index_saves.add(index.path)
+        sublime.set_timeout_async(lambda: _in_background(lambda: _save_symbol_index(index)),
+                                  SYMBOL_INDEX_SAVE_DELAY_MS)
+
+
+def _save_symbol_index(index: SymbolIndex) -> None:
+    _symbol_index_saves.discard(index.path or "")
+    if index.is_modified():
+        index.save()
+
+
+def index_document_symbols(view: sublime.View, symbols: DocumentSymbols) -> None:
+    """ Replaces the indexed symbols of the file of a view, when the view matches the file on disk """
+    file_path = view.file_name()
+    index = symbol_index_for_window(view.window())
+    if not index or not file_path or view.is_dirty():
+        return
+    try:
+        mtime = os.path.getmtime(file_path)
+    except OSError:
+        return
+    index.set_file(file_path, mtime, [(entry.name, entry.kind, entry.container, entry.selection_range.start.row,
+                                       entry.selection_range.start.col) for entry in symbols.entries])
+    _symbol_index_changed(index)
+
+
+document_symbols_listeners.append(index_document_symbols)
+
+
+def index_workspace_symbols(index: 'Optional[SymbolIndex]', symbols: 'Optional[List[Dict[str, Any]]]') -> None:
+    if not index or not symbols:
+        return
+    for uri, entries in entries_of_symbol_information(symbols).items():
+        file_path = uri_to_filename(uri)
+        try:
+            index.merge_symbols(file_path, os.path.getmtime(file_path), entries)
+        except OSError:
+            continue
+    _symbol_index_changed(index)
+
+
+def query_symbol_index(index: SymbolIndex, query: str) -> 'List[Dict[str, Any]]':
+    """ Queries the index, dropping the files that changed on disk since they were indexed """
+    index.rebuild()
+    fresh = {}  # type: Dict[str, bool]
+    symbols = []
+    for symbol in index.query(query, WORKSPACE_SYMBOL_INDEX_RESULTS):
+        file_path = uri_to_filename(symbol["location"]["uri"])
+        if file_path not in fresh:
+            try:
+                fresh[file_path] = os.path.getmtime(file_path) == index.mtime(file_path)
+            except OSError:
+                fresh[file_path] = False
+            if not fresh[file_path]:
+                index.remove_file(file_path)
+        if fresh[file_path]:
+            symbols.append(symbol)
+    return symbols
+
+
+class WorkspaceSymbolSearch(object):
+    """ Sends the queries typed so far, one at a time, cancelling the one in flight when the query changes.
+
+    Results for a query that extends the last answered one are narrowed from the cache until the server answers.
+    """
+
+    def __init__(self, client: 'Optional[Client]', index: 'Optional[SymbolIndex]' = None) -> None:
+        self.client = client
+        self.index = index
+        self.cache = WorkspaceSymbolCache()
+        self.query = ""
+        self._request_id = None  # type: Optional[int]
+
+    def update(self, query: str) -> None:
+        if query == self.query:
+            return
+        self.query = query
+        if query and self.cache.query != query:
+            sublime.set_timeout_async(lambda: self._send(query), WORKSPACE_SYMBOL_DEBOUNCE_MS)
+
+    def matches(self, limit: int) -> 'Optional[List[Dict[str, Any]]]':
+        matches = self.cache.narrow(self.query, limit)
+        if matches is None and self.index:
+            # until the server answers, the symbol index is searched.
+            return self.index.query(self.query, limit) or None
+        return matches
+
+    def cancel(self) -> None:
+        if self.client and self._request_id is not None:
+            self.client.cancel_request(self._request_id)
+            self._request_id = None
+
+    def _send(self, query: str) -> None:
+        if not self.client or query != self.query or self.cache.query == query:
+            return
+        self.cancel()
+        request_id = None  # type: Optional[int]
+
+        def handle_response(response: 'Optional[List[Dict[str, Any]]]') -> None:
+            if request_id == self._request_id:
+                self._request_id = None
+                self.cache.store(query, response or [])
+                index_workspace_symbols(self.index, response)
+
+        request_id = self._request_id = self.client.send_request(
+            Request.workspaceSymbol({"query": query}), handle_response, lambda error: None)
+
+
 class SymbolQueryInput(sublime_plugin.TextInputHandler):
 
+    def __init__(self, search: 'Optional[WorkspaceSymbolSearch]' = None) -> None:
+        self.search = search
+
     def validate(self, txt: str) -> bool:
         return txt != ""
 
     def placeholder(self) -> str:
         return "Symbol"
 
+    def preview(self, txt: str) -> 'Any':
+        if not self.search or not txt:
+            return None
+        self.search.update(txt)
+        matches = self.search.matches(WORKSPACE_SYMBOL_PREVIEW_ITEMS)
+        if matches is None:
+            # the preview is only drawn on a keystroke, so the results of this query appear on the next one.
+            return "Searching for '{}'...".format(txt)
+        if not matches:
+            return "No matches found"
+        return sublime.Html("<br>".join(
+            "<b>{}</b> {}".format(html.escape(s["name"]), html.escape(format_symbol_kind(s["kind"]))) for s in matches))
+
+    def cancel(self) -> None:
+        if self.search:
+            self.search.cancel()
+
 
 class LspWorkspaceSymbolsCommand(LspTextCommand):
     def __init__(self, view: sublime.View) -> None:
         super().__init__(view)
+        self.matches = []  # type: List[Dict[str, Any]]
+        self.quick_panel = None  # type: Optional[StreamingQuickPanel]
+        self.search = None  # type: Optional[WorkspaceSymbolSearch]
+        self._shown = set()  # type: Set[Tuple[str, int, str]]
 
     def _format(self, s: 'Dict[str, Any]') -> str:
         file_name = os.path.basename(s['location']['uri'])
@@ -42,33 +214,91 @@ class LspWorkspaceSymbolsCommand(LspTextCommand):
             if window:
                 window.open_file(encoded_file_name, sublime.ENCODED_POSITION)
 
+    def _start_quick_panel(self) -> None:
+        self.matches = []
+        self._shown = set()
+        window = self.view.window()
+        matches = self.matches
+        self.quick_panel = StreamingQuickPanel(window, lambda i: self._open_file(matches, i)) if window else None
+
+    def _handle_partial_response(self, response: 'Optional[List[Dict[str, Any]]]') -> None:
+        # symbols shown from the index are not shown again when the server returns them.
+        symbols = []
+        for symbol in response or []:
+            key = (symbol['location']['uri'], symbol['location']['range']['start']['line'], symbol['name'])
+            if key not in self._shown:
+                self._shown.add(key)
+                symbols.append(symbol)
+        if symbols:
+            self.matches.extend(symbols)
+            if self.quick_panel:
+                self.quick_panel.add(list(map(lambda s: self._format(s), symbols)))
+
     def _handle_response(self, query: str, response: 'Optional[List[Dict[str, Any]]]') -> None:
         self.view.erase_status("lsp_workspace_symbols")
-        if response:
-            matches = response
-            choices = list(map(lambda s: self._format(s), matches))
-            window = self.view.window()
-            if window:
-                window.show_quick_panel(choices, lambda i: self._open_file(matches, i))
-        else:
+        self._handle_partial_response(response)
+        if self.quick_panel:
+            self.quick_panel.complete()
+        if not self.matches:
             sublime.message_dialog("No matches found for query string: '{}'".format(query))
 
     def _handle_error(self, error: 'Dict[str, Any]') -> None:
         self.view.erase_status("lsp_workspace_symbols")
+        if self.quick_panel:
+            self.quick_panel.complete()
         reason = error.get("message", "none provided by server :(")
         msg = "command 'workspace/symbol' failed. Reason: {}".format(reason)
         sublime.error_message(msg)
 
     def is_enabled(self) -> bool:
-        return self.has_client_with_capability('workspaceSymbolProvider')
+        if self.has_client_with_capability('workspaceSymbolProvider'):
+            return True
+        # before the server is ready, the symbol index can answer.
+        index = symbol_index_for_window(self.view.window())
+        return bool(index and not index.is_empty())
 
     def input(self, _args: 'Any') -> sublime_plugin.TextInputHandler:
-        return SymbolQueryInput()
+        self.search = None
+        client = self.client_with_capability('workspaceSymbolProvider')
+        index = symbol_index_for_window(self.view.window())
+        if index:
+            _in_background(index.rebuild)
+        if (client or index) and settings.workspace_symbols_as_you_type:
+            self.search = WorkspaceSymbolSearch(client, index)
+        return SymbolQueryInput(self.search)
 
     def run(self, edit: 'Any', symbol_query_input: str = "") -> None:
-        if symbol_query_input:
-            request = Request.workspaceSymbol({"query": symbol_query_input})
+        search = self.search
+        self.search = None
+        if search and search.cache.query == symbol_query_input:
+            # the server already answered this query while it was typed.
+            self._start_quick_panel()
+            self._handle_response(symbol_query_input, search.cache.symbols)
+        elif symbol_query_input:
+            if search:
+                search.cancel()
             client = self.client_with_capability('workspaceSymbolProvider')
-            if client:
+            index = symbol_index_for_window(self.view.window())
+            if client or index:
                 self.view.set_status("lsp_workspace_symbols", "Searching for '{}'...".format(symbol_query_input))
-                client.send_request(request, lambda r: self._handle_response(symbol_query_input, r), self._handle_error)
+                self._start_quick_panel()
+                _in_background(lambda: self._search(symbol_query_input, client, index))
+
+    def _search(self, query: str, client: 'Optional[Client]', index: 'Optional[SymbolIndex]') -> None:
+        """ Adds the indexed symbols first, then the ones of the server as they arrive """
+        if index:
+            self._handle_partial_response(query_symbol_index(index, query))
+        if not client:
+            self._handle_response(query, [])
+            return
+
+        def handle_response(response: 'Optional[List[Dict[str, Any]]]') -> None:
+            index_workspace_symbols(index, response)
+            self._handle_response(query, response)
+
+        def handle_partial_response(response: 'Optional[List[Dict[str, Any]]]') -> None:
+            index_workspace_symbols(index, response)
+            self._handle_partial_response(response)
+
+        client.send_request(Request.workspaceSymbol({"query": query}), handle_response, self._handle_error,
+                            handle_partial_response)
@@ -0,0 +1,83 @@
+""" Times the data structures that keep LSP responsive on large inputs.
+
+These are not tests, as their timings depend on the machine. Run them with the directory containing the LSP package on
+the path, e.g. `PYTHONPATH=..:tests python tests/benchmarks.py` from the package directory.
+"""
+import timeit
+from test_completion_core import clangd_completion_sample, format_at_start, many_items
+from test_symbol_index import generated_index
+from LSP.plugin.core.completion import CompletionCache, parse_completion_response
+from LSP.plugin.core.edit import minimal_edits
+
+try:
+    from typing import Callable
+    assert Callable
+except ImportError:
+    pass
+
+
+def best_of_three(function: 'Callable[[], None]') -> float:
+    return min(timeit.repeat(function, number=1, repeat=3))
+
+
+def report(name: str, seconds: float) -> None:
+    print("{:<60} {:>8.1f} ms".format(name, seconds * 1000))
+
+
+def benchmark_completion_top_items() -> None:
+    sample = many_items(clangd_completion_sample, 10000)
+
+    def format_everything() -> None:
+        items, _ = parse_completion_response(sample)
+        [format_at_start(item) for item in items]
+
+    def top_items() -> None:
+        cache = CompletionCache()
+        items, _ = parse_completion_response(sample, sort=False)
+        cache.store((1, 0, ""), items, format_at_start, False)
+        cache.narrow("")
+
+    report("completion: sort and format 10000 items", best_of_three(format_everything))
+    report("completion: select and format the top items of 10000", best_of_three(top_items))
+
+
+def benchmark_phantom_diff() -> None:
+    # the viewport module needs the sublime module, so this only runs inside Sublime Text.
+    from LSP.plugin.core.viewport import diff_rendered
+    from test_viewport import color_phantoms
+    rendered = color_phantoms(2000)
+    wanted = color_phantoms(2000, changed=1000)
+
+    def pairwise() -> None:
+        # PhantomSet.update looks up every new phantom in the list of the existing ones.
+        [phantom for phantom in wanted if phantom not in rendered]
+
+    report("phantoms: compare 2000 phantoms pairwise", best_of_three(pairwise))
+    report("phantoms: diff 2000 phantoms by key", best_of_three(lambda: diff_rendered(rendered, wanted)))
+
+
+def benchmark_symbol_index() -> None:
+    index = generated_index(10000, 100)
+    for query in ("getLine", "gLF", "symIdxRd", "xyz"):
+        report("symbol index: query {} in {} symbols".format(query, len(index)),
+               best_of_three(lambda: index.query(query, 100)))
+
+
+def benchmark_minimal_edits() -> None:
+    old_lines = [("def f{}(a,b):\n" if i % 3 == 0 else "    return a + {}\n").format(i) for i in range(20000)]
+    text = "".join(old_lines)
+    reformatted = "".join(line.replace("a,b", "a, b") for line in old_lines)
+    inserts = [((row, 0), (row, 0), "# comment\n") for row in range(0, 20000, 10)]
+    report("edits: reformat 20000 lines", best_of_three(
+        lambda: minimal_edits(text, [((0, 0), (20000, 0), reformatted)])))
+    report("edits: insert 2000 lines", best_of_three(lambda: minimal_edits(text, inserts)))
+
+
+if __name__ == "__main__":
+    benchmark_completion_top_items()
+    benchmark_minimal_edits()
+    benchmark_symbol_index()
+    try:
+        benchmark_phantom_diff()
+    except ImportError as error:
+        print("skipped phantoms:", error)
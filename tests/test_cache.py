@@ -0,0 +1,41 @@
+from LSP.plugin.core.cache import LRUCache
+import unittest
+
+
+class LRUCacheTests(unittest.TestCase):
+
+    def test_get_and_set(self):
+        cache = LRUCache(2)
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.get("a", 0), 0)
+        cache.set("a", 1)
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIn("a", cache)
+
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertEqual(len(cache), 2)
+        self.assertNotIn("b", cache)
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.get("c"), 3)
+
+    def test_discard(self):
+        cache = LRUCache(10)
+        cache.set(("a.py", 1), 1)
+        cache.set(("a.py", 2), 2)
+        cache.set(("b.py", 1), 3)
+        cache.discard(lambda key: key[0] == "a.py")
+        self.assertEqual(len(cache), 1)
+        self.assertIn(("b.py", 1), cache)
+
+    def test_discard_items(self):
+        cache = LRUCache(10)
+        cache.set("a", ["a.py"])
+        cache.set("b", ["b.py"])
+        cache.discard_items(lambda key, value: "a.py" in value)
+        self.assertEqual(len(cache), 1)
+        self.assertIn("b", cache)
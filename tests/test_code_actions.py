@@ -0,0 +1,147 @@
+from LSP.plugin import code_actions
+from LSP.plugin.code_actions import CodeActionsAtLocation, CodeActionsManager, prefetch_code_actions
+from LSP.plugin.core.protocol import Diagnostic, Point, Range
+from unittest import mock
+import sublime
+import threading
+import unittest
+
+try:
+    from typing import Any, Dict, List
+    assert Any and Dict and List
+except ImportError:
+    pass
+
+
+def diagnostic(row: int, message: str = "unused") -> Diagnostic:
+    return Diagnostic(message, Range(Point(row, 0), Point(row, 5)), 1, None, {}, [])
+
+
+class FakeView(object):
+    """ A view with rows of 100 characters """
+
+    def __init__(self, file_name: str = "/a.py", changes: int = 0, caret: int = 0) -> None:
+        self._file_name = file_name
+        self.changes = changes
+        self.caret = caret
+
+    def is_valid(self) -> bool:
+        return True
+
+    def file_name(self) -> str:
+        return self._file_name
+
+    def change_count(self) -> int:
+        return self.changes
+
+    def sel(self) -> 'List[sublime.Region]':
+        return [sublime.Region(self.caret)]
+
+    def text_point(self, row: int, col: int) -> int:
+        return row * 100 + col
+
+    def rowcol(self, point: int) -> tuple:
+        return divmod(point, 100)
+
+
+class CodeActionsAtLocationTests(unittest.TestCase):
+
+    def test_completes_once_every_config_answered(self):
+        completed = []  # type: List[Dict[str, Any]]
+        location = CodeActionsAtLocation(completed.append)
+        first = location.collect("first")
+        second = location.collect("second")
+        first([{"title": "fix"}])
+        self.assertEqual(completed, [])
+        second(None)
+        self.assertEqual(completed, [{"first": [{"title": "fix"}], "second": []}])
+
+    def test_delivers_to_handlers_added_before_and_after_completion(self):
+        delivered = []  # type: List[str]
+        location = CodeActionsAtLocation(lambda actions: None)
+        store = location.collect("config")
+        location.deliver(lambda actions: delivered.append("waiting"))
+        store([])
+        location.deliver(lambda actions: delivered.append("late"))
+        self.assertEqual(delivered, ["waiting", "late"])
+
+    def test_handlers_are_called_outside_the_lock(self):
+        delivered = []  # type: List[str]
+        location = CodeActionsAtLocation(
+            lambda actions: location.deliver(lambda actions: delivered.append("nested")))
+        location.collect("config")([])
+        self.assertEqual(delivered, ["nested"])
+
+    def test_each_handler_gets_the_actions_once_when_stored_and_delivered_concurrently(self):
+        delivered = []  # type: List[int]
+        location = CodeActionsAtLocation(lambda actions: None)
+        stores = [location.collect(str(index)) for index in range(20)]
+        threads = [threading.Thread(target=store, args=([],)) for store in stores]
+        threads.extend(threading.Thread(target=location.deliver, args=(lambda actions, i=i: delivered.append(i),))
+                       for i in range(20))
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(delivered), list(range(20)))
+
+
+class LocationKeyTests(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.manager = CodeActionsManager()
+
+    def test_same_diagnostics_share_a_key_wherever_the_caret_is(self):
+        diagnostics = {"config": [diagnostic(1)]}
+        self.assertEqual(self.manager.get_location_key(FakeView(caret=101), diagnostics),
+                         self.manager.get_location_key(FakeView(caret=104), diagnostics))
+
+    def test_key_changes_with_file_and_change_count(self):
+        diagnostics = {"config": [diagnostic(1)]}
+        key = self.manager.get_location_key(FakeView(), diagnostics)
+        self.assertNotEqual(self.manager.get_location_key(FakeView(file_name="/b.py"), diagnostics), key)
+        self.assertNotEqual(self.manager.get_location_key(FakeView(changes=1), diagnostics), key)
+
+    def test_key_changes_with_the_diagnostics(self):
+        key = self.manager.get_location_key(FakeView(), {"config": [diagnostic(1)]})
+        self.assertNotEqual(self.manager.get_location_key(FakeView(), {"config": [diagnostic(2)]}), key)
+        self.assertNotEqual(self.manager.get_location_key(FakeView(), {"config": [diagnostic(1, "other")]}), key)
+        self.assertNotEqual(self.manager.get_location_key(FakeView(), {"other": [diagnostic(1)]}), key)
+
+    def test_key_without_diagnostics_is_the_selection(self):
+        self.assertEqual(self.manager.get_location_key(FakeView(caret=5), {}),
+                         self.manager.get_location_key(FakeView(caret=5), {}))
+        self.assertNotEqual(self.manager.get_location_key(FakeView(caret=5), {}),
+                            self.manager.get_location_key(FakeView(caret=6), {}))
+
+    def test_request_is_sent_once_per_key(self):
+        view = FakeView()
+        diagnostics = {"config": [diagnostic(1)]}
+        sent = CodeActionsAtLocation(lambda actions: None)
+        delivered = []  # type: List[Dict[str, Any]]
+        with mock.patch.object(code_actions, "request_code_actions_with_diagnostics",
+                               return_value=sent) as request:
+            self.manager.request(view, 101, delivered.append, diagnostics)
+            self.manager.request(view, 103, delivered.append, diagnostics)
+        self.assertEqual(request.call_count, 1)
+        self.assertTrue(sent.is_complete())
+        self.assertEqual(delivered, [{}])
+
+
+class PrefetchTests(unittest.TestCase):
+
+    def prefetch(self, view: FakeView, change_count: int) -> 'List[int]':
+        requested = []  # type: List[int]
+        diagnostics = {"config": [diagnostic(1), diagnostic(50), diagnostic(200)]}
+        with mock.patch.object(code_actions, "view_diagnostics", return_value=diagnostics), \
+                mock.patch.object(code_actions, "visible_rows", return_value=(0, 60)), \
+                mock.patch.object(code_actions.actions_manager, "request",
+                                  side_effect=lambda view, point, handler: requested.append(point)):
+            prefetch_code_actions(view, change_count)
+        return requested
+
+    def test_requests_the_visible_diagnostics(self):
+        self.assertEqual(self.prefetch(FakeView(changes=3), 3), [100, 5000])
+
+    def test_skips_a_view_that_changed_since_it_was_scheduled(self):
+        self.assertEqual(self.prefetch(FakeView(changes=4), 3), [])
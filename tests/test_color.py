@@ -0,0 +1,60 @@
+from LSP.plugin import color
+from LSP.plugin.color import LspColorListener
+from unittest import mock
+import unittest
+
+
+def color_information(row: int) -> dict:
+    return {
+        "range": {"start": {"line": row, "character": 0}, "end": {"line": row, "character": 7}},
+        "color": {"red": 1, "green": 0, "blue": 0, "alpha": 1}
+    }
+
+
+class FakeView(object):
+
+    def __init__(self) -> None:
+        self.changes = 0
+
+    def change_count(self) -> int:
+        return self.changes
+
+    def file_name(self) -> str:
+        return "/a.css"
+
+
+class ColorResponseTests(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.view = FakeView()
+        patch = mock.patch.object(color, "viewport_phantoms")
+        self.phantoms = patch.start().return_value
+        self.addCleanup(patch.stop)
+        self.listener = LspColorListener(self.view)  # type: ignore
+        self.listener.view = self.view  # type: ignore
+
+    def test_shows_colors_of_the_current_version(self):
+        self.listener.handle_response([color_information(1), color_information(2)], 0)
+        phantoms = self.phantoms.update.call_args[0][0]
+        self.assertEqual([r.start.row for r, _, _ in phantoms], [1, 2])
+        self.assertEqual(self.listener._color_version, 0)
+
+    def test_drops_response_for_an_outdated_version(self):
+        self.view.changes = 1
+        self.listener.handle_response([color_information(1)], 0)
+        self.assertFalse(self.phantoms.update.called)
+        self.assertEqual(self.listener._color_version, -1)
+
+    def test_doesnt_request_colors_of_the_shown_version_again(self):
+        client = mock.Mock()
+        with mock.patch.object(color, "is_transient_view", return_value=False), \
+                mock.patch.object(color, "session_for_view"), \
+                mock.patch.object(color, "client_from_session", return_value=client):
+            self.listener.send_color_request()
+            self.assertEqual(client.send_request.call_count, 1)
+            self.listener.handle_response([], 0)
+            self.listener.send_color_request()
+            self.assertEqual(client.send_request.call_count, 1)
+            self.view.changes = 1
+            self.listener.send_color_request()
+            self.assertEqual(client.send_request.call_count, 2)
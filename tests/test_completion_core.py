@@ -1,11 +1,12 @@
 import unittest
 from os import path
 import json
-from LSP.plugin.core.completion import format_completion, parse_completion_response
+from LSP.plugin.core.completion import format_completion, parse_completion_response, fuzzy_score, CompletionCache
+from LSP.plugin.core.completion import CompletionItemIndex, CompletionResolver
 from LSP.plugin.core.types import Settings
 try:
-    from typing import Optional, Dict
-    assert Optional and Dict
+    from typing import Optional, Dict, List, Tuple, Callable
+    assert Optional and Dict and List and Tuple and Callable
 except ImportError:
     pass
 
@@ -180,3 +181,273 @@ class CompletionFormattingTests(unittest.TestCase):
                 ('device_encoding(fd)\t  os', 'device_encoding(${1:fd})$0')
             ]
         )
+
+
+def format_at_start(item: dict) -> 'Tuple[str, str]':
+    return format_completion(item, 0, settings)
+
+
+def cache_for(sample: 'List[Dict]', incomplete: bool = False) -> CompletionCache:
+    items, _ = parse_completion_response(sample, sort=False)
+    cache = CompletionCache()
+    cache.store((1, 0, ""), items, format_at_start, incomplete)
+    return cache
+
+
+def many_items(sample: 'List[Dict]', count: int) -> 'List[Dict]':
+    items = []  # type: List[Dict]
+    while len(items) < count:
+        for item in sample:
+            copy = dict(item)
+            copy["label"] = item["label"] + str(len(items))
+            copy["sortText"] = (item.get("sortText") or item["label"]) + str(len(items))
+            items.append(copy)
+    return items[:count]
+
+
+class FuzzyScoreTests(unittest.TestCase):
+
+    def test_empty_query_matches(self):
+        self.assertEqual(fuzzy_score("", "anything"), 0)
+
+    def test_subsequence_required(self):
+        self.assertIsNone(fuzzy_score("xyz", "alignas"))
+        self.assertIsNotNone(fuzzy_score("ags", "alignas"))
+
+    def test_prefix_beats_scattered_match(self):
+        self.assertGreater(fuzzy_score("al", "alloca"), fuzzy_score("al", "a64l"))
+
+    def test_word_boundaries_score_higher(self):
+        self.assertGreater(fuzzy_score("gr", "GLOBALS_REQUEST"), fuzzy_score("gr", "GLOBALSREQUEST"))
+
+
+class CompletionCacheTests(unittest.TestCase):
+
+    def test_narrows_and_reranks(self):
+        cache = cache_for(clangd_completion_sample)
+        items, completions = cache.narrow("al")
+        self.assertEqual([item["insertText"].split("(")[0] for item in items],
+                         ["alignas", "alignof", "aligned_alloc", "alloca", "a64l", "atol"])
+        self.assertEqual([c[0] for c in completions][:2], ["alignas(expression)\t  Snippet", "alignof(type)\t  size_t"])
+
+    def test_empty_typed_text_keeps_server_order(self):
+        cache = cache_for(pyls_completion_sample)
+        items, _ = parse_completion_response(pyls_completion_sample)
+        self.assertEqual(cache.narrow(""), (items, [format_at_start(item) for item in items]))
+
+    def test_uses_filter_text(self):
+        cache = cache_for(intelephense_completion_sample)
+        items, _ = cache.narrow("$_SE")
+        self.assertEqual([item["label"] for item in items][:2], ["$_SERVER", "$_SESSION"])
+
+    def test_requests_only_on_new_word_or_incomplete(self):
+        def count_requests(cache: CompletionCache, keystrokes: 'List[Tuple[int, str]]') -> int:
+            requests = 0
+            for start, typed in keystrokes:
+                key = (1, start, "")
+                if cache.can_narrow(key):
+                    cache.narrow(typed)
+                else:
+                    requests += 1
+                    cache.store(key, cache.items, format_at_start, cache.incomplete)
+            return requests
+
+        typing = [(0, "a"), (0, "al"), (0, "ali"), (0, "alig"), (6, "a"), (6, "at")]
+        self.assertEqual(count_requests(cache_for(clangd_completion_sample), typing), 1)
+        self.assertEqual(count_requests(cache_for(clangd_completion_sample, incomplete=True), typing), 6)
+        cache = cache_for(clangd_completion_sample)
+        cache.clear()
+        self.assertEqual(count_requests(cache, typing), 2)
+
+    def test_selects_and_formats_top_items_only(self):
+        formatted = []  # type: List[str]
+
+        def format_item(item: dict) -> 'Tuple[str, str]':
+            formatted.append(item["label"])
+            return format_at_start(item)
+
+        cache = CompletionCache()
+        cache.store((1, 0, ""), many_items(clangd_completion_sample, 10000), format_item, False)
+        items, completions = cache.narrow("", limit=50)
+        self.assertEqual(len(completions), 50)
+        self.assertEqual(len(formatted), 50)
+        self.assertEqual(items, sorted(cache.items, key=lambda item: item["sortText"])[:50])
+        items, completions = cache.narrow("alig", limit=50)
+        self.assertTrue(all(c[0].startswith("alig") for c in completions))
+        self.assertLessEqual(len(formatted), 100)
+
+    def test_top_items_are_the_best_of_all_matches(self):
+        cache = cache_for(many_items(clangd_completion_sample, 1000))
+        for typed in ("", "a", "alig"):
+            items, completions = cache.narrow(typed, limit=10)
+            everything, _ = cache.narrow(typed, limit=1000)
+            self.assertEqual(items, everything[:10])
+            self.assertEqual(completions, [format_at_start(item) for item in items])
+
+    def test_longer_typed_text_rescores_previous_matches(self):
+        cache = cache_for(clangd_completion_sample)
+        cache.narrow("a")
+        cache.narrow("al")
+        self.assertEqual(cache.narrow("alo"), cache_for(clangd_completion_sample).narrow("alo"))
+        self.assertEqual(cache.narrow("st"), cache_for(clangd_completion_sample).narrow("st"))
+
+
+def index_for(sample: 'List[Dict]') -> CompletionItemIndex:
+    cache = cache_for(sample)
+    cache.narrow("")
+    return cache.index
+
+
+class CompletionMergeTests(unittest.TestCase):
+
+    def test_merges_responses_of_several_servers(self):
+        cache = CompletionCache()
+        cache.store((1, 0, ""), [dict(label="b", sortText="2"), dict(label="a", sortText="1")], format_at_start,
+                    False, "first")
+        cache.add([dict(label="z", sortText="9"), dict(label="y", sortText="8")], True, "second")
+        items, _ = cache.narrow("")
+        self.assertEqual([item["label"] for item in items], ["a", "y", "b", "z"])
+        self.assertTrue(cache.incomplete)
+        self.assertEqual(cache.origin(items[1]), "second")
+        self.assertIsNone(cache.origin(dict(label="a", sortText="1")))
+
+    def test_drops_duplicates_of_other_servers(self):
+        cache = CompletionCache()
+        cache.store((1, 0, ""), [dict(label="a", insertText="a()"), dict(label="a", insertText="a()")],
+                    format_at_start, False, "first")
+        cache.add([dict(label="a", insertText="a()"), dict(label="a", insertText="a(x)")], False, "second")
+        self.assertEqual([(item["insertText"], cache.origin(item)) for item in cache.items],
+                         [("a()", "first"), ("a()", "first"), ("a(x)", "second")])
+
+    def test_origin_is_forgotten_with_the_items(self):
+        cache = CompletionCache()
+        items = [dict(label="a"), dict(label="b")]
+        cache.store((1, 0, ""), items, format_at_start, False, "first")
+        self.assertEqual([cache.origin(item) for item in items], ["first", "first"])
+        cache.store((2, 0, ""), [dict(label="c")], format_at_start, False, "second")
+        self.assertEqual([cache.origin(item) for item in items], [None, None])
+
+    def test_merged_items_are_narrowed(self):
+        cache = cache_for(clangd_completion_sample)
+        cache.narrow("al")
+        cache.add(pyls_completion_sample, False, "pyls")
+        items, _ = cache.narrow("alt")
+        self.assertEqual([item["label"] for item in items], ["altsep"])
+
+
+class CompletionItemIndexTests(unittest.TestCase):
+
+    def test_exact_replacement(self):
+        index = index_for(clangd_completion_sample)
+        item = index.find("auto")
+        self.assertEqual(item and item["insertText"], "auto")
+        self.assertIsNone(index.find("aut"))
+
+    def test_snippet_prefix(self):
+        index = index_for(clangd_completion_sample)
+        item = index.find("alignas(expression)")
+        self.assertEqual(item and item["insertText"], "alignas(${1:expression})")
+        item = index.find("static_assert(x, \"message\")")
+        self.assertEqual(item and item["insertText"], "static_assert(${1:expression}, ${2:message})")
+
+    def test_longest_snippet_prefix_wins(self):
+        index = CompletionItemIndex()
+        index.add("close(${1:fd})$0", {"label": "close"})
+        index.add("closerange(${1:fd_low}, ${2:fd_high})$0", {"label": "closerange"})
+        self.assertEqual(index.find("closerange(0, 1)"), {"label": "closerange"})
+        self.assertEqual(index.find("close(0)"), {"label": "close"})
+
+    def test_snippet_ending_placeholder(self):
+        index = index_for(pyls_completion_sample)
+        item = index.find("chdir(path)")
+        self.assertEqual(item and item["label"], "chdir(path)")
+
+    def test_escaped_dollar(self):
+        index = index_for(intelephense_completion_sample)
+        item = index.find("$_SERVER")
+        self.assertEqual(item and item["label"], "$_SERVER")
+
+    def test_trigger_character_before_inserted_text(self):
+        # issues 714 and 720: the inserted text may start with a trigger character that is not part of the item.
+        index = index_for(clangd_completion_sample)
+        self.assertIsNone(index.find(".abort()"))
+        item = index.find(".abort()"[1:])
+        self.assertEqual(item and item["insertText"], "abort()")
+
+    def test_only_formatted_items_are_indexed(self):
+        cache = cache_for(clangd_completion_sample)
+        cache.narrow("alig")
+        self.assertIsNotNone(cache.index.find("alignof(type)"))
+        self.assertIsNone(cache.index.find("auto"))
+        cache.store((1, 0, ""), [], format_at_start, False)
+        self.assertIsNone(cache.index.find("alignof(type)"))
+
+
+class ResolvingClient(object):
+    def __init__(self) -> None:
+        self.requests = []  # type: List[Tuple[dict, Callable, Callable]]
+
+    def send_request(self, request, handler, error_handler) -> None:
+        self.requests.append((request.params, handler, error_handler))
+
+    def respond(self, index: int = 0) -> None:
+        params, handler, _ = self.requests.pop(index)
+        resolved = dict(params)
+        resolved["additionalTextEdits"] = []
+        handler(resolved)
+
+
+class CompletionResolverTests(unittest.TestCase):
+
+    def test_bounded_concurrency(self):
+        client = ResolvingClient()
+        resolver = CompletionResolver(max_pending=2)
+        items = [dict(label=str(i)) for i in range(5)]
+        resolver.prefetch(client, items, 1)
+        self.assertEqual([r[0]["label"] for r in client.requests], ["0", "1"])
+        client.respond()
+        self.assertEqual([r[0]["label"] for r in client.requests], ["1", "2"])
+        while client.requests:
+            client.respond()
+        results = []  # type: List[dict]
+        for item in items:
+            self.assertTrue(resolver.resolved(item, 1, results.append))
+        self.assertEqual([r["label"] for r in results], ["0", "1", "2", "3", "4"])
+        self.assertTrue(all("additionalTextEdits" in r for r in results))
+
+    def test_new_prefetch_replaces_queue(self):
+        client = ResolvingClient()
+        resolver = CompletionResolver(max_pending=1)
+        resolver.prefetch(client, [dict(label="a"), dict(label="b")], 1)
+        resolver.prefetch(client, [dict(label="a"), dict(label="c")], 1)
+        client.respond()
+        self.assertEqual([r[0]["label"] for r in client.requests], ["c"])
+
+    def test_commit_while_pending(self):
+        client = ResolvingClient()
+        resolver = CompletionResolver()
+        item = dict(label="a")
+        resolver.prefetch(client, [item], 1)
+        results = []  # type: List[dict]
+        self.assertTrue(resolver.resolved(item, 1, results.append))
+        self.assertEqual(results, [])
+        client.respond()
+        self.assertEqual([r["label"] for r in results], ["a"])
+
+    def test_keyed_by_document_version(self):
+        client = ResolvingClient()
+        resolver = CompletionResolver()
+        item = dict(label="a")
+        resolver.prefetch(client, [item], 1)
+        client.respond()
+        self.assertFalse(resolver.resolved(item, 2, lambda resolved: None))
+        self.assertFalse(resolver.resolved(dict(label="b"), 1, lambda resolved: None))
+
+    def test_least_recently_used_items_evicted(self):
+        client = ResolvingClient()
+        resolver = CompletionResolver(max_cached=2)
+        for label in "abc":
+            resolver.prefetch(client, [dict(label=label)], 1)
+            client.respond()
+        self.assertFalse(resolver.resolved(dict(label="a"), 1, lambda resolved: None))
+        self.assertTrue(resolver.resolved(dict(label="c"), 1, lambda resolved: None))
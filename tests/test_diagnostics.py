@@ -2,14 +2,15 @@ import unittest
 from collections import OrderedDict
 from unittest import mock
 from LSP.plugin.core.diagnostics import (
-    DiagnosticsStorage, DiagnosticsWalker, DiagnosticsCursor, CURSOR_FORWARD, CURSOR_BACKWARD)
+    DiagnosticsStorage, DiagnosticsWalker, DiagnosticsCursor, DiagnosticsIndex, DiagnosticsPuller, CURSOR_FORWARD,
+    CURSOR_BACKWARD)
 from LSP.plugin.core.protocol import Diagnostic, Point, Range, DiagnosticSeverity
 from test_protocol import LSP_MINIMAL_DIAGNOSTIC
 
 TYPE_CHECKING = False
 if TYPE_CHECKING:
-    from typing import List, Dict
-    assert List and Dict
+    from typing import Any, Callable, List, Dict, Tuple
+    assert Any and Callable and List and Dict and Tuple
 
 
 test_file_path = "/test.py"
@@ -145,143 +146,292 @@ info.severity = DiagnosticSeverity.Information
 test_diagnostics = diagnostics([row1, info, row5], [row3])
 
 
+def cursor_for(diags: 'Dict[str, Dict[str, List[Diagnostic]]]') -> DiagnosticsCursor:
+    cursor = DiagnosticsCursor()
+    for file_path, file_diagnostics in diags.items():
+        cursor.update(file_path, file_diagnostics)
+    return cursor
+
+
+class DiagnosticsIndexTest(unittest.TestCase):
+
+    def test_orders_by_file_and_position(self) -> None:
+        index = DiagnosticsIndex()
+        index.update(second_file_path, {test_server_name: [row3]})
+        index.update(test_file_path, {test_server_name: [row5, info, row1]})
+
+        self.assertEqual(3, len(index))
+        self.assertEqual((test_file_path, row1), index.at(0))
+        self.assertEqual((test_file_path, row5), index.at(1))
+        self.assertEqual((second_file_path, row3), index.at(2))
+
+    def test_filters_by_severity(self) -> None:
+        index = DiagnosticsIndex(DiagnosticSeverity.Information)
+        index.update(test_file_path, {test_server_name: [row1, info, row5]})
+
+        self.assertEqual(3, len(index))
+        self.assertEqual(1, index.find((test_file_path, info)))
+
+    def test_update_replaces_file(self) -> None:
+        index = DiagnosticsIndex()
+        index.update(test_file_path, {test_server_name: [row1, row5]})
+        index.update(second_file_path, {test_server_name: [row3]})
+
+        index.update(test_file_path, {test_server_name: [row5]})
+        self.assertEqual(2, len(index))
+        self.assertEqual(-1, index.find((test_file_path, row1)))
+        self.assertEqual(0, index.find((test_file_path, row5)))
+
+        index.update(test_file_path, {})
+        self.assertEqual(1, len(index))
+        self.assertEqual((second_file_path, row3), index.at(0))
+
+    def test_merges_configs(self) -> None:
+        index = DiagnosticsIndex()
+        index.update(test_file_path, {test_server_name: [row5], "other_server": [row1]})
+
+        self.assertEqual((test_file_path, row1), index.at(0))
+        self.assertEqual((test_file_path, row5), index.at(1))
+
+    def test_empty(self) -> None:
+        index = DiagnosticsIndex()
+        self.assertIsNone(index.first(CURSOR_FORWARD))
+        self.assertIsNone(index.next_from_position(test_file_path, Point(0, 0), CURSOR_BACKWARD))
+
+
 class DiagnosticsCursorTest(unittest.TestCase):
 
     def test_empty(self) -> None:
         cursor = DiagnosticsCursor()
 
-        walker = DiagnosticsWalker([cursor.from_position(CURSOR_FORWARD, test_file_path, Point(0, 0))])
-        walker.walk({})
+        cursor.from_position(CURSOR_FORWARD, test_file_path, Point(0, 0))
         self.assertIsNone(cursor.value)
 
     def test_from_no_position(self) -> None:
-        cursor = DiagnosticsCursor()
+        cursor = cursor_for(test_diagnostics)
 
-        walker = DiagnosticsWalker([cursor.from_position(CURSOR_FORWARD)])
-        walker.walk(test_diagnostics)
+        cursor.from_position(CURSOR_FORWARD)
         self.assertEqual((test_file_path, row1), cursor.value)
 
     def test_from_no_position_backwards(self) -> None:
-        cursor = DiagnosticsCursor()
+        cursor = cursor_for(test_diagnostics)
 
-        walker = DiagnosticsWalker([cursor.from_position(CURSOR_BACKWARD)])
-        walker.walk(test_diagnostics)
+        cursor.from_position(CURSOR_BACKWARD)
         self.assertEqual((second_file_path, row3), cursor.value)
 
     def test_from_file_position(self) -> None:
-        cursor = DiagnosticsCursor()
+        cursor = cursor_for(test_diagnostics)
 
-        walker = DiagnosticsWalker([cursor.from_position(CURSOR_FORWARD, test_file_path, Point(0, 0))])
-        walker.walk(test_diagnostics)
+        cursor.from_position(CURSOR_FORWARD, test_file_path, Point(0, 0))
         self.assertEqual((test_file_path, row1), cursor.value)
 
     def test_from_file_position_backward(self) -> None:
-        cursor = DiagnosticsCursor()
+        cursor = cursor_for(test_diagnostics)
 
-        walker = DiagnosticsWalker([cursor.from_position(CURSOR_BACKWARD, test_file_path, Point(10, 0))])
-        walker.walk(test_diagnostics)
+        cursor.from_position(CURSOR_BACKWARD, test_file_path, Point(10, 0))
         self.assertEqual((test_file_path, row5), cursor.value)
 
     def test_from_other_file_position_wrap(self) -> None:
-        cursor = DiagnosticsCursor()
-
-        walker = DiagnosticsWalker([cursor.from_position(CURSOR_FORWARD, second_file_path, Point(5, 0))])
-        walker.walk(test_diagnostics)
+        cursor = cursor_for(test_diagnostics)
 
+        cursor.from_position(CURSOR_FORWARD, second_file_path, Point(5, 0))
         self.assertEqual((test_file_path, row1), cursor.value)
 
     def test_from_file_position_backward_wrap(self) -> None:
-        cursor = DiagnosticsCursor()
+        cursor = cursor_for(test_diagnostics)
 
-        walker = DiagnosticsWalker([cursor.from_position(CURSOR_BACKWARD, test_file_path, Point(0, 0))])
-        walker.walk(test_diagnostics)
+        cursor.from_position(CURSOR_BACKWARD, test_file_path, Point(0, 0))
         self.assertEqual((second_file_path, row3), cursor.value)
 
     def test_from_other_file_position_backwards(self) -> None:
-        cursor = DiagnosticsCursor()
+        cursor = cursor_for(test_diagnostics)
 
-        walker = DiagnosticsWalker([cursor.from_position(CURSOR_BACKWARD, second_file_path, Point(1, 0))])
-        walker.walk(test_diagnostics)
+        cursor.from_position(CURSOR_BACKWARD, second_file_path, Point(1, 0))
         self.assertEqual((test_file_path, row5), cursor.value)
 
     def test_updated_diagnostic_remains(self) -> None:
+        cursor = cursor_for(test_diagnostics)
 
-        cursor = DiagnosticsCursor()
-        walker = DiagnosticsWalker([cursor.from_position(CURSOR_FORWARD)])
-
-        walker.walk(test_diagnostics)
+        cursor.from_position(CURSOR_FORWARD)
         self.assertEqual((test_file_path, row1), cursor.value)
 
-        walker = DiagnosticsWalker([cursor.update()])
-        walker.walk(test_diagnostics)
-
+        cursor.update(test_file_path, {test_server_name: [at_row(1), at_row(7)]})
         self.assertEqual((test_file_path, row1), cursor.value)
 
     def test_updated_diagnostic_gone(self) -> None:
-        cursor = DiagnosticsCursor()
-        walker = DiagnosticsWalker([cursor.from_position(CURSOR_FORWARD)])
+        cursor = cursor_for(test_diagnostics)
 
-        walker.walk(test_diagnostics)
+        cursor.from_position(CURSOR_FORWARD)
         self.assertEqual((test_file_path, row1), cursor.value)
 
-        walker = DiagnosticsWalker([cursor.update()])
-        walker.walk({})
-
+        cursor.update(test_file_path, {})
         self.assertEqual(None, cursor.value)
 
-    def test_from_diagnostic_to_same(self) -> None:
-        cursor = DiagnosticsCursor()
+    def test_other_file_update_keeps_diagnostic(self) -> None:
+        cursor = cursor_for(test_diagnostics)
 
-        diags = diagnostics([row1])
+        cursor.from_position(CURSOR_FORWARD)
+        cursor.update(second_file_path, {})
+        self.assertEqual((test_file_path, row1), cursor.value)
 
-        walker = DiagnosticsWalker([cursor.from_position(CURSOR_FORWARD)])
-        walker.walk(diags)
+    def test_from_diagnostic_to_same(self) -> None:
+        cursor = cursor_for(diagnostics([row1]))
+
+        cursor.from_position(CURSOR_FORWARD)
         self.assertEqual((test_file_path, row1), cursor.value)
 
-        walker = DiagnosticsWalker([cursor.from_diagnostic(CURSOR_FORWARD)])
-        walker.walk(diags)
+        cursor.from_diagnostic(CURSOR_FORWARD)
         self.assertEqual((test_file_path, row1), cursor.value)
 
-        walker = DiagnosticsWalker([cursor.from_diagnostic(CURSOR_BACKWARD)])
-        walker.walk(diags)
+        cursor.from_diagnostic(CURSOR_BACKWARD)
         self.assertEqual((test_file_path, row1), cursor.value)
 
     def test_from_diagnostic_forward(self) -> None:
+        cursor = cursor_for(test_diagnostics)
 
-        cursor = DiagnosticsCursor()
-
-        walker = DiagnosticsWalker([cursor.from_position(CURSOR_FORWARD)])
-        walker.walk(test_diagnostics)
+        cursor.from_position(CURSOR_FORWARD)
         self.assertEqual((test_file_path, row1), cursor.value)
 
-        walker = DiagnosticsWalker([cursor.from_diagnostic(CURSOR_FORWARD)])
-        walker.walk(test_diagnostics)
+        cursor.from_diagnostic(CURSOR_FORWARD)
         self.assertEqual((test_file_path, row5), cursor.value)
 
-        walker = DiagnosticsWalker([cursor.from_diagnostic(CURSOR_FORWARD)])
-        walker.walk(test_diagnostics)
+        cursor.from_diagnostic(CURSOR_FORWARD)
         self.assertEqual((second_file_path, row3), cursor.value)
 
-        walker = DiagnosticsWalker([cursor.from_diagnostic(CURSOR_FORWARD)])
-        walker.walk(test_diagnostics)
+        cursor.from_diagnostic(CURSOR_FORWARD)
         self.assertEqual((test_file_path, row1), cursor.value)
 
     def test_from_diagnostic_backward(self) -> None:
+        cursor = cursor_for(test_diagnostics)
 
-        cursor = DiagnosticsCursor()
-
-        walker = DiagnosticsWalker([cursor.from_position(CURSOR_BACKWARD)])
-        walker.walk(test_diagnostics)
+        cursor.from_position(CURSOR_BACKWARD)
         self.assertEqual((second_file_path, row3), cursor.value)
 
-        walker = DiagnosticsWalker([cursor.from_diagnostic(CURSOR_BACKWARD)])
-        walker.walk(test_diagnostics)
+        cursor.from_diagnostic(CURSOR_BACKWARD)
         self.assertEqual((test_file_path, row5), cursor.value)
 
-        walker = DiagnosticsWalker([cursor.from_diagnostic(CURSOR_BACKWARD)])
-        walker.walk(test_diagnostics)
+        cursor.from_diagnostic(CURSOR_BACKWARD)
         self.assertEqual((test_file_path, row1), cursor.value)
 
-        walker = DiagnosticsWalker([cursor.from_diagnostic(CURSOR_BACKWARD)])
-        walker.walk(test_diagnostics)
+        cursor.from_diagnostic(CURSOR_BACKWARD)
         self.assertEqual((second_file_path, row3), cursor.value)
+
+    def test_from_removed_diagnostic_continues_from_its_position(self) -> None:
+        cursor = cursor_for(test_diagnostics)
+
+        cursor.from_position(CURSOR_FORWARD)
+        cursor.index.update(test_file_path, {test_server_name: [row5]})
+
+        cursor.from_diagnostic(CURSOR_FORWARD)
+        self.assertEqual((test_file_path, row5), cursor.value)
+
+
+class PullingClient(object):
+    def __init__(self) -> None:
+        self.requests = []  # type: List[Tuple[str, Any, Callable]]
+
+    def send_request(self, request: 'Any', handler: 'Callable', error_handler: 'Any' = None) -> None:
+        self.requests.append((request.method, request.params, handler))
+
+    def respond(self, index: int, result: 'Any') -> None:
+        self.requests[index][2](result)
+
+
+def pulling_session(provider: 'Any' = True) -> 'Any':
+    session = mock.Mock()
+    session.config.name = test_server_name
+    session.client = PullingClient()
+    session.has_capability.return_value = True
+    session.get_capability.return_value = provider
+    return session
+
+
+class DiagnosticsPullerTest(unittest.TestCase):
+
+    def test_sends_previous_result_id(self) -> None:
+        ui = mock.Mock()
+        puller = DiagnosticsPuller(DiagnosticsStorage(ui))
+        session = pulling_session()
+        client = session.client
+
+        puller.pull(session, test_file_path)
+        method, params, _ = client.requests[0]
+        self.assertEqual("textDocument/diagnostic", method)
+        self.assertEqual({"textDocument": {"uri": test_file_uri}}, params)
+
+        client.respond(0, {"kind": "full", "resultId": "1", "items": [LSP_MINIMAL_DIAGNOSTIC]})
+        ui.update.assert_called_with(test_file_path, test_server_name, {test_file_path: {
+            test_server_name: [minimal_diagnostic]}})
+
+        puller.pull(session, test_file_path)
+        self.assertEqual("1", client.requests[1][1]["previousResultId"])
+
+        client.respond(1, {"kind": "unchanged", "resultId": "2"})
+        self.assertEqual(1, ui.update.call_count)
+
+        puller.pull(session, test_file_path)
+        self.assertEqual("2", client.requests[2][1]["previousResultId"])
+
+    def test_ignores_outdated_reports(self) -> None:
+        ui = mock.Mock()
+        puller = DiagnosticsPuller(DiagnosticsStorage(ui))
+        session = pulling_session()
+        client = session.client
+
+        puller.pull(session, test_file_path)
+        puller.pull(session, test_file_path)
+        client.respond(1, {"kind": "full", "resultId": "2", "items": []})
+        client.respond(0, {"kind": "full", "resultId": "1", "items": [LSP_MINIMAL_DIAGNOSTIC]})
+
+        self.assertEqual(0, ui.update.call_count)
+        puller.pull(session, test_file_path)
+        self.assertEqual("2", client.requests[2][1]["previousResultId"])
+
+    def test_forgotten_session_reports_are_ignored(self) -> None:
+        ui = mock.Mock()
+        puller = DiagnosticsPuller(DiagnosticsStorage(ui))
+        session = pulling_session()
+        client = session.client
+
+        puller.pull(session, test_file_path)
+        puller.forget_session(test_server_name)
+        self.assertEqual(puller._request_counts, {})
+        restarted = pulling_session()
+        puller.pull(restarted, test_file_path)
+        client.respond(0, {"kind": "full", "resultId": "1", "items": [LSP_MINIMAL_DIAGNOSTIC]})
+        self.assertEqual(0, ui.update.call_count)
+
+        restarted.client.respond(0, {"kind": "full", "resultId": "1", "items": [LSP_MINIMAL_DIAGNOSTIC]})
+        self.assertEqual(1, ui.update.call_count)
+
+    def test_workspace_pull(self) -> None:
+        ui = mock.Mock()
+        puller = DiagnosticsPuller(DiagnosticsStorage(ui))
+        session = pulling_session({"identifier": "lint", "workspaceDiagnostics": True})
+        client = session.client
+        self.assertTrue(puller.supports_workspace(session))
+
+        puller.pull(session, test_file_path)
+        client.respond(0, {"kind": "full", "resultId": "1", "items": []})
+
+        puller.pull_workspace(session)
+        method, params, _ = client.requests[1]
+        self.assertEqual("workspace/diagnostic", method)
+        self.assertEqual({"identifier": "lint", "previousResultIds": [{"uri": test_file_uri, "value": "1"}]}, params)
+
+        client.respond(1, {"items": [
+            {"uri": test_file_uri, "kind": "unchanged", "resultId": "1"},
+            {"uri": second_file_uri, "kind": "full", "resultId": "7", "items": [LSP_MINIMAL_DIAGNOSTIC]}
+        ]})
+        ui.update.assert_called_with(second_file_path, test_server_name, {second_file_path: {
+            test_server_name: [minimal_diagnostic]}})
+
+    def test_stale_documents(self) -> None:
+        puller = DiagnosticsPuller(DiagnosticsStorage(None))
+        session = pulling_session()
+
+        puller.mark_stale(test_server_name, test_file_path)
+        self.assertTrue(puller.is_stale(test_server_name, test_file_path))
+
+        puller.pull(session, test_file_path)
+        self.assertFalse(puller.is_stale(test_server_name, test_file_path))
@@ -0,0 +1,68 @@
+from LSP.plugin import symbols
+from LSP.plugin.core.symbols import DocumentSymbolCache
+from LSP.plugin.symbols import request_document_symbols
+from unittest import mock
+import unittest
+
+try:
+    from typing import Any, Dict, List
+    assert Any and Dict and List
+except ImportError:
+    pass
+
+
+def symbol(name: str) -> 'Dict[str, Any]':
+    symbol_range = {"start": {"line": 0, "character": 0}, "end": {"line": 0, "character": 1}}
+    return {"name": name, "kind": 12, "range": symbol_range, "selectionRange": symbol_range}
+
+
+class FakeWindow(object):
+
+    def __init__(self) -> None:
+        self.messages = []  # type: List[str]
+
+    def status_message(self, message: str) -> None:
+        self.messages.append(message)
+
+
+class FakeView(object):
+
+    def __init__(self) -> None:
+        self.fake_window = FakeWindow()
+
+    def file_name(self) -> str:
+        return "/a.py"
+
+    def change_count(self) -> int:
+        return 1
+
+    def window(self) -> FakeWindow:
+        return self.fake_window
+
+
+class RequestDocumentSymbolsTests(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.client = mock.MagicMock()
+        for patcher in (
+                mock.patch.object(symbols, "client_from_session", return_value=self.client),
+                mock.patch.object(symbols, "session_for_view"),
+                mock.patch.object(symbols, "windows"),
+                mock.patch.object(symbols, "document_symbol_cache", DocumentSymbolCache(10))):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_error_delivers_the_symbols_that_arrived_and_shows_the_error(self) -> None:
+        view = FakeView()
+        delivered = []  # type: List[Any]
+        request_document_symbols(view, delivered.append)  # type: ignore
+        request_document_symbols(view, delivered.append)  # type: ignore
+        self.assertEqual(self.client.send_request.call_count, 1)
+        _, _, handle_error, handle_part = self.client.send_request.call_args[0]
+        handle_part([symbol("first")])
+        handle_error({"code": -32603, "message": "crashed"})
+        self.assertEqual([[entry.name for entry in result.entries] for result in delivered], [["first"], ["first"]])
+        self.assertEqual(view.fake_window.messages, ["command 'textDocument/documentSymbol' failed. Reason: crashed"])
+        # a failed request isn't cached.
+        request_document_symbols(view, delivered.append)  # type: ignore
+        self.assertEqual(self.client.send_request.call_count, 2)
@@ -133,3 +133,33 @@ class WindowDocumentHandlerTests(unittest.TestCase):
             status_configs = status_string.split(", ")
             self.assertIn("test", status_configs)
             self.assertIn("test2", status_configs)
+
+    def test_pulls_diagnostics_for_visible_documents(self):
+        view = MockView(__file__)
+        hidden_view = MockView(__file__ + ".hidden")
+        window = MockWindow([[view]])
+        project_path = "/"
+        folders = [WorkspaceFolder.from_path(project_path)]
+        view.set_window(window)
+        hidden_view.set_window(window)
+        workspace = ProjectFolders(window)
+        handler = WindowDocumentHandler(test_sublime, MockSettings(), window, workspace, MockConfigs())
+        puller = unittest.mock.Mock()
+        puller.is_stale.return_value = True
+        handler.set_diagnostics_puller(puller)
+        client = MockClient()
+        session = self.assert_if_none(
+            create_session(TEST_CONFIG, folders, dict(), MockSettings(),
+                           bootstrap_client=client))
+        handler.add_session(session)
+
+        handler.handle_view_opened(view)
+        puller.pull.assert_called_once_with(session, __file__)
+
+        handler.handle_view_opened(hidden_view)
+        puller.mark_stale.assert_called_once_with(TEST_CONFIG.name, __file__ + ".hidden")
+
+        # once shown, stale documents are pulled
+        window._files_in_groups = [[hidden_view]]
+        handler.handle_view_opened(hidden_view)
+        puller.pull.assert_called_with(session, __file__ + ".hidden")
@@ -1,5 +1,8 @@
+import difflib
 import unittest
+from unittest import mock
 from LSP.plugin.core.edit import sort_by_application_order, parse_workspace_edit, parse_text_edit
+from LSP.plugin.core.edit import minimal_edits, apply_edits, combine_edits, diff_lines, LINE_DIFF_MAX_COST
 from test_protocol import LSP_RANGE
 
 TYPE_CHECKING = False
@@ -67,3 +70,90 @@ class SortByApplicationOrderTests(unittest.TestCase):
         self.assertEqual(sorted_edits[0][2], 'b')
         self.assertEqual(sorted_edits[1][2], 'a')
         self.assertEqual(sorted_edits[2][2], 'c')
+
+
+class MinimalEditsTests(unittest.TestCase):
+
+    def test_whole_document_replacement_is_reduced(self):
+        text = "a = 1\nb = 2\nc = 3\n"
+        edits = minimal_edits(text, [((0, 0), (3, 0), "a = 1\nb = 22\nc = 3\n")])
+        self.assertEqual(edits, [(11, 11, "2")])
+        self.assertEqual(apply_edits(text, edits), "a = 1\nb = 22\nc = 3\n")
+
+    def test_unchanged_replacement_is_dropped(self):
+        text = "a\nb\n"
+        self.assertEqual(minimal_edits(text, [((0, 0), (2, 0), text)]), [])
+
+    def test_merges_adjacent_and_overlapping_edits(self):
+        text = "abcdef"
+        changes = [((0, 1), (0, 3), "XY"), ((0, 3), (0, 4), "Z"), ((0, 2), (0, 5), "Q")]
+        edits = minimal_edits(text, changes)
+        self.assertEqual(len(edits), 1)
+
+    def test_inserts_at_same_position_keep_their_order(self):
+        text = "ab"
+        edits = minimal_edits(text, [((0, 1), (0, 1), "x"), ((0, 1), (0, 1), "y")])
+        self.assertEqual(apply_edits(text, edits), "axyb")
+
+    def test_insert_beyond_document_end_adds_newline(self):
+        text = "a"
+        edits = minimal_edits(text, [((1, 0), (1, 0), "b")])
+        self.assertEqual(apply_edits(text, edits), "a\nb")
+
+    def test_many_edits_are_applied_as_they_are(self):
+        count = 2000
+        text = "x\n" * count
+        changes = [((row, 0), (row, 0), "y\n") for row in range(count)]
+        with mock.patch.object(difflib, "SequenceMatcher") as matcher:
+            edits = minimal_edits(text, changes)
+        self.assertFalse(matcher.called)
+        self.assertEqual(len(edits), count)
+        self.assertEqual(apply_edits(text, edits), "y\nx\n" * count)
+
+    def test_large_reformat_is_diffed_within_the_cost_limit(self):
+        old_lines = [("def f{}(a,b):\n" if i % 3 == 0 else "    return a + {}\n").format(i) for i in range(20000)]
+        new_lines = [line.replace("a,b", "a, b") for line in old_lines]
+        text = "".join(old_lines)
+        costs = []  # type: List[int]
+        sequence_matcher = difflib.SequenceMatcher
+
+        def measured_matcher(junk: 'Any', old: 'List[str]', new: 'List[str]', autojunk: bool) -> 'Any':
+            costs.append(len(old) * len(new))
+            return sequence_matcher(junk, old, new, autojunk=autojunk)
+
+        with mock.patch.object(difflib, "SequenceMatcher", side_effect=measured_matcher):
+            edits = minimal_edits(text, [((0, 0), (20000, 0), "".join(new_lines))])
+        self.assertTrue(all(cost <= LINE_DIFF_MAX_COST for cost in costs))
+        self.assertEqual(apply_edits(text, edits), "".join(new_lines))
+        self.assertEqual(len(edits), len(range(0, 20000, 3)))
+
+    def test_diff_lines_replaces_blocks_too_large_to_compare(self):
+        old_lines = ["a\n"] * 1000
+        new_lines = ["b\n", "a\n"] * 500
+        self.assertEqual(diff_lines(old_lines, new_lines), [(0, 999, 0, 999)])
+
+    def test_diff_lines_matches_unique_lines_first(self):
+        old_lines = ["a\n", "x\n", "b\n", "c\n"]
+        new_lines = ["a\n", "b\n", "y\n", "c\n"]
+        self.assertEqual(diff_lines(old_lines, new_lines), [(1, 2, 1, 1), (3, 3, 2, 3)])
+
+
+class CombineEditsTests(unittest.TestCase):
+
+    def test_joins_separate_edits(self):
+        text = "a b c\n"
+        first = [((0, 0), (0, 1), "x")]
+        second = [((0, 4), (0, 5), "z"), ((0, 2), (0, 2), "y")]
+        edits, dropped = combine_edits(text, [first, second])
+        self.assertEqual(dropped, 0)
+        self.assertEqual(apply_edits(text, minimal_edits(text, edits)), "x yb z\n")
+
+    def test_leaves_out_overlapping_lists(self):
+        text = "abcdef\n"
+        first = [((0, 1), (0, 4), "X")]
+        overlapping = [((0, 5), (0, 6), "Y"), ((0, 3), (0, 5), "Z")]
+        inside = [((0, 2), (0, 2), "W")]
+        touching = [((0, 4), (0, 4), "V")]
+        edits, dropped = combine_edits(text, [first, overlapping, inside, touching])
+        self.assertEqual(dropped, 2)
+        self.assertEqual(apply_edits(text, minimal_edits(text, edits)), "aXVef\n")
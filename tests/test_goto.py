@@ -0,0 +1,108 @@
+from LSP.plugin import goto
+from LSP.plugin.goto import goto_cache, goto_locations, request_goto
+from unittest import mock
+import sublime
+import unittest
+
+try:
+    from typing import Any, Callable, List
+    assert Any and Callable and List
+except ImportError:
+    pass
+
+
+def location(uri: str, row: int, col: int) -> 'Any':
+    return {"uri": uri, "range": {"start": {"line": row, "character": col}, "end": {"line": row, "character": col}}}
+
+
+class GotoLocationsTests(unittest.TestCase):
+
+    def test_converts_locations(self) -> None:
+        self.assertEqual(goto_locations(location("file:///a.py", 1, 4)), [("/a.py", "/a.py:2:5", (2, 5))])
+        self.assertEqual(goto_locations([location("file:///a.py", 0, 0), location("file:///b.py", 3, 2)]),
+                         [("/a.py", "/a.py:1:1", (1, 1)), ("/b.py", "/b.py:4:3", (4, 3))])
+
+    def test_converts_location_links_to_their_selection_range(self) -> None:
+        link = {
+            "targetUri": "file:///a.py",
+            "targetRange": {"start": {"line": 1, "character": 0}, "end": {"line": 9, "character": 0}},
+            "targetSelectionRange": {"start": {"line": 2, "character": 4}, "end": {"line": 2, "character": 8}}
+        }
+        self.assertEqual(goto_locations([link]), [("/a.py", "/a.py:3:5", (3, 5))])
+
+    def test_no_locations(self) -> None:
+        self.assertEqual(goto_locations(None), [])
+        self.assertEqual(goto_locations([]), [])
+
+
+class FakeView(object):
+
+    def __init__(self, buffer_id: int = 1, changes: int = 0) -> None:
+        self._buffer_id = buffer_id
+        self.changes = changes
+
+    def buffer_id(self) -> int:
+        return self._buffer_id
+
+    def file_name(self) -> str:
+        return "/a.py"
+
+    def change_count(self) -> int:
+        return self.changes
+
+    def word(self, point: int) -> sublime.Region:
+        return sublime.Region(point - point % 10, point - point % 10 + 5)
+
+
+class RequestGotoTests(unittest.TestCase):
+
+    def setUp(self) -> None:
+        goto_cache.clear()
+        goto._pending_gotos.clear()
+        self.session = mock.MagicMock()
+        self.session.config.name = "test"
+        for patcher in (
+                mock.patch.object(goto, "session_for_view", return_value=self.session),
+                mock.patch.object(goto, "get_document_position", return_value={"position": {}})):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def request(self, view: FakeView, point: int) -> 'List[Any]':
+        delivered = []  # type: List[Any]
+        self.assertTrue(request_goto(view, point, "definition", delivered.append))  # type: ignore
+        return delivered
+
+    def respond(self, response: 'Any') -> None:
+        self.session.client.send_request.call_args[0][1](response)
+
+    def test_requests_of_the_same_word_share_a_response(self) -> None:
+        view = FakeView()
+        first = self.request(view, 1)
+        second = self.request(view, 3)
+        self.assertEqual(self.session.client.send_request.call_count, 1)
+        self.respond(location("file:///b.py", 0, 0))
+        self.assertEqual(first, second)
+        self.assertEqual(first, [[("/b.py", "/b.py:1:1", (1, 1))]])
+
+    def test_caches_locations_per_buffer_and_version(self) -> None:
+        self.request(FakeView(), 1)
+        self.respond(location("file:///b.py", 0, 0))
+        self.assertEqual(self.request(FakeView(), 2), [[("/b.py", "/b.py:1:1", (1, 1))]])
+        self.assertEqual(self.session.client.send_request.call_count, 1)
+        # another buffer, or the same one once edited, asks the server again.
+        self.request(FakeView(buffer_id=2), 1)
+        self.request(FakeView(changes=1), 1)
+        self.assertEqual(self.session.client.send_request.call_count, 3)
+
+    def test_does_not_cache_an_empty_response(self) -> None:
+        self.assertEqual(self.request(FakeView(), 1), [])
+        self.respond([])
+        self.request(FakeView(), 1)
+        self.assertEqual(self.session.client.send_request.call_count, 2)
+
+    def test_does_not_cache_locations_that_arrive_after_an_edit(self) -> None:
+        self.request(FakeView(), 1)
+        with mock.patch.object(goto, "_edits", goto._edits + 1):
+            self.respond(location("file:///b.py", 0, 0))
+        self.request(FakeView(), 1)
+        self.assertEqual(self.session.client.send_request.call_count, 2)
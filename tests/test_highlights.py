@@ -0,0 +1,80 @@
+from LSP.plugin import highlights
+from LSP.plugin.highlights import DocumentHighlightListener
+from unittest import mock
+import sublime
+import unittest
+
+try:
+    from typing import List
+    assert List
+except ImportError:
+    pass
+
+
+def highlight(row: int, start: int, end: int) -> dict:
+    return {"range": {"start": {"line": row, "character": start}, "end": {"line": row, "character": end}}, "kind": 1}
+
+
+class FakeView(object):
+    """ A view with rows of 100 characters and a single caret """
+
+    def __init__(self) -> None:
+        self.changes = 0
+        self.caret = 0
+
+    def change_count(self) -> int:
+        return self.changes
+
+    def sel(self) -> 'List[sublime.Region]':
+        return [sublime.Region(self.caret)]
+
+    def rowcol(self, point: int) -> tuple:
+        return divmod(point, 100)
+
+
+class CaretInsideHighlightTests(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.view = FakeView()
+        patches = [
+            mock.patch.object(highlights, "viewport_regions"),
+            mock.patch.object(highlights.sublime, "set_timeout_async", create=True)
+        ]
+        self.regions, self.set_timeout_async = [patch.start() for patch in patches]
+        for patch in patches:
+            self.addCleanup(patch.stop)
+        self.listener = DocumentHighlightListener(self.view)  # type: ignore
+        self.listener.view = self.view  # type: ignore
+        # the caret is on "name" in row 1 and the server highlighted it there and in row 3.
+        self.view.caret = 102
+        self.listener._stored_point = 102
+        self.listener._handle_response([highlight(1, 0, 4), highlight(3, 10, 14)], 0)
+        self.regions.reset_mock()
+
+    def move(self, point: int) -> None:
+        self.view.caret = point
+        self.listener._queue()
+
+    def test_moving_within_a_highlight_keeps_it(self):
+        self.move(104)
+        self.move(312)
+        self.assertFalse(self.regions.return_value.erase.called)
+        self.assertFalse(self.set_timeout_async.called)
+
+    def test_moving_out_of_the_highlights_requests_again(self):
+        self.move(150)
+        self.assertTrue(self.regions.return_value.erase.called)
+        self.assertTrue(self.set_timeout_async.called)
+
+    def test_highlights_are_outdated_after_an_edit(self):
+        self.view.changes += 1
+        self.move(104)
+        self.assertTrue(self.regions.return_value.erase.called)
+        self.assertTrue(self.set_timeout_async.called)
+
+    def test_response_for_an_older_version_is_not_kept(self):
+        self.view.changes += 1
+        self.listener._handle_response([highlight(5, 0, 4)], 0)
+        self.set_timeout_async.reset_mock()
+        self.move(502)
+        self.assertTrue(self.set_timeout_async.called)
@@ -0,0 +1,124 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from LSP.plugin.core.lines import LinesReader, read_lines, read_lines_of_files
+
+try:
+    from typing import Dict, List, Optional, Tuple
+    assert Dict and List and Optional and Tuple
+except ImportError:
+    pass
+
+
+class ReadLinesTests(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.directory)
+
+    def write(self, name: str, content: bytes) -> str:
+        file_path = os.path.join(self.directory, name)
+        with open(file_path, 'wb') as file:
+            file.write(content)
+        return file_path
+
+    def test_reads_requested_rows_stripped(self) -> None:
+        file_path = self.write('a.py', b'zero\n  one  \r\ntwo\nthree')
+        self.assertEqual(read_lines(file_path, [3, 1, 1]), {1: 'one', 3: 'three'})
+
+    def test_leaves_out_missing_rows(self) -> None:
+        file_path = self.write('a.py', b'zero\none\n')
+        self.assertEqual(read_lines(file_path, [0, 2, 5]), {0: 'zero', 2: ''})
+
+    def test_empty_and_missing_files(self) -> None:
+        self.assertEqual(read_lines(self.write('empty.py', b''), [0]), {})
+        self.assertEqual(read_lines(os.path.join(self.directory, 'missing.py'), [0]), {})
+
+    def test_decodes_utf8(self) -> None:
+        file_path = self.write('a.py', 'café\n'.encode('utf-8'))
+        self.assertEqual(read_lines(file_path, [0]), {0: 'café'})
+
+
+class ReadLinesOfFilesTests(unittest.TestCase):
+
+    def test_delivers_in_order(self) -> None:
+        release_first = threading.Event()
+        delivered = []  # type: List[Tuple[int, Dict[int, str]]]
+        done = threading.Event()
+
+        def read(file_path: str, rows: 'List[int]') -> 'Dict[int, str]':
+            if file_path == 'first':
+                release_first.wait(5)
+            return {row: file_path for row in rows}
+
+        def on_file_read(index: int, lines: 'Dict[int, str]') -> None:
+            delivered.append((index, lines))
+            if index == 2:
+                done.set()
+
+        read_lines_of_files([('first', [0]), ('second', [1]), ('third', [2])], on_file_read, read)
+        self.assertEqual(delivered, [])
+        release_first.set()
+        self.assertTrue(done.wait(5))
+        self.assertEqual(delivered, [(0, {0: 'first'}), (1, {1: 'second'}), (2, {2: 'third'})])
+
+    def test_reader_delivers_batches_in_order_and_closes(self) -> None:
+        release_first = threading.Event()
+        delivered = []  # type: List[int]
+        closed = threading.Event()
+
+        def read(file_path: str, rows: 'List[int]') -> 'Dict[int, str]':
+            if file_path == 'first':
+                release_first.wait(5)
+            return {}
+
+        reader = LinesReader(lambda index, lines: delivered.append(index), read)
+        reader.read([('first', [0])])
+        reader.read([('second', [0]), ('third', [0])])
+        reader.close(closed.set)
+        self.assertFalse(closed.is_set())
+        release_first.set()
+        self.assertTrue(closed.wait(5))
+        self.assertEqual(delivered, [0, 1, 2])
+
+    def test_reader_closes_right_away_when_everything_is_delivered(self) -> None:
+        closed = []  # type: List[bool]
+        LinesReader(lambda index, lines: None).close(lambda: closed.append(True))
+        self.assertEqual(closed, [True])
+
+    def test_reader_delivers_files_that_failed_to_read(self) -> None:
+        delivered = []  # type: List[Tuple[int, Dict[int, str]]]
+        closed = threading.Event()
+
+        def read(file_path: str, rows: 'List[int]') -> 'Dict[int, str]':
+            if file_path == 'broken':
+                raise ValueError(file_path)
+            return {row: file_path for row in rows}
+
+        reader = LinesReader(lambda index, lines: delivered.append((index, lines)), read)
+        reader.read([('first', [0]), ('broken', [1]), ('third', [2])])
+        reader.close(closed.set)
+        self.assertTrue(closed.wait(5))
+        self.assertEqual(delivered, [(0, {0: 'first'}), (1, {}), (2, {2: 'third'})])
+
+    def test_reader_calls_back_outside_the_lock(self) -> None:
+        delivered = []  # type: List[int]
+        closed = threading.Event()
+        reader = None  # type: Optional[LinesReader]
+
+        def on_file_read(index: int, lines: 'Dict[int, str]') -> None:
+            delivered.append(index)
+            if index == 0:
+                # adding files from the callback, as a request handler would, must not deadlock.
+                assert reader
+                reader.read([('second', [0])])
+                reader.close(closed.set)
+
+        reader = LinesReader(on_file_read, lambda file_path, rows: {})
+        reader.read([('first', [0])])
+        self.assertTrue(closed.wait(5))
+        self.assertEqual(delivered, [0, 1])
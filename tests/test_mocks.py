@@ -257,6 +257,9 @@ class MockDocuments(object):
     def remove_session(self, config_name: str) -> None:
         del self._sessions[config_name]
 
+    def close_documents(self, session: 'Session') -> None:
+        pass
+
     def handle_view_opened(self, view: ViewLike):
         file_name = view.file_name()
         if file_name:
@@ -280,6 +283,12 @@ class MockDocuments(object):
     def has_document_state(self, file_name: str) -> bool:
         return file_name in self._documents
 
+    def refresh_diagnostics(self, session: 'Session') -> None:
+        pass
+
+    def set_diagnostics_puller(self, diagnostics_puller: 'Any') -> None:
+        pass
+
 
 class TestDocumentHandlerFactory(object):
     def for_window(self, window, workspace, configs):
@@ -292,7 +301,8 @@ class MockClient():
         self._notifications = []  # type: List[Notification]
         self._async_response_callback = async_response
 
-    def send_request(self, request: Request, on_success: 'Callable', on_error: 'Callable' = None) -> None:
+    def send_request(self, request: Request, on_success: 'Callable', on_error: 'Callable' = None,
+                     on_partial: 'Callable' = None) -> None:
         response = self.responses.get(request.method)
         debug("TEST: responding to", request.method, "with", response)
         if self._async_response_callback:
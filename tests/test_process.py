@@ -1,14 +1,15 @@
-from LSP.plugin.core.process import log_stream
+from LSP.plugin.core.process import log_stream, MAX_STANDBY_PROCESSES, StandbyProcesses
 from io import BytesIO
 from subprocess import Popen
 from unittest import TestCase
 from unittest.mock import MagicMock
 import os
+import time
 
 try:
-    from typing import Iterator
+    from typing import Callable, Dict, Iterator, List
     from typing import Tuple
-    assert Iterator and Tuple
+    assert Callable and Dict and Iterator and List and Tuple
 except ImportError:
     pass
 
@@ -28,3 +29,98 @@ class ProcessTests(TestCase):
 
         log_stream(process, BytesIO(text.encode(encoding)), log_callback)
         self.assertEqual(message.strip(), text)
+
+
+class StandbyProcessesTests(TestCase):
+
+    def setUp(self) -> None:
+        self.started = []  # type: List[MagicMock]
+        self.standbys = StandbyProcesses(self.start)
+
+    def tearDown(self) -> None:
+        self.standbys.clear()
+
+    def start(self, args: 'List[str]', working_dir: str, env: 'Dict[str, str]',
+              on_stderr_log: 'Callable[[str], None]') -> MagicMock:
+        process = MagicMock()
+        process.poll.return_value = None
+        process.on_stderr_log = on_stderr_log
+        self.started.append(process)
+        return process
+
+    def wait_for_standby(self) -> None:
+        deadline = time.time() + 5
+        while not len(self.standbys) and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(len(self.standbys), 1)
+
+    def test_takes_standby_started_for_the_same_command_line(self):
+        self.assertIsNone(self.standbys.take("test", ["server"], "/project", {}, None))
+        self.wait_for_standby()
+        standby = self.started[0]
+        messages = []  # type: List[str]
+        self.assertIs(self.standbys.take("test", ["server"], "/project", {}, messages.append), standby)
+        standby.on_stderr_log("ready")
+        self.assertEqual(messages, ["ready"])
+        self.wait_for_standby()
+        self.assertEqual(len(self.started), 2)
+
+    def test_other_command_line_starts_its_own_standby(self):
+        self.standbys.take("test", ["server"], "/project", {}, None)
+        self.wait_for_standby()
+        self.assertIsNone(self.standbys.take("test", ["server"], "/other", {}, None))
+
+    def test_skips_exited_standby(self):
+        self.standbys.take("test", ["server"], "/project", {}, None)
+        self.wait_for_standby()
+        self.started[0].poll.return_value = 1
+        self.assertIsNone(self.standbys.take("test", ["server"], "/project", {}, None))
+
+    def test_clear_terminates_standbys(self):
+        self.standbys.take("test", ["server"], "/project", {}, None)
+        self.wait_for_standby()
+        self.standbys.clear()
+        self.assertEqual(len(self.standbys), 0)
+        self.started[0].terminate.assert_called_once_with()
+
+    def test_release_terminates_standby_after_the_last_session(self):
+        self.standbys = StandbyProcesses(self.start, release_delay=0.05)
+        self.standbys.take("test", ["server"], "/project", {}, None)
+        self.standbys.take("test", ["server"], "/project", {}, None)
+        self.wait_for_standby()
+        standby = self.started[-1]
+        self.standbys.release("test", ["server"], "/project", {})
+        self.assertEqual(len(self.standbys), 1)
+        self.standbys.release("test", ["server"], "/project", {})
+        deadline = time.time() + 5
+        while len(self.standbys) and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(len(self.standbys), 0)
+        standby.terminate.assert_called_once_with()
+
+    def test_restart_takes_the_standby_released_by_the_last_session(self):
+        self.standbys.take("test", ["server"], "/project", {}, None)
+        self.wait_for_standby()
+        standby = self.started[-1]
+        self.standbys.release("test", ["server"], "/project", {})
+        self.assertIs(self.standbys.take("test", ["server"], "/project", {}, None), standby)
+        self.assertFalse(standby.terminate.called)
+
+    def test_keeps_at_most_max_standby_processes(self):
+        for folder in range(MAX_STANDBY_PROCESSES + 1):
+            self.standbys.take("test", ["server"], "/project{}".format(folder), {}, None)
+            deadline = time.time() + 5
+            while len(self.started) <= folder and time.time() < deadline:
+                time.sleep(0.01)
+        deadline = time.time() + 5
+        while not self.started[0].terminate.called and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(len(self.standbys), MAX_STANDBY_PROCESSES)
+        self.started[0].terminate.assert_called_once_with()
+
+    def test_prune_terminates_standbys_of_other_configs(self):
+        self.standbys.take("test", ["server"], "/project", {}, None)
+        self.wait_for_standby()
+        self.standbys.prune(["other"])
+        self.assertEqual(len(self.standbys), 0)
+        self.started[0].terminate.assert_called_once_with()
@@ -72,6 +72,13 @@ class RequestTests(unittest.TestCase):
         self.assertEqual(payload["method"], "initialize")
         self.assertEqual(payload["params"], {"param": 1})
 
+    def test_partial_result_token(self):
+        params = {"query": "foo"}
+        self.assertNotIn("partialResultToken", Request.workspaceSymbol(params).to_payload(1)["params"])
+        payload = Request.workspaceSymbol(params, "token").to_payload(1)
+        self.assertEqual(payload["params"], {"query": "foo", "partialResultToken": "token"})
+        self.assertEqual(params, {"query": "foo"})
+
 
 class NotificationTests(unittest.TestCase):
 
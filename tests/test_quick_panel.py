@@ -0,0 +1,69 @@
+from LSP.plugin import symbols
+from LSP.plugin.symbols import StreamingQuickPanel
+from unittest import mock
+import unittest
+
+try:
+    from typing import Any, Callable, List
+    assert Any and Callable and List
+except ImportError:
+    pass
+
+
+class FakeWindow(object):
+
+    def __init__(self) -> None:
+        self.panels = []  # type: List[Any]
+
+    def status_message(self, message: str) -> None:
+        pass
+
+    def show_quick_panel(self, items: 'List[Any]', on_select: 'Callable[[int], None]', flags: int,
+                         selected_index: int, on_highlight: 'Callable[[int], None]') -> None:
+        if self.panels:
+            # showing a panel cancels the open one.
+            self.panels[-1][1](-1)
+        self.panels.append((items, on_select, selected_index, on_highlight))
+
+
+class StreamingQuickPanelTests(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.window = FakeWindow()
+        self.selected = []  # type: List[int]
+        self.panel = StreamingQuickPanel(self.window, self.selected.append)  # type: ignore
+        self.show_later = []  # type: List[Callable[[], None]]
+        patcher = mock.patch.object(symbols.sublime, "set_timeout",
+                                    side_effect=lambda f, delay=0: f() if not delay else self.show_later.append(f),
+                                    create=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_shows_once_when_all_results_arrived_in_time(self) -> None:
+        self.panel.add(["a"])
+        self.panel.add(["b"])
+        self.panel.complete()
+        self.show_later[0]()
+        self.assertEqual([panel[0] for panel in self.window.panels], [["a", "b"]])
+
+    def test_shows_late_results_again_keeping_the_highlighted_item(self) -> None:
+        self.panel.add(["a", "b"])
+        self.show_later[0]()
+        self.window.panels[0][3](1)
+        self.panel.add(["c"])
+        self.panel.complete()
+        self.assertEqual(len(self.window.panels), 2)
+        items, on_select, selected_index, _ = self.window.panels[1]
+        self.assertEqual((items, selected_index), (["a", "b", "c"], 1))
+        self.assertEqual(self.selected, [])
+        on_select(2)
+        self.assertEqual(self.selected, [2])
+
+    def test_does_not_show_again_once_closed(self) -> None:
+        self.panel.add(["a"])
+        self.show_later[0]()
+        self.window.panels[0][1](-1)
+        self.panel.add(["b"])
+        self.panel.complete()
+        self.assertEqual(len(self.window.panels), 1)
+        self.assertEqual(self.selected, [-1])
@@ -0,0 +1,79 @@
+from LSP.plugin import references
+from LSP.plugin.references import LspSymbolReferencesCommand
+from unittest import mock
+import threading
+import unittest
+
+try:
+    from typing import Any, List
+    assert Any and List
+except ImportError:
+    pass
+
+
+def reference(file_path: str, row: int) -> 'Any':
+    return {"uri": "file://" + file_path, "range": {"start": {"line": row, "character": 0}}}
+
+
+class FakeWindow(object):
+
+    def __init__(self) -> None:
+        self.panels = []  # type: List[List[List[str]]]
+        self.shown = threading.Event()
+
+    def find_open_file(self, file_path: str) -> None:
+        return None
+
+    def show_quick_panel(self, items: 'List[List[str]]', *args: 'Any') -> None:
+        self.panels.append(items)
+        self.shown.set()
+
+    def status_message(self, message: str) -> None:
+        pass
+
+
+class FakeView(object):
+
+    def __init__(self) -> None:
+        self.fake_window = FakeWindow()
+
+    def window(self) -> FakeWindow:
+        return self.fake_window
+
+    def file_name(self) -> str:
+        return "/project/a.py"
+
+    def word(self, point: int) -> int:
+        return point
+
+    def substr(self, region: int) -> str:
+        return "word"
+
+
+class ReferencesRequestTests(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.view = FakeView()
+        self.command = LspSymbolReferencesCommand(self.view)  # type: ignore
+        self.client = mock.MagicMock()
+        for patcher in (
+                mock.patch.object(self.command, "client_with_capability", return_value=self.client),
+                mock.patch.object(references, "windows"),
+                mock.patch.object(references, "get_position", return_value=0),
+                mock.patch.object(references, "get_document_position", return_value={"position": {}}),
+                mock.patch.object(references, "read_lines", side_effect=lambda path, rows: {0: path}),
+                mock.patch.object(references.settings, "show_references_in_quick_panel", True)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        references.windows.lookup.return_value.get_project_path.return_value = None
+
+    def test_drops_the_responses_of_earlier_requests(self) -> None:
+        self.command.run(None)  # type: ignore
+        self.command.run(None)  # type: ignore
+        (_, first_response, _, first_part), (_, second_response, _, _) = [
+            call[0] for call in self.client.send_request.call_args_list]
+        first_part([reference("/project/old.py", 0)])
+        first_response([reference("/project/old.py", 0)])
+        second_response([reference("/project/new.py", 0)])
+        self.assertTrue(self.view.fake_window.shown.wait(5))
+        self.assertEqual(self.view.fake_window.panels, [[["/project/new.py:1:1", "/project/new.py"]]])
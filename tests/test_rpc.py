@@ -151,6 +151,42 @@ class ClientTest(unittest.TestCase):
         self.assertEqual(len(pings), 1)
         self.assertEqual(pings[0][0], 42)
 
+    def test_partial_results(self):
+        transport = MockTransport()
+        client = Client(transport, MockSettings())
+        progress = []  # type: List[Any]
+        client.on_notification("$/progress", lambda params: progress.append(params))
+        partials = []  # type: List[Any]
+        responses = []  # type: List[Any]
+        req = Request.workspaceSymbol({"query": "foo"})
+        client.send_request(req, lambda resp: responses.append(resp), None, lambda part: partials.append(part))
+        sent = json.loads(transport.messages[0])
+        token = sent["params"]["partialResultToken"]
+        self.assertEqual(sent["params"]["query"], "foo")
+        transport.receive(json.dumps({"method": "$/progress", "params": {"token": token, "value": [1, 2]}}))
+        transport.receive(json.dumps({"method": "$/progress", "params": {"token": "other", "value": {}}}))
+        transport.receive(json.dumps({"method": "$/progress", "params": {"token": token, "value": [3]}}))
+        transport.receive(json.dumps({"id": sent["id"], "result": []}))
+        self.assertEqual(partials, [[1, 2], [3]])
+        self.assertEqual(responses, [[]])
+        # progress of other tokens still reaches the notification handler.
+        self.assertEqual(progress, [{"token": "other", "value": {}}])
+        self.assertEqual(len(client._partial_result_handlers), 0)
+        self.assertEqual(len(client._partial_result_tokens), 0)
+
+    def test_cancel_request(self):
+        transport = MockTransport()
+        client = Client(transport, MockSettings())
+        responses = []  # type: List[Any]
+        request_id = client.send_request(Request.workspaceSymbol({"query": "foo"}), lambda r: responses.append(r))
+        self.assertIsNotNone(request_id)
+        client.cancel_request(request_id)
+        self.assertEqual(json.loads(transport.messages[-1]),
+                         {"jsonrpc": "2.0", "method": "$/cancelRequest", "params": {"id": request_id}})
+        transport.receive(json.dumps({"id": request_id, "error": {"code": -32800, "message": "cancelled"}}))
+        self.assertEqual(responses, [])
+        self.assertEqual(len(client._response_handlers), 0)
+
     def test_error_response_handler(self):
         transport = MockTransport(return_error)
         settings = MockSettings()
@@ -0,0 +1,156 @@
+from LSP.plugin.core.diagnostics import DiagnosticsStorage
+from LSP.plugin.core.session_pool import SessionPool, session_key
+from LSP.plugin.core.sessions import create_session
+from LSP.plugin.core.sessions import Session
+from LSP.plugin.core.types import ClientConfig, ClientStates
+from LSP.plugin.core.windows import WindowManager
+from LSP.plugin.core.workspace import ProjectFolders
+from test_mocks import MockClient
+from test_mocks import MockConfigs
+from test_mocks import MockDocuments
+from test_mocks import MockHandlerDispatcher
+from test_mocks import MockSettings
+from test_mocks import MockView
+from test_mocks import MockWindow
+from test_mocks import TEST_CONFIG
+import os
+import test_sublime
+import unittest
+
+from LSP.plugin.core.protocol import WorkspaceFolder
+
+try:
+    from typing import Any, Callable, Dict, List, Optional, Tuple
+    assert Any and Callable and Dict and List and Optional and Tuple and WorkspaceFolder and ClientConfig
+except ImportError:
+    pass
+
+
+class RecordingClient(MockClient):
+    def __init__(self) -> None:
+        super().__init__()
+        self.notification_handlers = {}  # type: Dict[str, Callable]
+
+    def on_notification(self, name, handler: 'Callable') -> None:
+        self.notification_handlers[name] = handler
+
+
+class SessionPoolTests(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.pool = SessionPool()
+        self.clients = []  # type: List[RecordingClient]
+
+    def start_session(self, window: MockWindow, workspace_folders: 'List[WorkspaceFolder]', config: ClientConfig,
+                      on_pre_initialize: 'Callable[[Session], None]', on_post_initialize: 'Callable[[Session], None]',
+                      on_post_exit: 'Callable[[str], None]',
+                      on_stderr_log: 'Optional[Callable[[str], None]]') -> 'Optional[Session]':
+        client = RecordingClient()
+        self.clients.append(client)
+        return create_session(
+            config=TEST_CONFIG,
+            workspace_folders=workspace_folders,
+            env=dict(),
+            settings=MockSettings(),
+            bootstrap_client=client,
+            on_pre_initialize=on_pre_initialize,
+            on_post_initialize=on_post_initialize,
+            on_post_exit=on_post_exit,
+            on_stderr_log=on_stderr_log)
+
+    def make(self, folders: 'List[str]') -> 'Tuple[MockWindow, WindowManager]':
+        window = MockWindow([[MockView(__file__)]], folders=folders)
+        wm = WindowManager(
+            window=window,
+            workspace=ProjectFolders(window),
+            settings=MockSettings(),
+            configs=MockConfigs(),
+            documents=MockDocuments(),
+            diagnostics=DiagnosticsStorage(None),
+            session_starter=self.start_session,
+            sublime=test_sublime,
+            handler_dispatcher=MockHandlerDispatcher(),
+            session_pool=self.pool)
+        wm.start_active_views()
+        return window, wm
+
+    def close(self, window: MockWindow, wm: WindowManager) -> None:
+        window.close()
+        wm.handle_view_closed(MockView(__file__))
+        test_sublime._run_timeout()
+
+    def test_windows_with_same_folders_share_a_session(self):
+        folder = os.path.dirname(__file__)
+        _, first = self.make([folder])
+        _, second = self.make([folder])
+        session = first.get_session(TEST_CONFIG.name, __file__)
+        self.assertIsNotNone(session)
+        self.assertIs(second.get_session(TEST_CONFIG.name, __file__), session)
+        self.assertEqual(len(self.clients), 1)
+
+    def test_windows_with_other_folders_get_their_own_session(self):
+        _, first = self.make([os.path.dirname(__file__)])
+        _, second = self.make([os.path.dirname(os.path.dirname(__file__))])
+        self.assertIsNot(first.get_session(TEST_CONFIG.name, __file__),
+                         second.get_session(TEST_CONFIG.name, __file__))
+        self.assertEqual(len(self.clients), 2)
+
+    def test_configs_that_differ_get_their_own_session(self):
+        folders = [WorkspaceFolder.from_path(os.path.dirname(__file__))]
+
+        def config(**overrides: 'Any') -> ClientConfig:
+            args = dict(name="test", binary_args=["server"], tcp_port=None, languageId="test", env={"A": "1"},
+                        settings={"b": 1}, init_options={"c": 1})
+            args.update(overrides)
+            return ClientConfig(**args)
+
+        key = session_key(config(), folders)
+        self.assertEqual(session_key(config(), folders), key)
+        self.assertNotEqual(session_key(config(binary_args=["server", "--other"]), folders), key)
+        self.assertNotEqual(session_key(config(env={"A": "2"}), folders), key)
+        self.assertNotEqual(session_key(config(settings={"b": 2}), folders), key)
+        self.assertNotEqual(session_key(config(init_options={"c": 2}), folders), key)
+
+    def test_session_ends_with_the_last_window(self):
+        folder = os.path.dirname(__file__)
+        first_window, first = self.make([folder])
+        second_window, second = self.make([folder])
+        session = second.get_session(TEST_CONFIG.name, __file__)
+        assert session
+
+        self.close(first_window, first)
+        self.assertEqual(len(first._sessions), 0)
+        self.assertEqual(session.state, ClientStates.READY)
+        self.assertIs(second.get_session(TEST_CONFIG.name, __file__), session)
+
+        self.close(second_window, second)
+        self.assertEqual(len(second._sessions), 0)
+        self.assertEqual(session.state, ClientStates.STOPPING)
+
+    def test_notifications_reach_all_windows(self):
+        folder = os.path.dirname(__file__)
+        first_window, first = self.make([folder])
+        _, second = self.make([folder])
+        messages = []  # type: List[Tuple[str, Any]]
+        setattr(first, "_handle_log_message", lambda name, params: messages.append(("first", params)))
+        setattr(second, "_handle_log_message", lambda name, params: messages.append(("second", params)))
+        self.clients[0].notification_handlers["window/logMessage"]({"message": "hello"})
+        self.assertEqual(sorted(window for window, _ in messages), ["first", "second"])
+
+        self.close(first_window, first)
+        messages.clear()
+        self.clients[0].notification_handlers["window/logMessage"]({"message": "hello"})
+        self.assertEqual([window for window, _ in messages], ["second"])
+
+    def test_restart_ends_the_session_for_all_windows(self):
+        folder = os.path.dirname(__file__)
+        _, first = self.make([folder])
+        _, second = self.make([folder])
+        session = first.get_session(TEST_CONFIG.name, __file__)
+        first.restart_sessions()
+        test_sublime._run_timeout()
+        restarted = first.get_session(TEST_CONFIG.name, __file__)
+        self.assertIsNotNone(restarted)
+        self.assertIsNot(restarted, session)
+        self.assertIs(second.get_session(TEST_CONFIG.name, __file__), restarted)
+        self.assertEqual(len(self.clients), 2)
@@ -0,0 +1,98 @@
+from LSP.plugin.core.symbol_index import SymbolIndex, entries_of_symbol_information
+import os
+import shutil
+import tempfile
+import unittest
+
+
+def names(symbols: list) -> list:
+    return [symbol["name"] for symbol in symbols]
+
+
+class SymbolIndexTests(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.index = SymbolIndex(None)
+        self.index.set_file("/p/a.py", 1.0, [("getLine", 12, "View", 3, 4), ("setLine", 12, "View", 5, 4)])
+        self.index.set_file("/p/b.py", 2.0, [("get", 12, "", 1, 0), ("LineGetter", 5, "", 9, 6)])
+        self.index.rebuild()
+
+    def test_prefix_matches_first_then_fuzzy(self) -> None:
+        self.assertEqual(names(self.index.query("get", 10)), ["get", "getLine", "LineGetter"])
+        self.assertEqual(names(self.index.query("gL", 10)), ["getLine"])
+        self.assertEqual(names(self.index.query("get", 1)), ["get"])
+        self.assertEqual(self.index.query("xyz", 10), [])
+
+    def test_returns_symbol_information(self) -> None:
+        symbol = self.index.query("getL", 1)[0]
+        self.assertEqual(symbol["kind"], 12)
+        self.assertEqual(symbol["containerName"], "View")
+        self.assertEqual(symbol["location"]["range"]["start"], {"line": 3, "character": 4})
+        self.assertTrue(symbol["location"]["uri"].endswith("/p/a.py"))
+
+    def test_queries_snapshot_until_rebuilt(self) -> None:
+        self.index.remove_file("/p/b.py")
+        self.assertEqual(names(self.index.query("get", 10)), ["get", "getLine", "LineGetter"])
+        self.index.rebuild()
+        self.assertEqual(names(self.index.query("get", 10)), ["getLine"])
+
+    def test_merge_keeps_symbols_of_same_version_only(self) -> None:
+        self.index.merge_symbols("/p/a.py", 1.0, [("getLine", 12, "View", 3, 4), ("other", 12, "", 7, 0)])
+        self.index.merge_symbols("/p/b.py", 3.0, [("fresh", 12, "", 1, 0)])
+        self.index.rebuild()
+        self.assertEqual(len(self.index), 4)
+        self.assertEqual(self.index.mtime("/p/b.py"), 3.0)
+        self.assertEqual(names(self.index.query("o", 10)), ["other"])
+        self.assertEqual(names(self.index.query("get", 10)), ["getLine"])
+
+    def test_save_and_load(self) -> None:
+        directory = tempfile.mkdtemp()
+        try:
+            self.index.path = os.path.join(directory, "index", "symbols")
+            self.index.save()
+            self.assertFalse(self.index.is_modified())
+            loaded = SymbolIndex(self.index.path)
+            # files indexed before the saved index is loaded keep their symbols
+            loaded.set_file("/p/b.py", 5.0, [])
+            loaded.load()
+            loaded.rebuild()
+            self.assertEqual(loaded.mtime("/p/a.py"), 1.0)
+            self.assertEqual(loaded.mtime("/p/b.py"), 5.0)
+            self.assertEqual(names(loaded.query("get", 10)), ["getLine"])
+        finally:
+            shutil.rmtree(directory)
+
+    def test_entries_of_symbol_information(self) -> None:
+        start = {"line": 1, "character": 2}
+        location = {"uri": "file:///p/a.py", "range": {"start": start, "end": start}}
+        symbol = {"name": "foo", "kind": 12, "location": location}
+        self.assertEqual(entries_of_symbol_information([symbol]), {"file:///p/a.py": [("foo", 12, "", 1, 2)]})
+
+
+def generated_index(file_count: int, symbols_per_file: int) -> SymbolIndex:
+    """ An index of names made of common words, like getLineFile0 """
+    words = ["get", "set", "line", "file", "symbol", "index", "parse", "read", "write", "cache", "view", "range"]
+    index = SymbolIndex(None)
+    for file_number in range(file_count):
+        entries = []
+        for number in range(symbols_per_file):
+            name = words[number % 12] + words[(file_number + number) % 11].capitalize() + \
+                words[file_number % 7].capitalize() + str(number)
+            entries.append((name, 12, "", number, 0))
+        index.set_file("/p/f{}.py".format(file_number), 1.0, entries)
+    index.rebuild()
+    return index
+
+
+class GeneratedSymbolIndexTests(unittest.TestCase):
+
+    def test_queries_many_files(self) -> None:
+        index = generated_index(100, 24)
+        self.assertEqual(len(index), 2400)
+        symbols = index.query("getLineFile0", 3)
+        self.assertEqual(names(symbols), ["getLineFile0"])
+        self.assertTrue(symbols[0]["location"]["uri"].endswith("/p/f24.py"))
+        self.assertTrue(names(index.query("gLF", 1))[0].startswith("getLineFile"))
+        self.assertTrue(all(name.startswith("symbol") for name in names(index.query("symbol", 100))))
+        self.assertEqual(len(index.query("get", 100)), 100)
+        self.assertEqual(index.query("xyz", 100), [])
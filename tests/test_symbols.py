@@ -0,0 +1,69 @@
+from LSP.plugin.core.protocol import Point
+from LSP.plugin.core.symbols import DocumentSymbolCache, WorkspaceSymbolCache, flatten_symbols
+import unittest
+
+
+def symbol(name: str) -> dict:
+    return {"name": name, "kind": 12, "location": {"uri": "file:///a.py", "range": {}}}
+
+
+class WorkspaceSymbolCacheTests(unittest.TestCase):
+
+    def test_narrows_only_extending_queries(self) -> None:
+        cache = WorkspaceSymbolCache()
+        self.assertIsNone(cache.narrow("f"))
+        cache.store("fo", [symbol("foo"), symbol("fork")])
+        self.assertIsNone(cache.narrow("f"))
+        self.assertIsNone(cache.narrow("ba"))
+        self.assertEqual([s["name"] for s in cache.narrow("fo")], ["foo", "fork"])
+
+    def test_ranks_fuzzy_matches(self) -> None:
+        cache = WorkspaceSymbolCache()
+        cache.store("f", [symbol("fileOpener"), symbol("bar"), symbol("fooBar"), symbol("fob")])
+        self.assertEqual([s["name"] for s in cache.narrow("fob")], ["fob", "fooBar"])
+        self.assertEqual([s["name"] for s in cache.narrow("fob", 1)], ["fob"])
+
+
+def lsp_range(start_line: int, end_line: int) -> dict:
+    return {"start": {"line": start_line, "character": 0}, "end": {"line": end_line, "character": 0}}
+
+
+def document_symbol(name: str, start_line: int, end_line: int, children: list = []) -> dict:
+    return {"name": name, "kind": 5, "range": lsp_range(start_line, end_line),
+            "selectionRange": lsp_range(start_line, start_line), "children": children}
+
+
+HIERARCHICAL = [
+    document_symbol("Outer", 0, 10, [
+        document_symbol("method", 1, 4, [document_symbol("local", 2, 2)]),
+        document_symbol("Inner", 5, 9)
+    ]),
+    document_symbol("top", 12, 14)
+]
+
+
+class DocumentSymbolTests(unittest.TestCase):
+
+    def test_flattens_hierarchical_symbols(self) -> None:
+        entries = flatten_symbols(HIERARCHICAL)
+        self.assertEqual([(e.name, e.container, e.depth) for e in entries], [
+            ("Outer", "", 0), ("method", "Outer", 1), ("local", "Outer.method", 2), ("Inner", "Outer", 1),
+            ("top", "", 0)])
+        self.assertEqual(entries[1].selection_range.end.row, 1)
+        self.assertEqual(entries[1].range.end.row, 4)
+
+    def test_flattens_symbol_information(self) -> None:
+        items = [{"name": "foo", "kind": 12, "containerName": "bar",
+                  "location": {"uri": "file:///a.py", "range": lsp_range(3, 5)}}]
+        entry = flatten_symbols(items)[0]
+        self.assertEqual((entry.name, entry.container, entry.depth), ("foo", "bar", 0))
+        self.assertEqual(entry.range, entry.selection_range)
+
+    def test_cache_keeps_latest_version_and_finds_containing_symbols(self) -> None:
+        cache = DocumentSymbolCache(10)
+        cache.store("file:///a.py", 1, [])
+        symbols = cache.store("file:///a.py", 2, HIERARCHICAL)
+        self.assertIsNone(cache.get("file:///a.py", 1))
+        self.assertIs(cache.get("file:///a.py", 2), symbols)
+        self.assertEqual([e.name for e in symbols.containing(Point(2, 0))], ["Outer", "method", "local"])
+        self.assertEqual(symbols.containing(Point(11, 0)), [])
@@ -0,0 +1,158 @@
+from LSP.plugin.core.protocol import Point, Range
+from LSP.plugin.core.viewport import RangeIndex, ViewportPhantoms, ViewportRegions, diff_rendered
+import sublime
+import unittest
+
+
+def rows(start_row: int, end_row: int) -> Range:
+    return Range(Point(start_row, 0), Point(end_row, 1))
+
+
+class RangeIndexTests(unittest.TestCase):
+
+    def test_empty(self):
+        index = RangeIndex([])
+        self.assertEqual(len(index), 0)
+        self.assertEqual(index.between(0, 100), [])
+
+    def test_orders_by_start(self):
+        index = RangeIndex([(rows(5, 5), "b"), (rows(1, 1), "a")])
+        self.assertEqual([data for _, data in index.all()], ["a", "b"])
+
+    def test_between_rows(self):
+        index = RangeIndex([(rows(row, row), row) for row in range(0, 100, 10)])
+        self.assertEqual([data for _, data in index.between(15, 42)], [20, 30, 40])
+        self.assertEqual([data for _, data in index.between(40, 40)], [40])
+        self.assertEqual(index.between(91, 200), [])
+
+    def test_between_includes_ranges_starting_above(self):
+        index = RangeIndex([(rows(2, 30), "long"), (rows(10, 10), "short"), (rows(3, 4), "early")])
+        self.assertEqual([data for _, data in index.between(20, 25)], ["long"])
+
+
+def color_phantoms(count: int, changed: int = -1) -> list:
+    return [(i * 20, i * 20 + 7, "red" if i == changed else "blue", 1) for i in range(count)]
+
+
+class DiffRenderedTests(unittest.TestCase):
+
+    def test_unchanged(self):
+        self.assertEqual(diff_rendered(color_phantoms(3), color_phantoms(3)), ([], []))
+
+    def test_changed_content(self):
+        stale, missing = diff_rendered(color_phantoms(3), color_phantoms(3, changed=1))
+        self.assertEqual(stale, [(20, 27, "blue", 1)])
+        self.assertEqual(missing, [(20, 27, "red", 1)])
+
+    def test_added_and_removed(self):
+        stale, missing = diff_rendered(color_phantoms(3), color_phantoms(4)[1:])
+        self.assertEqual(stale, [(0, 7, "blue", 1)])
+        self.assertEqual(missing, [(60, 67, "blue", 1)])
+
+    def test_agrees_with_pairwise_comparison(self):
+        rendered = color_phantoms(200)
+        wanted = color_phantoms(300, changed=100)[50:]
+        stale, missing = diff_rendered(rendered, wanted)
+        self.assertEqual(sorted(stale), [phantom for phantom in rendered if phantom not in wanted])
+        self.assertEqual(sorted(missing), [phantom for phantom in wanted if phantom not in rendered])
+
+
+class FakeView(object):
+    """ A view with rows of 100 characters, recording the regions and phantoms added to it """
+
+    def __init__(self) -> None:
+        self.changes = 0
+        self.regions = {}  # type: dict
+        self.phantoms = {}  # type: dict
+        self.added_phantoms = 0
+
+    def change_count(self) -> int:
+        return self.changes
+
+    def text_point(self, row: int, col: int) -> int:
+        return row * 100 + col
+
+    def rowcol(self, point: int) -> tuple:
+        return divmod(point, 100)
+
+    def add_regions(self, key, regions, scope="", icon="", flags=0) -> None:
+        self.regions[key] = [(region.begin(), region.end()) for region in regions]
+
+    def erase_regions(self, key) -> None:
+        self.regions.pop(key, None)
+
+    def add_phantom(self, key, region, content, layout) -> int:
+        self.added_phantoms += 1
+        phantom_id = self.added_phantoms
+        self.phantoms[phantom_id] = sublime.Region(region.begin(), region.end())
+        return phantom_id
+
+    def erase_phantom_by_id(self, phantom_id) -> None:
+        del self.phantoms[phantom_id]
+
+    def query_phantoms(self, phantom_ids) -> list:
+        return [self.phantoms[phantom_id] for phantom_id in phantom_ids]
+
+    def edit_above(self, rows: int) -> None:
+        """ Inserts rows at the top, moving the phantoms like Sublime does """
+        self.changes += 1
+        for phantom_id, region in self.phantoms.items():
+            self.phantoms[phantom_id] = sublime.Region(region.begin() + rows * 100, region.end() + rows * 100)
+
+
+class StaleRangesTests(unittest.TestCase):
+
+    def test_regions_are_not_rendered_after_an_edit(self):
+        view = FakeView()
+        regions = ViewportRegions(view)  # type: ignore
+        regions.set("key", [rows(1, 1)], "scope")
+        self.assertEqual(view.regions["key"], [(100, 101)])
+        view.regions["key"] = [(300, 301)]  # moved by Sublime
+        view.changes += 1
+        regions.render()
+        self.assertEqual(view.regions["key"], [(300, 301)])
+        regions.set("key", [rows(3, 3)], "scope")
+        self.assertEqual(view.regions["key"], [(300, 301)])
+
+    def test_tracked_phantoms_are_rendered_where_they_moved(self):
+        view = FakeView()
+        phantoms = ViewportPhantoms(view, "key")  # type: ignore
+        phantoms.update([(rows(1, 1), "content", 0)])
+        view.edit_above(2)
+        phantoms.track_edits()
+        phantoms.render()
+        self.assertEqual([(r.begin(), r.end()) for r in view.phantoms.values()], [(300, 301)])
+
+    def test_untracked_phantoms_are_not_rendered_after_an_edit(self):
+        view = FakeView()
+        phantoms = ViewportPhantoms(view, "key")  # type: ignore
+        phantoms.update([(rows(1, 1), "content", 0)])
+        view.edit_above(2)
+        view.phantoms.clear()
+        phantoms.render()
+        self.assertEqual(view.phantoms, {})
+
+    def test_update_after_tracking_edits_keeps_the_moved_phantoms(self):
+        view = FakeView()
+        phantoms = ViewportPhantoms(view, "key")  # type: ignore
+        phantoms.update([(rows(row, row), "content", 0) for row in (1, 2, 3)])
+        phantom_ids = sorted(view.phantoms)
+        view.edit_above(2)
+        phantoms.track_edits()
+        # the server sends the same items at the rows they moved to.
+        phantoms.update([(rows(row, row), "content", 0) for row in (3, 4, 5)])
+        self.assertEqual(sorted(view.phantoms), phantom_ids)
+        self.assertEqual(sorted((r.begin(), r.end()) for r in view.phantoms.values()),
+                         [(300, 301), (400, 401), (500, 501)])
+
+    def test_update_after_tracking_edits_replaces_only_changed_phantoms(self):
+        view = FakeView()
+        phantoms = ViewportPhantoms(view, "key")  # type: ignore
+        phantoms.update([(rows(row, row), "content", 0) for row in (1, 2)])
+        first, second = sorted(view.phantoms, key=lambda phantom_id: view.phantoms[phantom_id].begin())
+        view.edit_above(1)
+        phantoms.track_edits()
+        phantoms.update([(rows(2, 2), "content", 0), (rows(3, 3), "changed", 0)])
+        self.assertIn(first, view.phantoms)
+        self.assertNotIn(second, view.phantoms)
+        self.assertEqual(sorted((r.begin(), r.end()) for r in view.phantoms.values()), [(200, 201), (300, 301)])
@@ -0,0 +1,76 @@
+import os
+import shutil
+import tempfile
+import unittest
+from LSP.plugin.core.workspace_edit import edit_files, last_journal, new_journal, write_atomically
+
+
+class WorkspaceEditTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.journals = os.path.join(self.directory, "journals")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, "wb") as file:
+            file.write(content)
+        return path
+
+    def read(self, path):
+        with open(path, "rb") as file:
+            return file.read()
+
+    def test_edits_files_and_keeps_line_endings(self):
+        first = self.write("first.py", b"a = 1\r\nb = a\r\n")
+        second = self.write("second.py", b"from first import a\n")
+        changes = {
+            first: [((0, 0), (0, 1), "x"), ((1, 4), (1, 5), "x")],
+            second: [((0, 18), (0, 19), "x")]
+        }
+        edited, failed = edit_files(changes, new_journal(self.journals))
+        self.assertEqual(sorted(edited), sorted([first, second]))
+        self.assertEqual(failed, [])
+        self.assertEqual(self.read(first), b"x = 1\r\nb = x\r\n")
+        self.assertEqual(self.read(second), b"from first import x\n")
+
+    def test_keeps_byte_order_mark_out_of_the_edited_text(self):
+        path = self.write("bom.py", b"\xef\xbb\xbfa = 1\n")
+        edit_files({path: [((0, 0), (0, 1), "x")]}, new_journal(self.journals))
+        self.assertEqual(self.read(path), b"\xef\xbb\xbfx = 1\n")
+
+    def test_inserted_lines_get_the_line_endings_of_the_file(self):
+        path = self.write("crlf.py", b"a = 1\r\nb = a\r\n")
+        edit_files({path: [((1, 0), (1, 0), "c = 2\nd = 3\r\n")]}, new_journal(self.journals))
+        self.assertEqual(self.read(path), b"a = 1\r\nc = 2\r\nd = 3\r\nb = a\r\n")
+
+    def test_failures_are_reported(self):
+        latin = self.write("latin.py", b"caf\xe9\n")
+        missing = os.path.join(self.directory, "missing.py")
+        edited, failed = edit_files({latin: [((0, 0), (0, 1), "x")], missing: [((0, 0), (0, 0), "x")]},
+                                    new_journal(self.journals))
+        self.assertEqual(edited, [])
+        self.assertEqual([path for path, _ in failed], [latin, missing])
+        self.assertEqual(self.read(latin), b"caf\xe9\n")
+
+    def test_undo_restores_unchanged_files(self):
+        first = self.write("first.py", b"a\n")
+        second = self.write("second.py", b"a\n")
+        edit_files({first: [((0, 0), (0, 1), "b")], second: [((0, 0), (0, 1), "b")]}, new_journal(self.journals))
+        write_atomically(second, b"changed since\n")
+        journal = last_journal(self.journals)
+        self.assertIsNotNone(journal)
+        restored, skipped = journal.restore()
+        self.assertEqual(restored, [first])
+        self.assertEqual(skipped, [second])
+        self.assertEqual(self.read(first), b"a\n")
+        self.assertEqual(self.read(second), b"changed since\n")
+        self.assertIsNone(last_journal(self.journals))
+
+    def test_no_journal_without_changes(self):
+        path = self.write("file.py", b"a\n")
+        edit_files({path: [((0, 0), (0, 1), "a")]}, new_journal(self.journals))
+        self.assertIsNone(last_journal(self.journals))